@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import math
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -48,6 +49,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'licenses.middleware.QueryStatsMiddleware',
+    'licenses.middleware.MetricsMiddleware',
+    'licenses.middleware.RateLimitHeadersMiddleware',
+    'licenses.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -90,9 +95,47 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'Ngocnam2210'),
         'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # Giữ kết nối giữa các request và kiểm tra kết nối trước khi dùng lại.
+        # Dưới ASGI nên đặt DB_CONN_MAX_AGE=0 (mỗi request có thể chạy ở một thread khác).
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replica: POSTGRES_REPLICA_HOSTS="host[:port],..." (cùng tên DB/user/mật khẩu với primary).
+# Các view trong DATABASE_REPLICA_VIEWS (tên URL) đọc từ replica, xem licenses/db_router.py.
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_CONNECT_TIMEOUT = int(os.environ.get('DATABASE_REPLICA_CONNECT_TIMEOUT', '2'))
+for index, replica in enumerate(filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica.strip().partition(':')
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # Replica không kết nối được thì bỏ qua nhanh và đọc từ primary
+        'OPTIONS': {'connect_timeout': DATABASE_REPLICA_CONNECT_TIMEOUT},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['licenses.db_router.PrimaryReplicaRouter']
+DATABASE_REPLICA_VIEWS = [
+    name.strip()
+    for name in os.environ.get(
+        'DATABASE_REPLICA_VIEWS',
+        'verify,verify_tiktok,verify_batch,verify_tiktok_batch,list_api,list_tiktok_api,license_stats,'
+        'dashboard,dashboard_tiktok',
+    ).split(',')
+    if name.strip()
+]
+# Replica trễ quá DATABASE_REPLICA_MAX_LAG giây được coi là không khỏe; kiểm tra mỗi DATABASE_REPLICA_CHECK_SECONDS giây
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DATABASE_REPLICA_MAX_LAG', '10'))
+DATABASE_REPLICA_CHECK_SECONDS = float(os.environ.get('DATABASE_REPLICA_CHECK_SECONDS', '5'))
+# Sau khi ghi, client đọc từ primary trong chừng này giây; phải >= DATABASE_REPLICA_MAX_LAG
+# (system check licenses.E001), mặc định bằng DATABASE_REPLICA_MAX_LAG
+DATABASE_PIN_SECONDS = int(os.environ.get('DATABASE_PIN_SECONDS', math.ceil(DATABASE_REPLICA_MAX_LAG)))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,6 +175,10 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_DIRS = [BASE_DIR / 'static']
 
+# File upload (file import license): web process và worker `run_jobs` phải dùng chung thư mục/storage này
+MEDIA_URL = 'media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'media'))
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'licenses:dashboard'
 LOGOUT_REDIRECT_URL = 'login'
@@ -143,10 +190,132 @@ REST_FRAMEWORK = {
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
     ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'licenses.ratelimit.APIKeyRateThrottle',
+    ],
 }
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Cache
+# Mặc định dùng LocMemCache (riêng từng process). Khi chạy nhiều worker, đặt REDIS_URL
+# để các worker dùng chung cache và việc xóa cache qua signal có hiệu lực ngay.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('LOCMEM_CACHE_MAX_ENTRIES', '100000'))},
+        }
+    }
+
+# Thời gian (giây) giữ kết quả /verify và /tiktok/verify trong cache; 0 để tắt
+VERIFY_CACHE_TIMEOUT = int(os.environ.get('VERIFY_CACHE_TIMEOUT', '300'))
+VERIFY_CACHE_ALIAS = 'default'
+
+# Token offline trả về từ /verify khi gửi "token": true.
+# Ưu tiên Ed25519 (LICENSE_TOKEN_PRIVATE_KEY, cần gói cryptography), nếu không dùng HMAC-SHA256 (LICENSE_TOKEN_SECRET).
+LICENSE_TOKEN_PRIVATE_KEY = os.environ.get('LICENSE_TOKEN_PRIVATE_KEY', '')
+LICENSE_TOKEN_SECRET = os.environ.get('LICENSE_TOKEN_SECRET', '')
+LICENSE_TOKEN_MAX_AGE = int(os.environ.get('LICENSE_TOKEN_MAX_AGE', str(7 * 86400)))
+
+# Số phần tử tối đa cho /verify/batch và /tiktok/verify/batch
+VERIFY_BATCH_MAX_ITEMS = int(os.environ.get('VERIFY_BATCH_MAX_ITEMS', '5000'))
+
+# Số license tối đa cho mỗi lần tạo (API /create, /tiktok/create và form trên dashboard)
+LICENSE_CREATE_MAX_ITEMS = int(os.environ.get('LICENSE_CREATE_MAX_ITEMS', '10000'))
+
+# Phân trang cho /list và /tiktok/list (tham số limit và cursor)
+LIST_API_PAGE_SIZE = int(os.environ.get('LIST_API_PAGE_SIZE', '100'))
+LIST_API_MAX_PAGE_SIZE = int(os.environ.get('LIST_API_MAX_PAGE_SIZE', '1000'))
+
+# Phân trang dashboard: 'keyset' (cursor theo created_at/id, tổng số ước lượng) hoặc 'offset' (Paginator, COUNT(*) đầy đủ)
+DASHBOARD_PAGINATION = os.environ.get('DASHBOARD_PAGINATION', 'keyset').lower()
+DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', '10'))
+DASHBOARD_MAX_PAGE_SIZE = int(os.environ.get('DASHBOARD_MAX_PAGE_SIZE', '100'))
+# Chế độ keyset chỉ đếm tối đa chừng này dòng; nhiều hơn thì hiển thị "hơn N" hoặc ước lượng từ thống kê PostgreSQL
+DASHBOARD_COUNT_CAP = int(os.environ.get('DASHBOARD_COUNT_CAP', '10000'))
+
+# License "sắp hết hạn" nếu còn dưới chừng này ngày (bảng license_stats, dashboard, /stats)
+LICENSE_EXPIRING_SOON_DAYS = int(os.environ.get('LICENSE_EXPIRING_SOON_DAYS', '3'))
+
+# Số dòng mỗi lần fetch từ server-side cursor khi export NDJSON
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', '2000'))
+
+# Xóa license hàng loạt theo chunk (delete-all, xóa nhiều trên dashboard)
+PURGE_CHUNK_SIZE = int(os.environ.get('PURGE_CHUNK_SIZE', '5000'))
+
+# Tác vụ nền (bảng license_job): 'worker' = chạy bởi `manage.py run_jobs`, 'thread' = chạy trong web process
+JOB_RUNNER = os.environ.get('JOB_RUNNER', 'worker').lower()
+JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '2'))
+# Job "running" không cập nhật tiến độ quá lâu được worker khác lấy lại
+JOB_STALE_SECONDS = int(os.environ.get('JOB_STALE_SECONDS', '300'))
+# Lưu trữ license hết hạn quá ARCHIVE_AFTER_DAYS ngày (lệnh archive_licenses), mỗi lô ARCHIVE_BATCH_SIZE dòng
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '180'))
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', '5000'))
+
+# Số dòng mỗi chunk khi import license từ file (/import, /tiktok/import, dashboard)
+IMPORT_CHUNK_SIZE = int(os.environ.get('IMPORT_CHUNK_SIZE', '1000'))
+
+# Thống kê truy vấn DB theo request: header X-DB-Query-Count / X-DB-Time-Ms và log `licenses.queries`
+QUERY_STATS_HEADERS = os.environ.get('QUERY_STATS_HEADERS', str(DEBUG)).lower() == 'true'
+QUERY_STATS_LOG = os.environ.get('QUERY_STATS_LOG', 'false').lower() == 'true'
+
+# Endpoint /metrics (Prometheus) và MetricsMiddleware.
+# Chạy nhiều worker (gunicorn) thì đặt METRICS_DIR là thư mục chung, ghi được, và xóa trống trước mỗi lần khởi động.
+# /metrics chỉ mở cho header "Authorization: Bearer <METRICS_TOKEN>" hoặc superuser đã đăng nhập;
+# METRICS_PUBLIC=true (và không đặt METRICS_TOKEN) thì ai cũng xem được.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '1'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_PUBLIC = os.environ.get('METRICS_PUBLIC', 'false').lower() == 'true'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'licenses': {'handlers': ['console'], 'level': os.environ.get('LICENSES_LOG_LEVEL', 'INFO')},
+    },
+}
+
+# API key authentication: cache key -> user trong từng process và gom ghi last_used_at
+API_KEY_CACHE_SIZE = int(os.environ.get('API_KEY_CACHE_SIZE', '1024'))
+API_KEY_CACHE_TIMEOUT = int(os.environ.get('API_KEY_CACHE_TIMEOUT', '60'))
+API_KEY_LAST_USED_INTERVAL = int(os.environ.get('API_KEY_LAST_USED_INTERVAL', '60'))
+
+# Gói gia hạn và thông tin chuyển khoản được cache (giây), xóa khi lưu trong admin; 0 để tắt
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '3600'))
+# Số mã QR chuyển khoản (PNG/SVG do server vẽ) giữ trong LRU của mỗi process
+QR_IMAGE_CACHE_SIZE = int(os.environ.get('QR_IMAGE_CACHE_SIZE', '256'))
+
+# Rate limit theo token bucket cho từng API key và endpoint (tên URL), dạng "endpoint=N/s[:burst],...";
+# "default" áp dụng cho endpoint không cấu hình riêng. UserApiKey.rate_limits ghi đè cho từng key (xem licenses/ratelimit.py).
+# Bucket dùng chung qua API_RATE_LIMIT_CACHE khi đó là Redis, nếu không thì riêng từng process.
+API_RATE_LIMITS = {
+    scope.strip(): rate.strip()
+    for scope, _, rate in (
+        item.partition('=')
+        for item in os.environ.get('API_RATE_LIMITS', 'verify=100/s:200,verify_tiktok=100/s:200').split(',')
+        if item.strip()
+    )
+}
+API_RATE_LIMIT_CACHE = os.environ.get('API_RATE_LIMIT_CACHE', 'default')
+
+# Dùng view async (licenses/async_views.py) cho /verify, /tiktok/verify, /list, /tiktok/list.
+# Chỉ nên bật khi chạy dưới ASGI (uvicorn/daphne); dưới WSGI mỗi request sẽ phải qua async_to_sync.
+ASYNC_API_VIEWS = os.environ.get('ASYNC_API_VIEWS', 'false').lower() == 'true'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
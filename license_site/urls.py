@@ -26,11 +26,12 @@ def redirect_to_license(request):
     return redirect('licenses:dashboard')
 
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('accounts/login/', StyledLoginView.as_view(), name='login'),
     path('accounts/logout/', auth_views.LogoutView.as_view(), name='logout'),
     path('license/', include(('licenses.urls', 'licenses'), namespace='licenses')),
     path('', include(('licenses.urls_api', 'licenses'), namespace='licenses')),
+    # Đặt sau urls_api để /admin/users/create không bị admin site chặn
+    path('admin/', admin.site.urls),
 ] + [
     path('', redirect_to_license, name='home'),
 ]
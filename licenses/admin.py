@@ -1,6 +1,19 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-from .models import License, UserApiKey, ExtensionPackage, PaymentInfo, ExtensionPackageGroup
+from .archive import restore_archived
+from .cache import KIND_TIKTOK, KIND_ZALO
+from .models import (
+    License,
+    UserApiKey,
+    ExtensionPackage,
+    PaymentInfo,
+    ExtensionPackageGroup,
+    RevokedLicenseToken,
+    LicenseStats,
+    LicenseJob,
+    ArchivedLicense,
+    ArchivedLicenseTikTok,
+)
 
 
 @admin.register(ExtensionPackageGroup)
@@ -38,3 +51,79 @@ class PaymentInfoAdmin(admin.ModelAdmin):
     list_filter = ('is_active', 'bank_code', 'created_at')
     search_fields = ('account_name', 'account_number', 'bank_name', 'bank_code')
     list_editable = ('is_active',)
+
+
+@admin.register(RevokedLicenseToken)
+class RevokedLicenseTokenAdmin(admin.ModelAdmin):
+    list_display = ('code', 'license_type', 'owner', 'revoked_at')
+    list_filter = ('license_type', 'revoked_at')
+    search_fields = ('code',)
+    readonly_fields = ('owner', 'license_type', 'code', 'revoked_at')
+
+
+@admin.register(LicenseStats)
+class LicenseStatsAdmin(admin.ModelAdmin):
+    # Cập nhật tự động (signals + lệnh license_stats), chỉ xem
+    list_display = ('owner', 'license_type', 'total', 'active', 'expired', 'expiring_soon', 'as_of')
+    list_filter = ('license_type',)
+    search_fields = ('owner__username',)
+    list_select_related = ('owner',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LicenseJob)
+class LicenseJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'license_type', 'owner', 'status', 'processed', 'total', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status', 'license_type')
+    search_fields = ('id', 'owner__username')
+    list_select_related = ('owner',)
+    readonly_fields = [field.name for field in LicenseJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
+class ArchivedLicenseAdminMixin:
+    """License lưu trữ: chỉ xem, tìm kiếm và khôi phục về bảng chính."""
+
+    kind = None
+    list_filter = ('archived_at', 'expired_at')
+    list_select_related = ('owner',)
+    actions = ['restore_selected']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Khôi phục license đã chọn về bảng chính')
+    def restore_selected(self, request, queryset):
+        codes = [str(code) for code in queryset.values_list('code', flat=True)]
+        restored = restore_archived(self.kind, codes)
+        self.message_user(request, f'Đã khôi phục {len(restored)} license.')
+        if len(restored) < len(codes):
+            self.message_user(
+                request,
+                f'{len(codes) - len(restored)} license không khôi phục được (trùng với license đang có).',
+                messages.WARNING,
+            )
+
+
+@admin.register(ArchivedLicense)
+class ArchivedLicenseAdmin(ArchivedLicenseAdminMixin, admin.ModelAdmin):
+    kind = KIND_ZALO
+    list_display = ('phone_number', 'code', 'owner', 'expired_at', 'archived_at')
+    search_fields = ('phone_number', 'code', 'owner__username')
+
+
+@admin.register(ArchivedLicenseTikTok)
+class ArchivedLicenseTikTokAdmin(ArchivedLicenseAdminMixin, admin.ModelAdmin):
+    kind = KIND_TIKTOK
+    list_display = ('shop_id', 'code', 'owner', 'expired_at', 'archived_at')
+    search_fields = ('shop_id', 'code', 'owner__username')
@@ -5,4 +5,4 @@ class LicensesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'licenses'
     def ready(self):
-        from . import signals  # noqa
+        from . import checks, signals  # noqa
@@ -0,0 +1,115 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import KIND_TIKTOK, KIND_ZALO
+from .models import ArchivedLicense, ArchivedLicenseTikTok, License, LicenseTikTok
+from .stats import record_license_change
+
+
+# Chuyển license hết hạn lâu sang bảng *_archive theo lô để bảng chính (verify, dashboard,
+# /list, kiểm tra trùng) nhỏ lại. License lưu trữ:
+# - vẫn trả về "hết hạn" khi verify (views tra thêm bảng lưu trữ khi không thấy ở bảng chính),
+# - được chuyển về bảng chính khi gia hạn qua API (bulk_extend) hoặc từ admin,
+# - không còn tính trong license_stats và danh sách dashboard.
+
+ARCHIVES = {
+    KIND_ZALO: (License, ArchivedLicense, 'phone_number'),
+    KIND_TIKTOK: (LicenseTikTok, ArchivedLicenseTikTok, 'shop_id'),
+}
+
+
+def archive_model(kind):
+    return ARCHIVES[kind][1]
+
+
+def _tables(kind):
+    model, archive, identity_field = ARCHIVES[kind]
+    quote = connection.ops.quote_name
+    return quote(model._meta.db_table), quote(archive._meta.db_table), identity_field
+
+
+def _archive_batch(kind, cutoff, batch_size, now):
+    table, archive_table, identity_field = _tables(kind)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH moved AS (
+                DELETE FROM {table} AS t
+                USING (
+                    SELECT id FROM {table}
+                    WHERE expired_at < %s
+                    ORDER BY expired_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ) AS batch
+                WHERE t.id = batch.id
+                RETURNING t.id, t.owner_id, t.code, t.{identity_field}, t.expired_at, t.created_at, t.updated_at
+            )
+            INSERT INTO {archive_table} (id, owner_id, code, {identity_field}, expired_at, created_at, updated_at, archived_at)
+            SELECT id, owner_id, code, {identity_field}, expired_at, created_at, updated_at, %s FROM moved
+            RETURNING owner_id, expired_at
+            ''',
+            [cutoff, batch_size, now],
+        )
+        rows = cursor.fetchall()
+    for owner_id, expired_at in rows:
+        record_license_change(kind, old=(owner_id, expired_at))
+    return len(rows)
+
+
+def archive_expired(kind, older_than_days=None, batch_size=None, max_batches=None, now=None):
+    """Chuyển license hết hạn quá older_than_days ngày sang bảng lưu trữ; trả về số dòng đã chuyển.
+
+    Mỗi lô một transaction ngắn; verify cache không cần xóa vì kết quả verify không đổi.
+    """
+    now = now or timezone.now()
+    older_than_days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    cutoff = now - timedelta(days=older_than_days)
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic(savepoint=False):
+            count = _archive_batch(kind, cutoff, batch_size, now)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+    return moved
+
+
+def restore_archived(kind, codes, owner_id=None):
+    """Chuyển các license lưu trữ (theo code, và owner nếu có) về bảng chính; trả về tập code đã khôi phục.
+
+    License trùng số điện thoại với một license mới tạo sau đó thì không khôi phục được và bị bỏ qua.
+    """
+    if not codes:
+        return set()
+    table, archive_table, identity_field = _tables(kind)
+    where, params = ['code = ANY(%s::uuid[])'], [list(codes)]
+    if owner_id is not None:
+        where.append('owner_id = %s')
+        params.append(owner_id)
+    with transaction.atomic(savepoint=False), connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH restored AS (
+                INSERT INTO {table} (id, owner_id, code, {identity_field}, expired_at, created_at, updated_at)
+                SELECT id, owner_id, code, {identity_field}, expired_at, created_at, %s
+                FROM {archive_table}
+                WHERE {' AND '.join(where)}
+                ON CONFLICT DO NOTHING
+                RETURNING id, owner_id, code, expired_at
+            ), removed AS (
+                DELETE FROM {archive_table} AS a USING restored WHERE a.id = restored.id
+            )
+            SELECT owner_id, code, expired_at FROM restored
+            ''',
+            [timezone.now(), *params],
+        )
+        rows = cursor.fetchall()
+        for owner, _, expired_at in rows:
+            record_license_change(kind, new=(owner, expired_at))
+    return {str(code) for _, code, _ in rows}
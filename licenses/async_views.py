@@ -0,0 +1,167 @@
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotModified, JsonResponse
+from rest_framework import exceptions, status
+
+from .archive import archive_model
+from .auth import APIKeyAuthentication
+from .cache import KIND_TIKTOK, KIND_ZALO, NOT_FOUND, aget_verify_entry, aset_verify_entry
+from .db_router import replica_cache_timeout
+from .export import (
+    LICENSE_ROW_FIELDS,
+    TIKTOK_LICENSE_ROW_FIELDS,
+    license_row_to_dict,
+    tiktok_license_row_to_dict,
+)
+from .filters import apply_license_search
+from .models import License, LicenseTikTok
+from .pagination import InvalidCursor, akeyset_page, decode_cursor, parse_page_size
+from .ratelimit import rate_limit_request
+from .views import (
+    LIST_VALIDATOR,
+    _etag_matches,
+    _list_etag,
+    _parse_verify_input,
+    _verify_entry_from_obj,
+    _verify_result,
+    _wants_token,
+    _with_etag,
+)
+
+
+# View async cho các endpoint nóng (verify, list) khi chạy dưới ASGI (uvicorn/daphne).
+# DRF chưa hỗ trợ view async nên phần xác thực, parse body và định dạng lỗi được làm
+# lại ở đây, giữ nguyên response như các view DRF tương ứng trong views.py.
+# Bật bằng ASYNC_API_VIEWS=True; dưới WSGI nên để tắt vì mỗi request sẽ phải chạy
+# qua async_to_sync.
+
+
+def _json(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, json_dumps_params={'ensure_ascii': False})
+
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        if not request.body:
+            return {}
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('JSON body phải là object')
+        return data
+    return request.POST
+
+
+def async_api_view(methods):
+    """Tương đương @api_view + APIKeyAuthentication cho view async."""
+
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                response = _json(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status.HTTP_405_METHOD_NOT_ALLOWED,
+                )
+                response['Allow'] = ', '.join(methods)
+                return response
+            try:
+                request.user, key_info = await APIKeyAuthentication().aauthenticate(request)
+            except exceptions.AuthenticationFailed as exc:
+                return _json({'detail': str(exc.detail)}, status.HTTP_403_FORBIDDEN)
+            decision = await sync_to_async(rate_limit_request, thread_sensitive=False)(request, key_info)
+            if decision is not None and not decision.allowed:
+                # Cùng nội dung với lỗi Throttled của DRF; header do RateLimitHeadersMiddleware thêm
+                detail = exceptions.Throttled(decision.retry_after).detail
+                return _json({'detail': str(detail)}, status.HTTP_429_TOO_MANY_REQUESTS)
+            try:
+                request.data = _request_data(request) if request.method == 'POST' else {}
+            except (ValueError, UnicodeDecodeError) as exc:
+                return _json({'detail': f'JSON parse error - {exc}'}, status.HTTP_400_BAD_REQUEST)
+            return await view_func(request, *args, **kwargs)
+
+        # Giống DRF: API dùng API key nên không cần CSRF
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+async def _verify(request, model, kind, identity_field):
+    identity = request.data.get(identity_field)
+    normalized_code, error = _parse_verify_input(request.data.get('code'), identity, identity_field)
+    if error:
+        return _json(*error)
+
+    entry = await aget_verify_entry(kind, normalized_code)
+    if entry is None:
+        try:
+            license_obj = await model.objects.only(identity_field, 'expired_at').aget(code=normalized_code)
+        except model.DoesNotExist:
+            license_obj = await (
+                archive_model(kind).objects.only(identity_field, 'expired_at').filter(code=normalized_code).afirst()
+            )
+        # Kết quả đọc từ replica có thể cũ: chỉ cache trong khoảng độ trễ replica cho phép
+        max_timeout = replica_cache_timeout()
+        if license_obj is None:
+            await aset_verify_entry(kind, normalized_code, None, None, max_timeout)
+            entry = NOT_FOUND
+        else:
+            entry = _verify_entry_from_obj(license_obj, identity_field)
+            if entry is not None:
+                await aset_verify_entry(kind, normalized_code, entry[0], license_obj.expired_at, max_timeout)
+
+    return _json(*_verify_result(kind, identity_field, normalized_code, identity, entry, _wants_token(request)))
+
+
+async def _list(request, model, fields, row_to_dict, identity_field):
+    if request.user.is_superuser:
+        queryset = model.objects.all()
+    else:
+        queryset = model.objects.filter(owner=request.user)
+    page_size = parse_page_size(
+        request.GET.get('limit'),
+        settings.LIST_API_PAGE_SIZE,
+        settings.LIST_API_MAX_PAGE_SIZE,
+    )
+    cursor = request.GET.get('cursor')
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except InvalidCursor:
+        return _json({'status': False, 'error': 'cursor không hợp lệ'}, status.HTTP_400_BAD_REQUEST)
+
+    q = request.GET.get('q', '').strip()
+    queryset = apply_license_search(queryset, q, identity_field)
+
+    etag = _list_etag(request.user, q, cursor, page_size, await queryset.order_by().aaggregate(**LIST_VALIDATOR))
+    if _etag_matches(request, etag):
+        return _with_etag(HttpResponseNotModified(), etag)
+
+    rows, next_cursor = await akeyset_page(queryset.values(*fields), cursor, page_size)
+    return _with_etag(
+        _json({'status': True, 'data': [row_to_dict(row) for row in rows], 'next_cursor': next_cursor}),
+        etag,
+    )
+
+
+@async_api_view(['POST'])
+async def verify_license(request):
+    return await _verify(request, License, KIND_ZALO, 'phone_number')
+
+
+@async_api_view(['POST'])
+async def verify_tiktok_license(request):
+    return await _verify(request, LicenseTikTok, KIND_TIKTOK, 'shop_id')
+
+
+@async_api_view(['GET'])
+async def list_license_api(request):
+    return await _list(request, License, LICENSE_ROW_FIELDS, license_row_to_dict, 'phone_number')
+
+
+@async_api_view(['GET'])
+async def list_tiktok_license_api(request):
+    return await _list(request, LicenseTikTok, TIKTOK_LICENSE_ROW_FIELDS, tiktok_license_row_to_dict, 'shop_id')
@@ -1,5 +1,13 @@
-from typing import Optional, Tuple
+import atexit
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
 
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from rest_framework.authentication import BaseAuthentication
 from rest_framework import exceptions
@@ -7,6 +15,147 @@ from rest_framework import exceptions
 from .models import UserApiKey
 
 
+class ApiKeyInfo(NamedTuple):
+    """request.auth của các view dùng APIKeyAuthentication."""
+
+    pk: int
+    rate_limits: dict
+
+
+# Tối đa mỗi chừng này giây mới quét last_used_at đang chờ của các key khác
+PENDING_SWEEP_SECONDS = 1
+
+
+def _version_key(user_id):
+    return f'license:apikey:version:{user_id}'
+
+
+class _ApiKeyCache:
+    """LRU cache key -> (ApiKeyInfo, user, expires, version) dùng chung trong một process.
+
+    Khi user hoặc key thay đổi, version của user trong cache mặc định (Redis khi có REDIS_URL)
+    được đổi; entry có version khác bị bỏ qua, nên mọi worker ngừng dùng key cũ ngay ở request
+    kế tiếp chứ không đợi hết API_KEY_CACHE_TIMEOUT.
+
+    last_used_at được gom trong bộ nhớ và chỉ ghi xuống DB tối đa một lần
+    mỗi `flush_interval` giây cho mỗi key; lần dùng cuối đang chờ được ghi
+    ở request kế tiếp (của bất kỳ key nào) sau khi tới hạn.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._flushed_at = {}
+        self._sweep_at = 0.0
+
+    @property
+    def max_size(self):
+        return int(getattr(settings, 'API_KEY_CACHE_SIZE', 1024))
+
+    @property
+    def timeout(self):
+        return float(getattr(settings, 'API_KEY_CACHE_TIMEOUT', 60))
+
+    @property
+    def flush_interval(self):
+        return float(getattr(settings, 'API_KEY_LAST_USED_INTERVAL', 60))
+
+    def get(self, api_key, version):
+        """Entry còn hạn và cùng version (xem user_version), None nếu không có."""
+        with self._lock:
+            entry = self._entries.get(api_key)
+            if entry is None:
+                return None
+            if entry[2] <= time.monotonic() or entry[3] != version:
+                del self._entries[api_key]
+                return None
+            self._entries.move_to_end(api_key)
+            return entry
+
+    def set(self, api_key, key_info, user, version):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[api_key] = (key_info, user, time.monotonic() + self.timeout, version)
+            self._entries.move_to_end(api_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def user_version(self, api_key):
+        """Version hiện tại của user sở hữu entry `api_key` (None nếu chưa có entry)."""
+        with self._lock:
+            entry = self._entries.get(api_key)
+        if entry is None:
+            return None
+        return cache.get(_version_key(entry[1].pk))
+
+    async def auser_version(self, api_key):
+        with self._lock:
+            entry = self._entries.get(api_key)
+        if entry is None:
+            return None
+        return await cache.aget(_version_key(entry[1].pk))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            stale = [k for k, entry in self._entries.items() if entry[1].pk == user_id]
+            for k in stale:
+                del self._entries[k]
+        # Báo cho các process khác
+        cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending.clear()
+            self._flushed_at.clear()
+            self._sweep_at = 0.0
+
+    def touch(self, key_pk):
+        """Ghi nhận lần dùng key; trả về {key_pk: last_used_at} cần ghi xuống DB ngay (có thể rỗng)."""
+        now = timezone.now()
+        mono = time.monotonic()
+        due = {}
+        with self._lock:
+            last_flush = self._flushed_at.get(key_pk)
+            if last_flush is not None and mono - last_flush < self.flush_interval:
+                self._pending[key_pk] = now
+            else:
+                self._flushed_at[key_pk] = mono
+                self._pending.pop(key_pk, None)
+                due[key_pk] = now
+            if self._pending and mono >= self._sweep_at:
+                # Key không được dùng lại sau lần gom cuối: ghi luôn thay vì đợi process thoát
+                self._sweep_at = mono + PENDING_SWEEP_SECONDS
+                for pk, used_at in list(self._pending.items()):
+                    flushed = self._flushed_at.get(pk)
+                    if flushed is None or mono - flushed >= self.flush_interval:
+                        self._flushed_at[pk] = mono
+                        del self._pending[pk]
+                        due[pk] = used_at
+            if len(self._flushed_at) > max(self.max_size, 1) * 4:
+                self._flushed_at = {pk: self._flushed_at[pk] for pk in self._pending if pk in self._flushed_at}
+        return due
+
+    def flush_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for key_pk, used_at in pending.items():
+            UserApiKey.objects.filter(pk=key_pk).update(last_used_at=used_at)
+
+
+api_key_cache = _ApiKeyCache()
+
+
+@atexit.register
+def _flush_last_used_on_exit():
+    try:
+        api_key_cache.flush_pending()
+    except Exception:
+        pass
+
+
 class APIKeyAuthentication(BaseAuthentication):
     keyword = 'X-API-Key'
 
@@ -14,11 +163,40 @@ class APIKeyAuthentication(BaseAuthentication):
         api_key = request.headers.get(self.keyword) or request.query_params.get('api_key')
         if not api_key:
             raise exceptions.AuthenticationFailed('Missing API key')
-        try:
-            record = UserApiKey.objects.select_related('user').get(key=api_key)
-        except UserApiKey.DoesNotExist:
-            raise exceptions.AuthenticationFailed('Invalid API key')
-        # update last used
-        UserApiKey.objects.filter(pk=record.pk).update(last_used_at=timezone.now())
-        return (record.user, None)
+        # Entry của worker này chỉ dùng được khi version của user trong cache chung không đổi
+        version = api_key_cache.user_version(api_key)
+        entry = api_key_cache.get(api_key, version)
+        if entry is None:
+            try:
+                record = UserApiKey.objects.select_related('user').get(key=api_key)
+            except UserApiKey.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid API key')
+            key_info, user = ApiKeyInfo(record.pk, record.rate_limits or {}), record.user
+            api_key_cache.set(api_key, key_info, user, cache.get(_version_key(user.pk)))
+        else:
+            key_info, user = entry[0], entry[1]
+        # update last used (gom ghi, tối đa 1 lần mỗi API_KEY_LAST_USED_INTERVAL giây)
+        for key_pk, used_at in api_key_cache.touch(key_info.pk).items():
+            UserApiKey.objects.filter(pk=key_pk).update(last_used_at=used_at)
+        # Trả bản sao để thay đổi trên request.user không lọt sang request khác
+        return (copy.copy(user), key_info)
 
+    async def aauthenticate(self, request):
+        """Bản async dùng cho view chạy dưới ASGI; `request` là HttpRequest của Django."""
+        api_key = request.headers.get(self.keyword) or request.GET.get('api_key')
+        if not api_key:
+            raise exceptions.AuthenticationFailed('Missing API key')
+        version = await api_key_cache.auser_version(api_key)
+        entry = api_key_cache.get(api_key, version)
+        if entry is None:
+            try:
+                record = await UserApiKey.objects.select_related('user').aget(key=api_key)
+            except UserApiKey.DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid API key')
+            key_info, user = ApiKeyInfo(record.pk, record.rate_limits or {}), record.user
+            api_key_cache.set(api_key, key_info, user, await cache.aget(_version_key(user.pk)))
+        else:
+            key_info, user = entry[0], entry[1]
+        for key_pk, used_at in api_key_cache.touch(key_info.pk).items():
+            await UserApiKey.objects.filter(pk=key_pk).aupdate(last_used_at=used_at)
+        return (copy.copy(user), key_info)
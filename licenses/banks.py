@@ -0,0 +1,71 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+
+class _BankDirectory:
+    """Đọc banks.json một lần cho mỗi process, chỉ đọc lại khi mtime của file thay đổi."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._state = self._build([])
+
+    @staticmethod
+    def _build(data):
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        # Mã ngân hàng (code, BIN hoặc tên viết tắt, không phân biệt hoa thường) -> BIN
+        bins = {}
+        for bank in data:
+            if bank.get('bin'):
+                for name in (bank.get('shortName'), bank.get('short_name'), bank.get('code'), bank['bin']):
+                    if name:
+                        bins[str(name).strip().lower()] = str(bank['bin'])
+        return data, payload, hashlib.sha256(payload).hexdigest()[:16], bins
+
+    @property
+    def path(self):
+        return Path(getattr(settings, 'BANKS_FILE', Path(settings.BASE_DIR) / 'banks.json'))
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            data = []
+            if mtime is not None:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            self._state = self._build(data)
+            self._mtime = mtime
+
+    def data(self):
+        self._refresh()
+        return self._state[0]
+
+    def payload(self):
+        """Trả về (nội dung JSON đã nén khoảng trắng, version = hash nội dung)."""
+        self._refresh()
+        _, payload, version, _ = self._state
+        return payload, version
+
+    def version(self):
+        self._refresh()
+        return self._state[2]
+
+    def bin_for(self, bank_code):
+        """BIN (mã NAPAS 6 số) của ngân hàng, None nếu không có trong banks.json."""
+        self._refresh()
+        return self._state[3].get(str(bank_code or '').strip().lower())
+
+
+bank_directory = _BankDirectory()
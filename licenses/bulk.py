@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .archive import restore_archived
+from .cache import KIND_TIKTOK, KIND_ZALO
+from .models import ArchivedLicense, ArchivedLicenseTikTok, License, LicenseTikTok
+from .stats import record_license_change, record_licenses_created
+
+
+def _dedupe(values):
+    seen = set()
+    unique, duplicates = [], []
+    for value in values:
+        if value in seen:
+            duplicates.append(value)
+        else:
+            seen.add(value)
+            unique.append(value)
+    return unique, duplicates
+
+
+def bulk_create_licenses(owner, phone_numbers, expired_at):
+    """Tạo license Zalo cho nhiều số điện thoại bằng 1 truy vấn kiểm tra và 1 lệnh INSERT.
+
+    Trả về (created, skipped) theo đúng thứ tự đầu vào; số đã tồn tại (hoặc lặp lại
+    trong danh sách) nằm trong skipped.
+    """
+    phone_numbers, duplicates = _dedupe(phone_numbers)
+    for _ in range(2):
+        with transaction.atomic():
+            # Số đã có license lưu trữ cũng bị bỏ qua như khi license đó còn ở bảng chính,
+            # nếu không gia hạn license lưu trữ sau này sẽ không khôi phục được (trùng số)
+            existing = set(
+                License.objects.filter(phone_number__in=phone_numbers)
+                .order_by()
+                .values_list('phone_number', flat=True)
+                .union(
+                    ArchivedLicense.objects.filter(phone_number__in=phone_numbers)
+                    .order_by()
+                    .values_list('phone_number', flat=True)
+                )
+            )
+            objs = [
+                License(owner=owner, phone_number=phone_number, expired_at=expired_at)
+                for phone_number in phone_numbers
+                if phone_number not in existing
+            ]
+            try:
+                with transaction.atomic():
+                    created = License.objects.bulk_create(objs)
+            except IntegrityError:
+                # Có request khác vừa tạo cùng số điện thoại: kiểm tra lại và thử thêm một lần
+                continue
+            # bulk_create không gửi signal nên tự ghi nhận cho LicenseStats
+            record_licenses_created(KIND_ZALO, created)
+        skipped = [phone_number for phone_number in phone_numbers if phone_number in existing]
+        return created, skipped + duplicates
+    raise IntegrityError('Không thể tạo license do trùng số điện thoại đồng thời.')
+
+
+def bulk_create_tiktok_licenses(owner, shop_ids, expired_at):
+    """Tạo license TikTok cho nhiều shop_id, bỏ qua shop_id đã có license (kể cả lưu trữ) của cùng owner."""
+    shop_ids, duplicates = _dedupe(shop_ids)
+    with transaction.atomic():
+        existing = set(
+            LicenseTikTok.objects.filter(shop_id__in=shop_ids, owner=owner)
+            .order_by()
+            .values_list('shop_id', flat=True)
+            .union(
+                ArchivedLicenseTikTok.objects.filter(shop_id__in=shop_ids, owner=owner)
+                .order_by()
+                .values_list('shop_id', flat=True)
+            )
+        )
+        created = LicenseTikTok.objects.bulk_create(
+            [
+                LicenseTikTok(owner=owner, shop_id=shop_id, expired_at=expired_at)
+                for shop_id in shop_ids
+                if shop_id not in existing
+            ]
+        )
+        record_licenses_created(KIND_TIKTOK, created)
+    skipped = [shop_id for shop_id in shop_ids if shop_id in existing]
+    return created, skipped + duplicates
+
+
+def bulk_extend(model, owner, codes, days):
+    """Gia hạn nhiều license của owner bằng một câu UPDATE ... RETURNING.
+
+    License còn hạn được cộng thêm `days` vào expired_at, license đã hết hạn tính từ
+    thời điểm hiện tại. Việc tính toán nằm trong câu lệnh nên các lần gia hạn đồng thời
+    không ghi đè lẫn nhau. Code không có ở bảng chính được tìm trong bảng lưu trữ và
+    chuyển về trước khi gia hạn. Trả về dict code (str) -> expired_at mới.
+    """
+    if not codes:
+        return {}
+    kind = KIND_TIKTOK if model is LicenseTikTok else KIND_ZALO
+    extended = _extend(model, kind, owner, codes, days)
+    missing = set(map(str, codes)) - extended.keys()
+    if missing:
+        with transaction.atomic(savepoint=False):
+            restored = restore_archived(kind, missing, owner_id=owner.pk)
+            if restored:
+                extended.update(_extend(model, kind, owner, restored, days))
+    return extended
+
+
+def _extend(model, kind, owner, codes, days):
+    table = connection.ops.quote_name(model._meta.db_table)
+    now = timezone.now()
+    delta = timedelta(days=days)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH old AS (
+                SELECT id, expired_at FROM {table}
+                WHERE owner_id = %s AND code = ANY(%s::uuid[])
+                FOR UPDATE
+            )
+            UPDATE {table} AS t
+            SET expired_at = CASE WHEN t.expired_at > %s THEN t.expired_at + %s ELSE %s END,
+                updated_at = %s
+            FROM old
+            WHERE t.id = old.id
+            RETURNING t.code, t.expired_at, old.expired_at
+            ''',
+            [owner.pk, list(codes), now, delta, now + delta, now],
+        )
+        rows = cursor.fetchall()
+        # UPDATE thô không gửi signal: ghi nhận thay đổi cho LicenseStats (giá trị cũ lấy từ CTE)
+        for _, expired_at, old_expired_at in rows:
+            record_license_change(kind, (owner.pk, old_expired_at), (owner.pk, expired_at))
+    return {str(code): expired_at for code, expired_at, _ in rows}
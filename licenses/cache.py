@@ -0,0 +1,118 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+
+# Cache kết quả verify theo code (code là duy nhất), giá trị lưu kèm phone_number/shop_id
+# để so khớp khi đọc. Nhờ vậy chỉ cần xóa theo code khi license thay đổi, kể cả khi
+# shop_id bị đổi qua API update.
+KIND_ZALO = 'zalo'
+KIND_TIKTOK = 'tiktok'
+
+NOT_FOUND = 'not_found'
+_MISSING = object()
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'invalidations': 0}
+
+
+def _cache():
+    return caches[getattr(settings, 'VERIFY_CACHE_ALIAS', 'default')]
+
+
+def _timeout():
+    return int(getattr(settings, 'VERIFY_CACHE_TIMEOUT', 300))
+
+
+def _key(kind, code):
+    return f'license:verify:{kind}:{code}'
+
+
+def _count(name, amount=1):
+    with _stats_lock:
+        _stats[name] += amount
+
+
+def _record_lookup(value):
+    if value is _MISSING:
+        _count('misses')
+        return None
+    _count('hits')
+    return value
+
+
+def _entry_to_store(identity, expired_at, max_timeout=None):
+    """(giá trị, timeout) cần ghi vào cache cho một kết quả verify."""
+    timeout = _timeout()
+    if max_timeout is not None:
+        timeout = max(1, min(timeout, int(max_timeout)))
+    if expired_at is None:
+        return NOT_FOUND, timeout
+    remaining = (expired_at - timezone.now()).total_seconds()
+    if remaining > 0:
+        # Không giữ kết quả "còn hạn" quá thời điểm hết hạn
+        timeout = max(1, min(timeout, int(remaining)))
+    return (identity, expired_at.timestamp()), timeout
+
+
+def get_verify_entry(kind, code):
+    """Trả về (identity, expired_at_ts), NOT_FOUND hoặc None nếu chưa có trong cache."""
+    if _timeout() <= 0:
+        return None
+    return _record_lookup(_cache().get(_key(kind, code), _MISSING))
+
+
+def set_verify_entry(kind, code, identity, expired_at, max_timeout=None):
+    """max_timeout giới hạn thời gian giữ kết quả, vd. kết quả đọc từ replica (xem replica_cache_timeout)."""
+    if _timeout() <= 0:
+        return
+    value, timeout = _entry_to_store(identity, expired_at, max_timeout)
+    _cache().set(_key(kind, code), value, timeout)
+
+
+async def aget_verify_entry(kind, code):
+    """Bản async của get_verify_entry cho các view chạy dưới ASGI."""
+    if _timeout() <= 0:
+        return None
+    return _record_lookup(await _cache().aget(_key(kind, code), _MISSING))
+
+
+async def aset_verify_entry(kind, code, identity, expired_at, max_timeout=None):
+    if _timeout() <= 0:
+        return
+    value, timeout = _entry_to_store(identity, expired_at, max_timeout)
+    await _cache().aset(_key(kind, code), value, timeout)
+
+
+def invalidate_verify(kind, *codes):
+    if not codes:
+        return
+    _cache().delete_many([_key(kind, code) for code in codes])
+    _count('invalidations', len(codes))
+
+
+def invalidate_verify_on_commit(kind, *codes):
+    """Xóa ngay và xóa lại sau khi transaction commit.
+
+    Request verify đồng thời đọc bản đã commit (cũ) trước khi transaction commit sẽ ghi lại
+    cache; lần xóa sau commit bỏ bản cũ đó.
+    """
+    if not codes:
+        return
+    invalidate_verify(kind, *codes)
+    transaction.on_commit(lambda: invalidate_verify(kind, *codes))
+
+
+def is_not_found(entry):
+    return entry == NOT_FOUND
+
+
+def verify_cache_stats():
+    with _stats_lock:
+        data = dict(_stats)
+    lookups = data['hits'] + data['misses']
+    data['hit_ratio'] = round(data['hits'] / lookups, 4) if lookups else 0.0
+    return data
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import ExtensionPackage, PaymentInfo
+
+
+# Gói gia hạn và thông tin chuyển khoản đang kích hoạt (vài chục dòng, hiếm khi đổi) được cache
+# cho hộp thoại gia hạn: /license/renewal/, /license/packages/, /license/payment-info/ và
+# /license/qr-code/ không phải truy vấn hai bảng này mỗi lần.
+# Cache bị xóa sau khi transaction lưu/xóa gói, nhóm gói hoặc thông tin chuyển khoản commit
+# (xem signals.py); CATALOG_CACHE_TIMEOUT giới hạn thời gian dữ liệu cũ khi sửa bằng SQL thô.
+
+PACKAGES_KEY = 'license:catalog:packages'
+PAYMENTS_KEY = 'license:catalog:payments'
+
+
+def _timeout():
+    return int(getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600))
+
+
+def _load_packages():
+    return list(ExtensionPackage.objects.filter(is_active=True).select_related('group').order_by('days', 'id'))
+
+
+def _load_payments():
+    # Thứ tự mặc định của PaymentInfo (mới nhất trước), phần tử đầu là thông tin đang dùng
+    return list(PaymentInfo.objects.filter(is_active=True))
+
+
+def _cached(key, load):
+    timeout = _timeout()
+    if timeout <= 0:
+        return load()
+    value = cache.get(key)
+    if value is None:
+        value = load()
+        cache.set(key, value, timeout)
+    return value
+
+
+def invalidate_catalog():
+    cache.delete_many([PACKAGES_KEY, PAYMENTS_KEY])
+
+
+def active_packages(group_code=None):
+    packages = _cached(PACKAGES_KEY, _load_packages)
+    if group_code:
+        packages = [p for p in packages if p.group is not None and p.group.code == group_code]
+    return packages
+
+
+def active_payment():
+    payments = _cached(PAYMENTS_KEY, _load_payments)
+    return payments[0] if payments else None
+
+
+def find_package(package_id):
+    return next((p for p in _cached(PACKAGES_KEY, _load_packages) if p.id == package_id), None)
+
+
+def find_payment(payment_id):
+    return next((p for p in _cached(PAYMENTS_KEY, _load_payments) if p.id == payment_id), None)
+
+
+def package_to_dict(package):
+    return {'id': package.id, 'name': package.name, 'days': package.days, 'amount': float(package.amount)}
+
+
+def payment_to_dict(payment):
+    return {
+        'id': payment.id,
+        'account_name': payment.account_name,
+        'account_number': payment.account_number,
+        'bank_code': payment.bank_code,
+        'bank_name': payment.bank_name,
+        'note': payment.note or '',
+    }
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core import checks
+
+
+@checks.register(checks.Tags.database)
+def check_replica_pin(app_configs, **kwargs):
+    # Ghim ngắn hơn độ trễ replica cho phép thì client có thể đọc lại dữ liệu cũ ngay sau khi ghi
+    if not settings.DATABASE_REPLICAS or settings.DATABASE_PIN_SECONDS >= settings.DATABASE_REPLICA_MAX_LAG:
+        return []
+    return [
+        checks.Error(
+            f'DATABASE_PIN_SECONDS ({settings.DATABASE_PIN_SECONDS}) nhỏ hơn '
+            f'DATABASE_REPLICA_MAX_LAG ({settings.DATABASE_REPLICA_MAX_LAG}).',
+            hint='Tăng DATABASE_PIN_SECONDS hoặc giảm DATABASE_REPLICA_MAX_LAG.',
+            id='licenses.E001',
+        )
+    ]
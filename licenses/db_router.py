@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+
+logger = logging.getLogger('licenses')
+
+# Đọc từ replica cho các view chỉ đọc (DATABASE_REPLICA_VIEWS), ghi luôn vào primary.
+# - ReplicaRoutingMiddleware đánh dấu request được đọc từ replica; ngoài request (lệnh quản trị,
+#   worker) mọi truy vấn vẫn vào primary.
+# - Mỗi request dùng một replica khỏe (kết nối được và trễ không quá DATABASE_REPLICA_MAX_LAG giây,
+#   kiểm tra tối đa mỗi DATABASE_REPLICA_CHECK_SECONDS giây trong mỗi process); không còn replica
+#   khỏe thì đọc từ primary.
+# - Đọc ngay sau ghi: sau một request ghi, client (API key hoặc session) được ghim vào primary
+#   trong DATABASE_PIN_SECONDS giây; trong cùng request, sau lần ghi đầu tiên hoặc trong
+#   transaction.atomic thì cũng đọc từ primary.
+
+# View dùng POST nhưng chỉ đọc dữ liệu license
+READ_ONLY_POST_VIEWS = {'verify', 'verify_tiktok', 'verify_batch', 'verify_tiktok_batch'}
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+# Ghi không ảnh hưởng dữ liệu đọc sau đó (last_used_at của API key), không tính là "đã ghi"
+UNTRACKED_WRITE_MODELS = {'licenses.userapikey'}
+
+LAG_SQL = '''
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+'''
+
+
+class RoutingState:
+    def __init__(self):
+        self.replica = False
+        self.alias = None
+        self.wrote = False
+
+
+_state = ContextVar('license_db_routing', default=None)
+# alias -> (khỏe, thời điểm kiểm tra theo time.monotonic())
+_health = {}
+
+
+def begin_request():
+    return _state.set(RoutingState())
+
+
+def end_request(token):
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def _client_key(request):
+    client = request.headers.get('X-API-Key') or request.GET.get('api_key')
+    if not client:
+        client = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not client:
+        return None
+    return 'license:dbpin:' + hashlib.sha256(client.encode()).hexdigest()[:32]
+
+
+def _is_write(request, state):
+    match = getattr(request, 'resolver_match', None)
+    name = match.url_name if match else None
+    return state.wrote or (request.method not in SAFE_METHODS and name not in READ_ONLY_POST_VIEWS)
+
+
+def route_view(request):
+    """Gọi từ process_view: cho phép request đọc từ replica nếu view chỉ đọc và client không bị ghim."""
+    state = _state.get()
+    match = request.resolver_match
+    if state is None or match.url_name not in settings.DATABASE_REPLICA_VIEWS:
+        return
+    if request.method not in SAFE_METHODS and match.url_name not in READ_ONLY_POST_VIEWS:
+        return
+    key = _client_key(request)
+    state.replica = key is None or cache.get(key) is None
+
+
+def reading_from_replica():
+    """True nếu request hiện tại đã đọc từ một replica (dữ liệu có thể trễ)."""
+    state = _state.get()
+    return state is not None and state.alias in settings.DATABASE_REPLICAS
+
+
+def replica_cache_timeout():
+    """Thời gian tối đa được cache dữ liệu đọc trong request này; None nếu đọc từ primary.
+
+    Dữ liệu từ replica có thể cũ tới DATABASE_REPLICA_MAX_LAG giây và được ghi vào cache sau khi
+    cache đã bị xóa lúc commit, nên chỉ giữ trong chừng ấy thời gian.
+    """
+    return settings.DATABASE_REPLICA_MAX_LAG if reading_from_replica() else None
+
+
+def pin_after_write(request, state):
+    if state is not None and _is_write(request, state):
+        key = _client_key(request)
+        if key:
+            cache.set(key, 1, settings.DATABASE_PIN_SECONDS)
+
+
+async def apin_after_write(request, state):
+    if state is not None and _is_write(request, state):
+        key = _client_key(request)
+        if key:
+            await cache.aset(key, 1, settings.DATABASE_PIN_SECONDS)
+
+
+def _check(alias):
+    connection = connections[alias]
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            lag = float(cursor.fetchone()[0])
+    except DatabaseError:
+        logger.warning('Replica %s không kết nối được, đọc từ primary', alias, exc_info=True)
+        connection.close()
+        return False
+    if lag > settings.DATABASE_REPLICA_MAX_LAG:
+        logger.warning('Replica %s trễ %.1fs, đọc từ primary', alias, lag)
+        return False
+    return True
+
+
+def is_healthy(alias):
+    now = time.monotonic()
+    healthy, checked_at = _health.get(alias, (True, None))
+    if checked_at is None or now - checked_at >= settings.DATABASE_REPLICA_CHECK_SECONDS:
+        healthy = _check(alias)
+        _health[alias] = (healthy, now)
+    return healthy
+
+
+def pick_replica():
+    replicas = [alias for alias in settings.DATABASE_REPLICAS if is_healthy(alias)]
+    return random.choice(replicas) if replicas else None
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.wrote:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if state.alias is None:
+            state.alias = pick_replica() or DEFAULT_DB_ALIAS
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None and model._meta.label_lower not in UNTRACKED_WRITE_MODELS:
+            state.wrote = True
+        # Luôn ghi vào primary, kể cả object được đọc từ replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,37 @@
+import json
+
+from django.conf import settings
+
+
+# Các cột lấy bằng values() cho list API và export (join sẵn username của owner)
+LICENSE_ROW_FIELDS = ('id', 'code', 'phone_number', 'expired_at', 'created_at', 'owner__username')
+TIKTOK_LICENSE_ROW_FIELDS = ('id', 'code', 'shop_id', 'expired_at', 'created_at', 'updated_at', 'owner__username')
+
+
+def license_row_to_dict(row):
+    return {
+        'code': str(row['code']),
+        'phone_number': row['phone_number'],
+        'expired_at': int(row['expired_at'].timestamp()),
+        'owner_username': row['owner__username'],
+    }
+
+
+def tiktok_license_row_to_dict(row):
+    return {
+        'id': row['id'],
+        'code': str(row['code']),
+        'shop_id': row['shop_id'],
+        'expired_at': int(row['expired_at'].timestamp()),
+        'created_at': int(row['created_at'].timestamp()),
+        'updated_at': int(row['updated_at'].timestamp()),
+        'owner_username': row['owner__username'],
+    }
+
+
+def iter_ndjson(queryset, fields, row_to_dict, chunk_size=None):
+    """Sinh từng dòng NDJSON từ queryset bằng server-side cursor, bộ nhớ không phụ thuộc số dòng."""
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    rows = queryset.order_by('id').values(*fields).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield json.dumps(row_to_dict(row), ensure_ascii=False) + '\n'
@@ -0,0 +1,68 @@
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+from django.utils import timezone
+
+
+def parse_int(val):
+    try:
+        return int(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def apply_license_filters(licenses_qs, status_filter='', days_min='', days_max='', user_id='', now=None):
+    """Áp dụng bộ lọc trạng thái / số ngày còn lại / người dùng giống dashboard.
+
+    `user_id` chỉ nên truyền vào khi người gọi là superuser.
+    """
+    now = now or timezone.now()
+    if status_filter == 'active':
+        licenses_qs = licenses_qs.filter(expired_at__gt=now)
+    elif status_filter == 'expired':
+        licenses_qs = licenses_qs.filter(expired_at__lte=now)
+
+    dmin = parse_int(days_min)
+    dmax = parse_int(days_max)
+    if dmin is not None:
+        licenses_qs = licenses_qs.filter(expired_at__gte=now + timedelta(days=dmin))
+    if dmax is not None:
+        licenses_qs = licenses_qs.filter(expired_at__lte=now + timedelta(days=dmax))
+
+    user_id_int = parse_int(user_id)
+    if user_id_int is not None:
+        licenses_qs = licenses_qs.filter(owner_id=user_id_int)
+    return licenses_qs
+
+
+def apply_license_search(licenses_qs, q, identity_field, include_owner=False):
+    """Tìm license theo code / phone_number hoặc shop_id (và username của owner nếu cần).
+
+    - UUID đầy đủ: so khớp chính xác (index unique).
+    - Còn lại: tìm chuỗi con trong code và phone_number/shop_id, dùng index trigram GIN nếu có
+      pg_trgm (migration 0016). Số điện thoại đầy đủ vẫn tìm chuỗi con để khớp cả số có tiền tố
+      (vd. "84912345678" tìm ra "+84912345678").
+    """
+    q = (q or '').strip()
+    if not q:
+        return licenses_qs
+
+    try:
+        return licenses_qs.filter(code=uuid.UUID(q))
+    except ValueError:
+        pass
+
+    if identity_field == 'phone_number':
+        # Số điện thoại không phân biệt hoa thường: contains dùng được index trgm trên cột gốc
+        condition = Q(phone_number__contains=q)
+    else:
+        condition = Q(**{f'{identity_field}__icontains': q})
+    condition |= Q(code__icontains=q)
+
+    if include_owner:
+        # Lọc theo owner_id thay vì join để điều kiện OR vẫn dùng được index trên bảng license
+        owner_ids = get_user_model().objects.filter(username__icontains=q).values('id')
+        condition |= Q(owner_id__in=owner_ids)
+    return licenses_qs.filter(condition)
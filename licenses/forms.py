@@ -1,9 +1,13 @@
 from datetime import timedelta
 
 from django import forms
+from django.conf import settings
 from django.utils import timezone
 
-from .models import License, LicenseTikTok
+from .bulk import bulk_create_licenses, bulk_create_tiktok_licenses
+from .imports import ImportFileError
+from .jobs import enqueue_import
+from .models import LicenseTikTok
 from django.contrib.auth import get_user_model
 
 
@@ -11,7 +15,7 @@ class LicenseCreateForm(forms.Form):
     phone_numbers = forms.CharField(
         label='Danh sách số điện thoại (mỗi dòng 1 số)',
         widget=forms.Textarea(attrs={'class': 'form-control', 'placeholder': 'Ví dụ:\\n0912345678\\n0987654321', 'rows': 6}),
-        help_text='Tối đa 1000 số. Các số đã tồn tại sẽ được bỏ qua.',
+        help_text=f'Tối đa {settings.LICENSE_CREATE_MAX_ITEMS} số. Các số đã tồn tại sẽ được bỏ qua.',
     )
     expires_in = forms.IntegerField(
         min_value=1,
@@ -60,8 +64,8 @@ class LicenseCreateForm(forms.Form):
         numbers = [line.strip() for line in raw.splitlines() if line.strip()]
         if not numbers:
             raise forms.ValidationError('Vui lòng nhập ít nhất 1 số điện thoại.')
-        if len(numbers) > 1000:
-            raise forms.ValidationError('Tối đa 1000 số điện thoại mỗi lần.')
+        if len(numbers) > settings.LICENSE_CREATE_MAX_ITEMS:
+            raise forms.ValidationError(f'Tối đa {settings.LICENSE_CREATE_MAX_ITEMS} số điện thoại mỗi lần.')
         return numbers
 
     def save(self):
@@ -77,8 +81,6 @@ class LicenseCreateForm(forms.Form):
             expires_in = self.cleaned_data.get('expires_in', 1)
         
         expired_at = timezone.now() + timedelta(days=expires_in)
-        created = []
-        skipped = []
         target_owner = self.owner
         
         if is_superuser and 'owner_id' in self.cleaned_data and self.cleaned_data.get('owner_id'):
@@ -91,18 +93,7 @@ class LicenseCreateForm(forms.Form):
         # Logic kiểm tra giới hạn license đã được gỡ bỏ
 
         
-        for phone_number in self._parse_numbers():
-            if License.objects.filter(phone_number=phone_number).exists():
-                skipped.append(phone_number)
-                continue
-            created.append(
-                License.objects.create(
-                    owner=target_owner,
-                    phone_number=phone_number,
-                    expired_at=expired_at,
-                )
-            )
-        return created, skipped
+        return bulk_create_licenses(target_owner, self._parse_numbers(), expired_at)
 
 
 class LicenseExtendForm(forms.Form):
@@ -140,7 +131,7 @@ class LicenseTikTokCreateForm(forms.Form):
     shop_ids = forms.CharField(
         label='Danh sách mã cửa hàng (mỗi dòng 1 mã)',
         widget=forms.Textarea(attrs={'class': 'form-control', 'placeholder': 'Ví dụ:\n123456789\n987654321', 'rows': 6}),
-        help_text='Tối đa 1000 license. Các license trùng mã cửa hàng sẽ được bỏ qua.',
+        help_text=f'Tối đa {settings.LICENSE_CREATE_MAX_ITEMS} license. Các license trùng mã cửa hàng sẽ được bỏ qua.',
     )
     expires_in = forms.IntegerField(
         min_value=1,
@@ -189,8 +180,8 @@ class LicenseTikTokCreateForm(forms.Form):
         shop_ids = [line.strip() for line in raw.splitlines() if line.strip()]
         if not shop_ids:
             raise forms.ValidationError('Vui lòng nhập ít nhất 1 mã cửa hàng.')
-        if len(shop_ids) > 1000:
-            raise forms.ValidationError('Tối đa 1000 license mỗi lần.')
+        if len(shop_ids) > settings.LICENSE_CREATE_MAX_ITEMS:
+            raise forms.ValidationError(f'Tối đa {settings.LICENSE_CREATE_MAX_ITEMS} license mỗi lần.')
         return shop_ids
 
     def save(self):
@@ -206,8 +197,6 @@ class LicenseTikTokCreateForm(forms.Form):
             expires_in = self.cleaned_data.get('expires_in', 1)
         
         expired_at = timezone.now() + timedelta(days=expires_in)
-        created = []
-        skipped = []
         target_owner = self.owner
         
         if is_superuser and 'owner_id' in self.cleaned_data and self.cleaned_data.get('owner_id'):
@@ -222,18 +211,7 @@ class LicenseTikTokCreateForm(forms.Form):
             if LicenseTikTok.objects.filter(owner=target_owner).exists():
                 raise forms.ValidationError('Bạn chỉ được tạo license 1 lần.')
         
-        for shop_id in self._parse_shop_ids():
-            if LicenseTikTok.objects.filter(shop_id=shop_id, owner=target_owner).exists():
-                skipped.append(shop_id)
-                continue
-            created.append(
-                LicenseTikTok.objects.create(
-                    owner=target_owner,
-                    shop_id=shop_id,
-                    expired_at=expired_at,
-                )
-            )
-        return created, skipped
+        return bulk_create_tiktok_licenses(target_owner, self._parse_shop_ids(), expired_at)
 
 
 class LicenseTikTokExtendForm(forms.Form):
@@ -255,3 +233,26 @@ class LicenseTikTokExtendForm(forms.Form):
         self.license_obj.save(update_fields=['expired_at', 'updated_at'])
         return self.license_obj
 
+
+class LicenseImportForm(forms.Form):
+    """Superuser tải file lên để tạo license hàng loạt bằng tác vụ nền (modal "Nhập từ file")."""
+
+    file = forms.FileField(label='File CSV hoặc TXT')
+    expires_in = forms.IntegerField(min_value=1, label='Thời hạn (ngày)')
+    owner_id = forms.IntegerField(required=False)
+
+    def clean_owner_id(self):
+        owner_id = self.cleaned_data.get('owner_id')
+        self.owner = None
+        if owner_id:
+            self.owner = get_user_model().objects.filter(pk=owner_id).first()
+            if self.owner is None:
+                raise forms.ValidationError('Người dùng không tồn tại.')
+        return owner_id
+
+    def save(self, requester, kind):
+        owner = self.owner or requester
+        try:
+            return enqueue_import(kind, requester, owner, self.cleaned_data['file'], self.cleaned_data['expires_in'])
+        except ImportFileError as exc:
+            raise forms.ValidationError(str(exc))
@@ -0,0 +1,66 @@
+import csv
+import io
+
+from .bulk import bulk_create_licenses, bulk_create_tiktok_licenses
+from .cache import KIND_TIKTOK, KIND_ZALO
+from .models import License, LicenseTikTok
+
+
+# Đọc file import (CSV hoặc mỗi dòng một giá trị) theo luồng, không nạp cả file vào bộ nhớ.
+# Chỉ lấy cột đầu tiên; dòng tiêu đề (phone_number, shop_id, ...) được bỏ qua.
+
+HEADER_NAMES = {'phone_number', 'phone', 'sdt', 'so_dien_thoai', 'shop_id', 'shop'}
+
+IMPORTERS = {
+    KIND_ZALO: (License, 'phone_number', bulk_create_licenses),
+    KIND_TIKTOK: (LicenseTikTok, 'shop_id', bulk_create_tiktok_licenses),
+}
+
+
+class ImportFileError(ValueError):
+    pass
+
+
+def iter_identifier_chunks(uploaded_file, chunk_size):
+    """Sinh từng list tối đa chunk_size giá trị; lỗi định dạng -> ImportFileError."""
+    text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig', newline='')
+    chunk, count = [], 0
+    try:
+        for index, row in enumerate(csv.reader(text)):
+            value = row[0].strip() if row else ''
+            if not value or (index == 0 and value.lower() in HEADER_NAMES):
+                continue
+            chunk.append(value)
+            count += 1
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    except (UnicodeDecodeError, csv.Error):
+        raise ImportFileError('File phải là CSV hoặc văn bản UTF-8, mỗi dòng một giá trị')
+    finally:
+        # Không để TextIOWrapper đóng file upload của Django
+        text.detach()
+    if chunk:
+        yield chunk
+    if not count:
+        raise ImportFileError('File không có dữ liệu')
+
+
+def check_import_file(uploaded_file):
+    """Kiểm tra nhanh phần đầu file (mã hóa, có ít nhất một giá trị) trong request; phần còn lại
+    được worker đọc khi chia chunk. Lỗi -> ImportFileError."""
+    chunks = iter_identifier_chunks(uploaded_file, 1)
+    try:
+        next(chunks)
+    finally:
+        chunks.close()
+        uploaded_file.seek(0)
+
+
+def import_licenses(kind, owner, values, expired_at):
+    """Tạo license cho một chunk; trả về (created, skipped, invalid)."""
+    model, field, create = IMPORTERS[kind]
+    max_length = model._meta.get_field(field).max_length
+    valid = [value for value in values if len(value) <= max_length]
+    created, skipped = create(owner, valid, expired_at)
+    return len(created), len(skipped), len(values) - len(valid)
@@ -0,0 +1,228 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .imports import check_import_file, import_licenses, iter_identifier_chunks
+from .models import LicenseJob, LicenseJobChunk
+from .purge import purge_licenses
+from .stats import MODELS
+
+
+logger = logging.getLogger('licenses')
+
+# Hàng đợi tác vụ nền dựa trên bảng license_job:
+# - Worker (`manage.py run_jobs`) lấy job bằng SELECT ... FOR UPDATE SKIP LOCKED nên chạy
+#   được nhiều process song song.
+# - Job "running" không cập nhật quá JOB_STALE_SECONDS được coi là worker đã chết và được
+#   lấy lại; vì vậy handler phải chạy lại được từ giữa chừng.
+# - File import được lưu nguyên vào storage (LicenseJob.upload); worker chia thành các chunk ở
+#   license_job_chunk rồi xử lý và đánh dấu từng chunk.
+# - JOB_RUNNER=thread chạy job trong thread của chính web process (tiện cho dev, không cần worker).
+
+
+def _run_purge(job):
+    params = job.params
+    already = job.processed
+
+    def on_progress(deleted):
+        report_progress(job, already + deleted)
+
+    deleted = purge_licenses(
+        MODELS[job.license_type],
+        owner_id=params.get('owner_id'),
+        ids=params.get('ids'),
+        on_progress=on_progress,
+    )
+    return {'deleted_count': already + deleted}
+
+
+def _split_upload(job):
+    """Đọc file import của job thành các chunk license_job_chunk và ghi total (một transaction)."""
+    with transaction.atomic():
+        job.chunks.all().delete()
+        with job.upload.open('rb') as uploaded_file:
+            total = _store_chunks(job, iter_identifier_chunks(uploaded_file, settings.IMPORT_CHUNK_SIZE))
+        report_progress(job, 0, total=total)
+
+
+def _run_import(job):
+    if job.total is None:
+        # Lỗi định dạng ở giữa file -> ImportFileError, job chuyển sang failed với thông báo lỗi
+        _split_upload(job)
+    owner = get_user_model().objects.get(pk=job.params['owner_id'])
+    expired_at = datetime.fromisoformat(job.params['expired_at'])
+    result = {'created': 0, 'skipped': 0, 'invalid': 0, **job.result}
+    pending = job.chunks.filter(processed_at__isnull=True).order_by('seq').values_list('id', flat=True)
+    for chunk_id in list(pending):
+        # Tạo license, đánh dấu chunk và cộng kết quả trong cùng transaction:
+        # job bị lấy lại giữa chừng sẽ không tạo hay đếm trùng
+        with transaction.atomic():
+            chunk = LicenseJobChunk.objects.select_for_update().get(pk=chunk_id)
+            if chunk.processed_at is not None:
+                continue
+            created, skipped, invalid = import_licenses(job.license_type, owner, chunk.values, expired_at)
+            result['created'] += created
+            result['skipped'] += skipped
+            result['invalid'] += invalid
+            report_progress(job, job.processed + len(chunk.values), result=result)
+            chunk.values = []
+            chunk.processed_at = timezone.now()
+            chunk.save(update_fields=['values', 'processed_at'])
+    job.chunks.all().delete()
+    if job.upload:
+        job.upload.delete(save=False)
+    return result
+
+
+HANDLERS = {
+    LicenseJob.KIND_PURGE: _run_purge,
+    LicenseJob.KIND_IMPORT: _run_import,
+}
+
+
+def enqueue_job(kind, owner, license_type, params=None, total=None, upload=None):
+    """Tạo job; upload (file) được lưu vào storage, worker đọc lại khi chạy."""
+    fields = {'kind': kind, 'owner': owner, 'license_type': license_type, 'params': params or {}, 'total': total}
+    if upload is not None:
+        fields['upload'] = upload
+    job = LicenseJob.objects.create(**fields)
+    if settings.JOB_RUNNER == 'thread':
+        transaction.on_commit(_start_thread)
+    return job
+
+
+def _store_chunks(job, chunks, batch_size=50):
+    total, batch = 0, []
+    for seq, values in enumerate(chunks):
+        batch.append(LicenseJobChunk(job=job, seq=seq, values=values))
+        total += len(values)
+        if len(batch) >= batch_size:
+            LicenseJobChunk.objects.bulk_create(batch)
+            batch = []
+    LicenseJobChunk.objects.bulk_create(batch)
+    return total
+
+
+def enqueue_import(kind, requester, owner, uploaded_file, expires_in):
+    """Lưu file import và xếp job; worker chia file thành chunk.
+
+    Trong request chỉ kiểm tra phần đầu file: file rỗng/sai mã hóa -> ImportFileError (không tạo job).
+    """
+    check_import_file(uploaded_file)
+    params = {
+        'owner_id': owner.pk,
+        'expires_in': expires_in,
+        'expired_at': (timezone.now() + timedelta(days=expires_in)).isoformat(),
+        'filename': getattr(uploaded_file, 'name', ''),
+    }
+    return enqueue_job(LicenseJob.KIND_IMPORT, requester, kind, params, upload=uploaded_file)
+
+
+def report_progress(job, processed, total=None, result=None):
+    """Ghi tiến độ (đồng thời là heartbeat của worker)."""
+    job.processed = processed
+    fields = {'processed': processed, 'updated_at': timezone.now()}
+    if total is not None:
+        job.total = fields['total'] = total
+    if result is not None:
+        job.result = fields['result'] = result
+    LicenseJob.objects.filter(pk=job.pk).update(**fields)
+
+
+def claim_job():
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_STALE_SECONDS)
+    with transaction.atomic():
+        job = (
+            LicenseJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=LicenseJob.STATUS_PENDING)
+                | Q(status=LicenseJob.STATUS_RUNNING, updated_at__lt=stale)
+            )
+            .order_by('created_at')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = LicenseJob.STATUS_RUNNING
+        job.started_at = job.started_at or now
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+    return job
+
+
+def run_job(job):
+    try:
+        result = HANDLERS[job.kind](job) or {}
+    except Exception as exc:
+        logger.exception('Job %s (%s) lỗi', job.id, job.kind)
+        job.status = LicenseJob.STATUS_FAILED
+        job.error = str(exc)
+    else:
+        job.status = LicenseJob.STATUS_DONE
+        job.result = result
+        if job.total is None or job.total < job.processed:
+            job.total = job.processed
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'result', 'error', 'total', 'processed', 'finished_at', 'updated_at'])
+    return job
+
+
+def run_pending_jobs():
+    """Chạy hết các job đang chờ; trả về số job đã chạy."""
+    count = 0
+    while True:
+        job = claim_job()
+        if job is None:
+            return count
+        run_job(job)
+        count += 1
+
+
+def run_worker(poll_seconds=None):
+    poll_seconds = poll_seconds or settings.JOB_POLL_SECONDS
+    while True:
+        close_old_connections()
+        if not run_pending_jobs():
+            time.sleep(poll_seconds)
+
+
+def _drain_in_thread():
+    try:
+        run_pending_jobs()
+    except Exception:
+        logger.exception('Lỗi khi chạy job nền trong thread')
+    finally:
+        connection.close()
+
+
+def _start_thread():
+    threading.Thread(target=_drain_in_thread, name='license-jobs', daemon=True).start()
+
+
+def job_to_dict(job):
+    progress = None
+    if job.total:
+        progress = round(min(job.processed / job.total, 1.0), 4)
+    elif job.status == LicenseJob.STATUS_DONE:
+        progress = 1.0
+    return {
+        'id': str(job.id),
+        'kind': job.kind,
+        'license_type': job.license_type,
+        'status': job.status,
+        'total': job.total,
+        'processed': job.processed,
+        'progress': progress,
+        'result': job.result,
+        'error': job.error or None,
+        'created_at': int(job.created_at.timestamp()),
+        'started_at': int(job.started_at.timestamp()) if job.started_at else None,
+        'finished_at': int(job.finished_at.timestamp()) if job.finished_at else None,
+    }
@@ -0,0 +1,109 @@
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def _connection(base):
+    cls = http.client.HTTPSConnection if base.scheme == 'https' else http.client.HTTPConnection
+    return cls(base.hostname, base.port, timeout=30)
+
+
+def run_load(base_url, method, path, headers=None, body=None, concurrency=32, total=1000, warmup=0, body_factory=None):
+    """Gửi `total` request tới base_url + path với `concurrency` kết nối keep-alive song song.
+
+    body_factory(i) (nếu có) trả về body riêng cho request thứ i, vd. số điện thoại không trùng
+    khi đo /create. Chỉ dùng thư viện chuẩn để chạy được ở mọi môi trường. Trả về dict gồm số
+    request, lỗi, phân bố status code, requests/giây và latency p50/p95/p99/max (ms).
+    """
+    base = urlsplit(base_url)
+    prefix = base.path.rstrip('/')
+    headers = dict(headers or {})
+    payload = None
+    if body is not None:
+        payload = json.dumps(body).encode()
+    if body is not None or body_factory is not None:
+        headers.setdefault('Content-Type', 'application/json')
+
+    lock = threading.Lock()
+    remaining = [warmup + total]
+    latencies = []
+    status_counts = {}
+    errors = [0]
+    measure_start = []
+
+    def worker():
+        conn = _connection(base)
+        while True:
+            with lock:
+                if remaining[0] <= 0:
+                    break
+                remaining[0] -= 1
+                seq = remaining[0]
+                measured = seq < total
+            data = payload if body_factory is None else json.dumps(body_factory(seq)).encode()
+            start = time.perf_counter()
+            if measured and not measure_start:
+                with lock:
+                    measure_start.append(start)
+            try:
+                conn.request(method, prefix + path, body=data, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                code = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = _connection(base)
+                code = None
+            elapsed = (time.perf_counter() - start) * 1000
+            if not measured:
+                continue
+            with lock:
+                if code is None:
+                    errors[0] += 1
+                else:
+                    latencies.append(elapsed)
+                    status_counts[code] = status_counts.get(code, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, concurrency))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - min(measure_start) if measure_start else 0.0
+
+    latencies.sort()
+    done = len(latencies) + errors[0]
+    return {
+        'requests': done,
+        'errors': errors[0],
+        'status_counts': {str(k): v for k, v in sorted(status_counts.items())},
+        'concurrency': concurrency,
+        'duration_s': round(duration, 3),
+        'rps': round(done / duration, 1) if duration else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2) if latencies else 0.0,
+    }
+
+
+def format_results(results, label='target'):
+    """Bảng kết quả run_load (label -> dict) để in ra terminal, mỗi dòng một label."""
+    width = max([len(label), *(len(name) for name in results)]) + 2
+    lines = [f'{label:<{width}} {"rps":>10} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"errors":>7}  status']
+    for name, r in results.items():
+        lines.append(
+            f'{name:<{width}} {r["rps"]:>10} {r["p50_ms"]:>9} {r["p95_ms"]:>9} {r["p99_ms"]:>9} '
+            f'{r["errors"]:>7}  {r["status_counts"]}'
+        )
+    return '\n'.join(lines)
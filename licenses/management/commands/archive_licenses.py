@@ -0,0 +1,46 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from licenses.archive import ARCHIVES, archive_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Chuyển license hết hạn quá N ngày sang bảng lưu trữ (license_zalo_archive, license_tiktok_archive) theo lô. '
+        'Dùng --loop để chạy định kỳ.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=None,
+            help=f'Số ngày sau khi hết hạn (mặc định ARCHIVE_AFTER_DAYS={settings.ARCHIVE_AFTER_DAYS}).',
+        )
+        parser.add_argument('--type', choices=sorted(ARCHIVES), help='Chỉ lưu trữ một loại license.')
+        parser.add_argument('--batch-size', type=int, default=None, help='Số dòng mỗi lô (mặc định ARCHIVE_BATCH_SIZE).')
+        parser.add_argument('--max-batches', type=int, default=None, help='Dừng sau chừng này lô mỗi lần chạy.')
+        parser.add_argument(
+            '--loop',
+            type=int,
+            default=0,
+            metavar='SECONDS',
+            help='Chạy lặp lại sau mỗi SECONDS giây thay vì chạy một lần.',
+        )
+
+    def handle(self, *args, **options):
+        kinds = [options['type']] if options['type'] else list(ARCHIVES)
+        while True:
+            for kind in kinds:
+                moved = archive_expired(
+                    kind,
+                    older_than_days=options['days'],
+                    batch_size=options['batch_size'],
+                    max_batches=options['max_batches'],
+                )
+                self.stdout.write(f'Đã lưu trữ {moved} license {kind}.')
+            if options['loop'] <= 0:
+                break
+            time.sleep(options['loop'])
@@ -0,0 +1,91 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from licenses.loadtest import format_results, run_load
+from licenses.models import License, LicenseTikTok, UserApiKey
+
+
+class Command(BaseCommand):
+    help = (
+        'Đo requests/giây và latency p50/p95/p99 của API trên một hoặc nhiều server đang chạy, '
+        'ví dụ so sánh gunicorn (WSGI) với uvicorn (ASGI, ASYNC_API_VIEWS=true).'
+    )
+
+    endpoints = {
+        'verify': ('POST', '/verify'),
+        'tiktok_verify': ('POST', '/tiktok/verify'),
+        'list': ('GET', '/list'),
+        'tiktok_list': ('GET', '/tiktok/list'),
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            required=True,
+            help='label=base_url, ví dụ wsgi=http://127.0.0.1:8000 (có thể lặp lại).',
+        )
+        parser.add_argument('--endpoint', choices=sorted(self.endpoints), default='verify')
+        parser.add_argument('--api-key', help='API key dùng để gọi (mặc định: key của --user).')
+        parser.add_argument('--user', help='Username lấy API key và license mẫu.')
+        parser.add_argument('--concurrency', type=int, default=64, help='Số kết nối song song.')
+        parser.add_argument('--requests', type=int, default=5000, help='Số request đo cho mỗi target.')
+        parser.add_argument('--warmup', type=int, default=200, help='Số request chạy trước, không tính vào kết quả.')
+        parser.add_argument('--json', dest='json_output', help='Ghi kết quả ra file JSON.')
+
+    def _api_key(self, options):
+        if options['api_key']:
+            record = UserApiKey.objects.select_related('user').filter(key=options['api_key']).first()
+        elif options['user']:
+            record = UserApiKey.objects.select_related('user').filter(user__username=options['user']).first()
+        else:
+            raise CommandError('Cần --api-key hoặc --user.')
+        if record is None:
+            raise CommandError('Không tìm thấy API key.')
+        return record
+
+    def _body(self, endpoint, user):
+        if endpoint == 'verify':
+            license_obj = License.objects.filter(owner=user).order_by('-expired_at').first()
+            field = 'phone_number'
+        elif endpoint == 'tiktok_verify':
+            license_obj = LicenseTikTok.objects.filter(owner=user).order_by('-expired_at').first()
+            field = 'shop_id'
+        else:
+            return None
+        if license_obj is None:
+            raise CommandError('Người dùng chưa có license nào để verify.')
+        return {'code': str(license_obj.code), field: getattr(license_obj, field)}
+
+    def handle(self, *args, **options):
+        targets = []
+        for value in options['target']:
+            label, sep, url = value.partition('=')
+            if not sep or not url:
+                raise CommandError(f'--target không hợp lệ: "{value}" (cần label=base_url).')
+            targets.append((label, url))
+
+        record = self._api_key(options)
+        method, path = self.endpoints[options['endpoint']]
+        body = self._body(options['endpoint'], record.user)
+
+        results = {}
+        for label, url in targets:
+            self.stderr.write(f'Đang đo {label} ({url}{path}) ...')
+            results[label] = run_load(
+                url,
+                method,
+                path,
+                headers={'X-API-Key': record.key},
+                body=body,
+                concurrency=options['concurrency'],
+                total=options['requests'],
+                warmup=options['warmup'],
+            )
+
+        self.stdout.write(format_results(results))
+
+        if options['json_output']:
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump({'endpoint': options['endpoint'], 'results': results}, f, indent=2)
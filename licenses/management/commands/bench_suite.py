@@ -0,0 +1,261 @@
+import json
+import random
+import subprocess
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from licenses.cache import KIND_TIKTOK, KIND_ZALO
+from licenses.loadtest import format_results, run_load
+from licenses.models import ExtensionPackage, ExtensionPackageGroup, License, LicenseTikTok, UserApiKey
+from licenses.purge import purge_licenses
+from licenses.stats import record_licenses_created
+
+
+SEED_BATCH_SIZE = 5000
+VERIFY_SAMPLE_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed một bộ dữ liệu mẫu (user, license Zalo/TikTok, gói gia hạn) rồi đo requests/giây và '
+        'latency p50/p95/p99 của verify, create, update, list và dashboard trên một server đang chạy '
+        '(cùng database), ghi kết quả ra JSON để so sánh giữa các bản phát hành.'
+    )
+
+    endpoints = (
+        'verify',
+        'tiktok_verify',
+        'create',
+        'tiktok_create',
+        'update',
+        'tiktok_extend',
+        'list',
+        'tiktok_list',
+        'dashboard',
+        'dashboard_tiktok',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Địa chỉ server cần đo.')
+        parser.add_argument(
+            '--prefix',
+            default='bench',
+            help='Tiền tố username/số điện thoại/shop_id của dữ liệu seed (tối đa 8 ký tự).',
+        )
+        parser.add_argument('--users', type=int, default=20, help='Số user được seed.')
+        parser.add_argument('--licenses', type=int, default=20000, help='Tổng số license Zalo được seed.')
+        parser.add_argument('--tiktok-licenses', type=int, default=20000, help='Tổng số license TikTok được seed.')
+        parser.add_argument('--packages', type=int, default=5, help='Số gói gia hạn được seed.')
+        parser.add_argument('--expired-ratio', type=float, default=0.1, help='Tỉ lệ license đã hết hạn.')
+        parser.add_argument('--reseed', action='store_true', help='Xóa dữ liệu seed cũ (cùng prefix) rồi seed lại.')
+        parser.add_argument('--seed-only', action='store_true', help='Chỉ seed dữ liệu, không đo.')
+        parser.add_argument('--cleanup', action='store_true', help='Xóa dữ liệu seed (cùng prefix) rồi thoát.')
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            choices=self.endpoints,
+            help='Endpoint cần đo (có thể lặp lại, mặc định: tất cả).',
+        )
+        parser.add_argument('--concurrency', type=int, default=32, help='Số kết nối song song.')
+        parser.add_argument('--requests', type=int, default=2000, help='Số request đo cho mỗi endpoint.')
+        parser.add_argument('--warmup', type=int, default=100, help='Số request chạy trước, không tính vào kết quả.')
+        parser.add_argument('--json', dest='json_output', help='Ghi kết quả ra file JSON.')
+
+    def handle(self, *args, **options):
+        prefix = options['prefix']
+        if not prefix or len(prefix) > 8 or not prefix.isalnum():
+            raise CommandError('--prefix phải gồm 1-8 ký tự chữ/số.')
+
+        if options['cleanup'] or options['reseed']:
+            removed = self._cleanup(prefix)
+            self.stderr.write(f'Đã xóa dữ liệu seed "{prefix}": {removed} user.')
+            if options['cleanup']:
+                return
+
+        users = self._seed(prefix, options)
+        if options['seed_only']:
+            return
+
+        results = {}
+        for endpoint in options['endpoint'] or self.endpoints:
+            method, path, headers, body_factory = self._scenario(endpoint, prefix, users)
+            self.stderr.write(f'Đang đo {endpoint} ({method} {path}) ...')
+            results[endpoint] = run_load(
+                options['base_url'],
+                method,
+                path,
+                headers=headers,
+                body_factory=body_factory,
+                concurrency=options['concurrency'],
+                total=options['requests'],
+                warmup=options['warmup'],
+            )
+
+        self.stdout.write(format_results(results, label='endpoint'))
+
+        if options['json_output']:
+            report = {
+                'started_at': timezone.now().isoformat(),
+                'revision': self._revision(),
+                'base_url': options['base_url'],
+                'dataset': self._dataset(prefix, users),
+                'concurrency': options['concurrency'],
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+                'results': results,
+            }
+            with open(options['json_output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    # Dữ liệu seed
+
+    def _bench_users(self, prefix):
+        return get_user_model().objects.filter(username__startswith=f'{prefix}-').order_by('id')
+
+    def _seed(self, prefix, options):
+        User = get_user_model()
+        users = list(self._bench_users(prefix))
+        if users:
+            self.stderr.write(f'Dùng lại dữ liệu seed "{prefix}" ({len(users)} user), --reseed để seed lại.')
+            self._disable_rate_limits(users)
+            return users
+
+        users = [User.objects.create_user(username=f'{prefix}-{i}', password=None) for i in range(max(options['users'], 1))]
+        self._disable_rate_limits(users)
+        now = timezone.now()
+
+        def expired_at():
+            if random.random() < options['expired_ratio']:
+                return now - timedelta(days=random.randint(1, 365))
+            return now + timedelta(days=random.randint(1, 365))
+
+        self._seed_licenses(
+            KIND_ZALO,
+            License,
+            options['licenses'],
+            lambda i: License(owner=users[i % len(users)], phone_number=f'{prefix}{i:09d}', expired_at=expired_at()),
+        )
+        self._seed_licenses(
+            KIND_TIKTOK,
+            LicenseTikTok,
+            options['tiktok_licenses'],
+            lambda i: LicenseTikTok(owner=users[i % len(users)], shop_id=f'{prefix}-shop-{i}', expired_at=expired_at()),
+        )
+
+        group, _ = ExtensionPackageGroup.objects.get_or_create(code=prefix, defaults={'name': f'Bench {prefix}'})
+        ExtensionPackage.objects.bulk_create(
+            [
+                ExtensionPackage(group=group, name=f'{prefix} {days} ngày', days=days, amount=days * 1000)
+                for days in (30 * (i + 1) for i in range(options['packages']))
+            ]
+        )
+        self.stderr.write(
+            f'Đã seed "{prefix}": {len(users)} user, {options["licenses"]} license Zalo, '
+            f'{options["tiktok_licenses"]} license TikTok, {options["packages"]} gói gia hạn.'
+        )
+        return users
+
+    def _disable_rate_limits(self, users):
+        # Đo server chứ không đo rate limit (API_RATE_LIMITS)
+        UserApiKey.objects.filter(user__in=users).update(rate_limits={'default': 'off'})
+
+    def _seed_licenses(self, kind, model, count, make):
+        for start in range(0, count, SEED_BATCH_SIZE):
+            with transaction.atomic():
+                created = model.objects.bulk_create([make(i) for i in range(start, min(start + SEED_BATCH_SIZE, count))])
+                record_licenses_created(kind, created)
+
+    def _cleanup(self, prefix):
+        users = list(self._bench_users(prefix))
+        for user in users:
+            purge_licenses(License, owner_id=user.id)
+            purge_licenses(LicenseTikTok, owner_id=user.id)
+            user.delete()
+        ExtensionPackageGroup.objects.filter(code=prefix).delete()
+        return len(users)
+
+    def _dataset(self, prefix, users):
+        owner_ids = [user.id for user in users]
+        return {
+            'prefix': prefix,
+            'users': len(users),
+            'licenses': License.objects.filter(owner_id__in=owner_ids).count(),
+            'tiktok_licenses': LicenseTikTok.objects.filter(owner_id__in=owner_ids).count(),
+            'packages': ExtensionPackage.objects.filter(group__code=prefix).count(),
+        }
+
+    def _revision(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR,
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    # Kịch bản từng endpoint
+
+    def _session_cookie(self, user):
+        # Tạo session trực tiếp thay vì đăng nhập qua form (user seed không có mật khẩu)
+        engine = import_string(f'{settings.SESSION_ENGINE}.SessionStore')
+        session = engine()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+    def _scenario(self, endpoint, prefix, users):
+        """Trả về (method, path, headers, body_factory) cho endpoint."""
+        # User đầu tiên gọi API; verify dùng mẫu license của mọi user
+        user = users[0]
+        api_headers = {'X-API-Key': UserApiKey.objects.get(user=user).key}
+        owner_ids = [u.id for u in users]
+        run_id = uuid.uuid4().hex[:4]
+
+        if endpoint in ('verify', 'tiktok_verify'):
+            model, field = (License, 'phone_number') if endpoint == 'verify' else (LicenseTikTok, 'shop_id')
+            sample = list(model.objects.filter(owner_id__in=owner_ids).order_by('?').values_list('code', field)[:VERIFY_SAMPLE_SIZE])
+            if not sample:
+                raise CommandError(f'Không có license seed để đo {endpoint}.')
+            path = '/verify' if endpoint == 'verify' else '/tiktok/verify'
+            return 'POST', path, api_headers, lambda i: {'code': str(sample[i % len(sample)][0]), field: sample[i % len(sample)][1]}
+
+        if endpoint == 'create':
+            return 'POST', '/create', api_headers, lambda i: {
+                'phone_numbers': [f'{prefix}c{run_id}{i:07d}'],
+                'expires_in': 30,
+            }
+        if endpoint == 'tiktok_create':
+            return 'POST', '/tiktok/create', api_headers, lambda i: {
+                'shop_ids': [f'{prefix}-new-{run_id}-{i}'],
+                'expires_in': 30,
+            }
+
+        # /update (Zalo) và /tiktok/extend cùng là gia hạn theo code
+        if endpoint in ('update', 'tiktok_extend'):
+            model = License if endpoint == 'update' else LicenseTikTok
+            codes = [str(code) for code in model.objects.filter(owner=user).values_list('code', flat=True)[:VERIFY_SAMPLE_SIZE]]
+            if not codes:
+                raise CommandError(f'User {user.username} không có license để đo {endpoint}.')
+            path = '/update' if endpoint == 'update' else '/tiktok/extend'
+            return 'PUT', path, api_headers, lambda i: {'code': codes[i % len(codes)], 'expires_in': 1}
+
+        if endpoint == 'list':
+            return 'GET', '/list', api_headers, None
+        if endpoint == 'tiktok_list':
+            return 'GET', '/tiktok/list', api_headers, None
+
+        name = 'licenses:dashboard' if endpoint == 'dashboard' else 'licenses:dashboard_tiktok'
+        return 'GET', reverse(name), {'Cookie': self._session_cookie(user)}, None
@@ -0,0 +1,163 @@
+import random
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from licenses.filters import apply_license_search
+from licenses.models import License, LicenseTikTok, UserApiKey
+from licenses.views import LIST_VALIDATOR
+
+
+INDEX_NODES = ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan')
+# Bảng user/API key vài trang thì planner luôn quét tuần tự: seed thêm user (không license) cho đủ lớn
+MIN_API_KEYS = 2000
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Seed dữ liệu mẫu rồi dùng EXPLAIN kiểm tra các truy vấn chính đều dùng index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50000, help='Số license mỗi loại được seed.')
+        parser.add_argument('--owners', type=int, default=50, help='Số user sở hữu license được seed.')
+        parser.add_argument('--keep', action='store_true', help='Giữ lại dữ liệu seed thay vì rollback.')
+        parser.add_argument('--verbose-plans', action='store_true', help='In toàn bộ plan của từng truy vấn.')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Lệnh này chỉ hỗ trợ PostgreSQL.')
+
+        failures = []
+        try:
+            with transaction.atomic():
+                sample = self._seed(options['rows'], options['owners'])
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ANALYZE {License._meta.db_table}')
+                    cursor.execute(f'ANALYZE {LicenseTikTok._meta.db_table}')
+                    cursor.execute(f'ANALYZE {UserApiKey._meta.db_table}')
+                    cursor.execute(f'ANALYZE {get_user_model()._meta.db_table}')
+                for name, queryset in self._hot_queries(sample):
+                    plan = queryset.explain()
+                    uses_index = any(node in plan for node in INDEX_NODES)
+                    if uses_index:
+                        self.stdout.write(self.style.SUCCESS(f'OK    {name}'))
+                    else:
+                        failures.append(name)
+                        self.stdout.write(self.style.ERROR(f'FAIL  {name}'))
+                    if options['verbose_plans'] or not uses_index:
+                        self.stdout.write(f'      {plan}'.replace('\n', '\n      '))
+                if not options['keep']:
+                    raise _Rollback
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f'{len(failures)} truy vấn không dùng index: {", ".join(failures)}')
+
+    def _seed(self, rows, owners):
+        User = get_user_model()
+        prefix = uuid.uuid4().hex[:8]
+        users = [
+            User.objects.create_user(username=f'plan-{prefix}-{i}', password=None)
+            for i in range(max(owners, 1))
+        ]
+        fillers = User.objects.bulk_create(
+            [User(username=f'plan-{prefix}-key-{i}') for i in range(max(MIN_API_KEYS - UserApiKey.objects.count(), 0))],
+            batch_size=5000,
+        )
+        UserApiKey.objects.bulk_create(
+            [UserApiKey(user=user, key=UserApiKey.generate_key()) for user in fillers], batch_size=5000
+        )
+        now = timezone.now()
+
+        def expired_at():
+            # ~5% license đã hết hạn, còn lại trải đều trong 1 năm tới
+            if random.random() < 0.05:
+                return now - timedelta(days=random.randint(1, 365))
+            return now + timedelta(days=random.randint(1, 365))
+
+        License.objects.bulk_create(
+            [
+                License(owner=random.choice(users), phone_number=f'{prefix}{i:09d}', expired_at=expired_at())
+                for i in range(rows)
+            ],
+            batch_size=5000,
+        )
+        LicenseTikTok.objects.bulk_create(
+            [
+                LicenseTikTok(owner=random.choice(users), shop_id=f'{prefix}-shop-{i}', expired_at=expired_at())
+                for i in range(rows)
+            ],
+            batch_size=5000,
+        )
+        return {
+            'now': now,
+            'owner': users[0],
+            'license': License.objects.filter(owner__in=users).first(),
+            'tiktok': LicenseTikTok.objects.filter(owner__in=users).first(),
+            'api_key': users[0].api_key.key,
+        }
+
+    def _hot_queries(self, sample):
+        now = sample['now']
+        owner = sample['owner']
+        zalo = sample['license']
+        tiktok = sample['tiktok']
+        queries = [
+            # verify_license / verify_tiktok_license / verify batch
+            ('verify_license', License.objects.only('phone_number', 'expired_at').filter(code=zalo.code)),
+            ('verify_tiktok_license', LicenseTikTok.objects.only('shop_id', 'expired_at').filter(code=tiktok.code)),
+            ('verify_license_batch', License.objects.filter(code__in=[zalo.code, uuid.uuid4()]).order_by()),
+            # APIKeyAuthentication
+            ('api_key_lookup', UserApiKey.objects.select_related('user').filter(key=sample['api_key'])),
+            # create_license_api / LicenseCreateForm
+            ('license_phone_exists', License.objects.filter(phone_number=zalo.phone_number)),
+            # create/update TikTok: trùng shop_id theo owner
+            ('tiktok_shop_owner_exists', LicenseTikTok.objects.filter(shop_id=tiktok.shop_id, owner=tiktok.owner)),
+            ('tiktok_owner_exists', LicenseTikTok.objects.filter(owner=owner)[:1]),
+            # update/delete theo code của owner
+            ('license_code_owner', License.objects.filter(code=zalo.code, owner=zalo.owner)),
+            ('tiktok_id_owner', LicenseTikTok.objects.filter(id=tiktok.id, owner=tiktok.owner)),
+            # dashboard / dashboard_tiktok
+            ('dashboard_owner_page', License.objects.filter(owner=owner).order_by('-created_at')[:10]),
+            ('dashboard_all_page', License.objects.order_by('-created_at')[:10]),
+            ('dashboard_expired', License.objects.filter(expired_at__lte=now).order_by('-created_at')[:10]),
+            ('dashboard_expiring_soon', License.objects.filter(expired_at__gt=now, expired_at__lte=now + timedelta(days=3))),
+            ('dashboard_tiktok_owner_page', LicenseTikTok.objects.filter(owner=owner).order_by('-created_at')[:10]),
+            ('dashboard_tiktok_all_page', LicenseTikTok.objects.order_by('-created_at')[:10]),
+            ('dashboard_tiktok_expired', LicenseTikTok.objects.filter(expired_at__lte=now).order_by('-created_at')[:10]),
+            # Lô của lệnh archive_licenses
+            ('archive_candidates', License.objects.filter(expired_at__lt=now - timedelta(days=180)).order_by('expired_at')[:5000]),
+            # ETag của /list và /tiktok/list (cùng plan với aggregate() theo owner)
+            ('list_etag_validator', License.objects.filter(owner=owner).order_by().values('owner').annotate(**LIST_VALIDATOR)),
+            (
+                'tiktok_list_etag_validator',
+                LicenseTikTok.objects.filter(owner=owner).order_by().values('owner').annotate(**LIST_VALIDATOR),
+            ),
+            # Tìm kiếm q: UUID đầy đủ dùng index unique
+            ('search_full_code', apply_license_search(License.objects.all(), str(zalo.code), 'phone_number')),
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            has_trgm = cursor.fetchone() is not None
+        if has_trgm:
+            # Chuỗi con: index trigram của migration 0016
+            queries += [
+                ('search_phone_substring', apply_license_search(License.objects.all(), zalo.phone_number[-6:], 'phone_number')),
+                ('search_full_phone', apply_license_search(License.objects.all(), zalo.phone_number, 'phone_number')),
+                ('search_code_substring', apply_license_search(License.objects.all(), str(zalo.code)[:13], 'phone_number')),
+                (
+                    'search_tiktok_substring',
+                    apply_license_search(LicenseTikTok.objects.all(), tiktok.shop_id[-6:], 'shop_id', include_owner=True),
+                ),
+            ]
+        else:
+            self.stdout.write(self.style.WARNING('pg_trgm chưa được cài, bỏ qua kiểm tra tìm kiếm chuỗi con.'))
+        return queries
@@ -0,0 +1,59 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from licenses.export import (
+    LICENSE_ROW_FIELDS,
+    TIKTOK_LICENSE_ROW_FIELDS,
+    iter_ndjson,
+    license_row_to_dict,
+    tiktok_license_row_to_dict,
+)
+from licenses.filters import apply_license_filters
+from licenses.models import License, LicenseTikTok
+
+
+class Command(BaseCommand):
+    help = 'Xuất license ra NDJSON (mỗi dòng một license) với bộ nhớ không đổi.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', choices=['zalo', 'tiktok'], default='zalo', help='Loại license cần xuất.')
+        parser.add_argument('--owner', help='Username hoặc id của người sở hữu.')
+        parser.add_argument('--status', choices=['active', 'expired'], default='', help='Lọc theo trạng thái.')
+        parser.add_argument('--days-min', default='', help='Còn hạn ít nhất N ngày.')
+        parser.add_argument('--days-max', default='', help='Còn hạn nhiều nhất N ngày.')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Số dòng mỗi lần fetch từ cursor.')
+        parser.add_argument('-o', '--output', help='File đích (mặc định: stdout).')
+
+    def handle(self, *args, **options):
+        if options['type'] == 'tiktok':
+            licenses = LicenseTikTok.objects.all()
+            fields, row_to_dict = TIKTOK_LICENSE_ROW_FIELDS, tiktok_license_row_to_dict
+        else:
+            licenses = License.objects.all()
+            fields, row_to_dict = LICENSE_ROW_FIELDS, license_row_to_dict
+
+        user_id = ''
+        if options['owner']:
+            User = get_user_model()
+            owner = options['owner']
+            user = User.objects.filter(username=owner).first()
+            if user is None and owner.isdigit():
+                user = User.objects.filter(id=int(owner)).first()
+            if user is None:
+                raise CommandError(f'Không tìm thấy người dùng "{owner}".')
+            user_id = user.id
+
+        licenses = apply_license_filters(licenses, options['status'], options['days_min'], options['days_max'], user_id)
+
+        out = open(options['output'], 'w', encoding='utf-8') if options['output'] else sys.stdout
+        count = 0
+        try:
+            for line in iter_ndjson(licenses, fields, row_to_dict, options['chunk_size']):
+                out.write(line)
+                count += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        self.stderr.write(f'Đã xuất {count} license.')
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from licenses.stats import advance_stats, reconcile_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Cập nhật bảng license_stats: mặc định dời mốc as_of về hiện tại (nhẹ, chạy mỗi vài phút); '
+        '--reconcile tính lại toàn bộ để sửa sai lệch (chạy định kỳ, vd. mỗi đêm).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true', help='Tính lại toàn bộ từ bảng license.')
+        parser.add_argument(
+            '--loop',
+            type=int,
+            default=0,
+            metavar='SECONDS',
+            help='Chạy lặp lại sau mỗi SECONDS giây thay vì chạy một lần.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            if options['reconcile']:
+                fixed = reconcile_stats()
+                self.stdout.write(f'Đã đối soát license_stats, sửa {fixed} dòng sai lệch.')
+            else:
+                updated = advance_stats()
+                self.stdout.write(f'Đã cập nhật as_of cho {updated} dòng license_stats.')
+            if options['loop'] <= 0:
+                break
+            time.sleep(options['loop'])
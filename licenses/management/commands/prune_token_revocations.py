@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from licenses.tokens import prune_revocations
+
+
+class Command(BaseCommand):
+    help = (
+        'Xóa bản ghi thu hồi token cũ hơn LICENSE_TOKEN_MAX_AGE (token tương ứng đã hết hạn). '
+        'Dùng --loop để chạy định kỳ.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            type=int,
+            default=0,
+            metavar='SECONDS',
+            help='Chạy lặp lại sau mỗi SECONDS giây thay vì chạy một lần.',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = prune_revocations()
+            self.stdout.write(f'Đã xóa {deleted} bản ghi thu hồi token.')
+            if options['loop'] <= 0:
+                break
+            time.sleep(options['loop'])
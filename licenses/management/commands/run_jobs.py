@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from licenses.jobs import run_pending_jobs, run_worker
+
+
+class Command(BaseCommand):
+    help = 'Worker chạy tác vụ nền trong bảng license_job (xóa license hàng loạt, ...). Chạy được nhiều process song song.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Chạy hết các job đang chờ rồi thoát.')
+        parser.add_argument('--poll', type=float, default=None, help='Số giây chờ giữa các lần kiểm tra job mới.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = run_pending_jobs()
+            self.stdout.write(f'Đã chạy {count} job.')
+            return
+        self.stdout.write('Đang chờ job...')
+        run_worker(options['poll'])
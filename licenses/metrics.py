@@ -0,0 +1,171 @@
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+logger = logging.getLogger('licenses')
+
+# Số liệu request theo tên URL (view_name, vd. licenses:verify) cho endpoint /metrics.
+# - Mỗi process giữ bộ đếm trong bộ nhớ (MetricsMiddleware ghi nhận mỗi request).
+# - Khi có METRICS_DIR, mỗi process ghi snapshot ra METRICS_DIR/<pid>.json (tối đa mỗi
+#   METRICS_FLUSH_SECONDS giây) và /metrics cộng snapshot của mọi process, nên số liệu đúng
+#   dù request rơi vào worker gunicorn nào. Giống prometheus_client ở chế độ multiprocess:
+#   file của worker đã dừng được giữ lại để counter không bị giảm; xóa thư mục trước khi
+#   khởi động lại server.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+UNRESOLVED = 'unresolved'
+
+
+class Registry:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        # requests: (view, method, status) -> số request
+        # latency: view -> [số request theo từng bucket..., vượt bucket cuối, tổng giây]
+        # db: view -> [số truy vấn, tổng giây DB]
+        self.requests = {}
+        self.latency = {}
+        self.db = {}
+        self.pid = None
+        self.flushed_at = 0.0
+
+    def observe(self, view, method, status, elapsed, queries=0, db_seconds=0.0):
+        method = method if method in METHODS else 'OTHER'
+        with self.lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            buckets = self.latency.get(view)
+            if buckets is None:
+                buckets = self.latency[view] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+            index = next((i for i, bound in enumerate(LATENCY_BUCKETS) if elapsed <= bound), len(LATENCY_BUCKETS))
+            buckets[index] += 1
+            buckets[-1] += elapsed
+            db = self.db.setdefault(view, [0, 0.0])
+            db[0] += queries
+            db[1] += db_seconds
+        if settings.METRICS_DIR and time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_SECONDS:
+            try:
+                self.flush()
+            except OSError:
+                logger.exception('Không ghi được metrics vào %s', settings.METRICS_DIR)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': [[*key, count] for key, count in self.requests.items()],
+                'latency': {view: list(buckets) for view, buckets in self.latency.items()},
+                'db': {view: list(db) for view, db in self.db.items()},
+            }
+
+    def _merge(self, data):
+        for view, method, status_code, count in data.get('requests', []):
+            key = (view, method, status_code)
+            self.requests[key] = self.requests.get(key, 0) + count
+        for view, buckets in data.get('latency', {}).items():
+            current = self.latency.setdefault(view, [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            for i, value in enumerate(buckets):
+                current[i] += value
+        for view, db in data.get('db', {}).items():
+            current = self.db.setdefault(view, [0, 0.0])
+            current[0] += db[0]
+            current[1] += db[1]
+
+    def flush(self):
+        """Ghi snapshot của process này ra METRICS_DIR (ghi file tạm rồi đổi tên để không đọc phải file dở)."""
+        directory = Path(settings.METRICS_DIR)
+        pid = os.getpid()
+        path = directory / f'{pid}.json'
+        with self.flush_lock:
+            if self.pid != pid:
+                # File cùng pid của một worker cũ đã dừng: cộng dồn vào thay vì ghi đè
+                self.pid = pid
+                data = _read(path)
+                if data:
+                    with self.lock:
+                        self._merge(data)
+            self.flushed_at = time.monotonic()
+            directory.mkdir(parents=True, exist_ok=True)
+            tmp = directory / f'.{pid}.json.tmp'
+            tmp.write_text(json.dumps(self.snapshot()))
+            os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+registry = Registry()
+# Process con (gunicorn --preload) bắt đầu từ bộ đếm rỗng
+os.register_at_fork(after_in_child=registry.reset)
+
+
+def collect():
+    """Số liệu cộng từ mọi process (hoặc chỉ process hiện tại nếu không có METRICS_DIR)."""
+    if not settings.METRICS_DIR:
+        return registry.snapshot()
+    registry.flush()
+    total = Registry()
+    for path in sorted(Path(settings.METRICS_DIR).glob('*.json')):
+        data = _read(path)
+        if data:
+            total._merge(data)
+    return total.snapshot()
+
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def render(data=None):
+    """Định dạng text của Prometheus (exposition format 0.0.4)."""
+    data = collect() if data is None else data
+    lines = [
+        '# HELP license_http_requests_total HTTP requests by URL name, method and status code.',
+        '# TYPE license_http_requests_total counter',
+    ]
+    for view, method, status_code, count in sorted(data['requests']):
+        lines.append(f'license_http_requests_total{_labels(view=view, method=method, status=status_code)} {count}')
+
+    lines += [
+        '# HELP license_http_request_duration_seconds Request latency by URL name.',
+        '# TYPE license_http_request_duration_seconds histogram',
+    ]
+    for view, buckets in sorted(data['latency'].items()):
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, buckets):
+            cumulative += count
+            lines.append(f'license_http_request_duration_seconds_bucket{_labels(view=view, le=bound)} {cumulative}')
+        cumulative += buckets[len(LATENCY_BUCKETS)]
+        lines.append(f'license_http_request_duration_seconds_bucket{_labels(view=view, le="+Inf")} {cumulative}')
+        lines.append(f'license_http_request_duration_seconds_sum{_labels(view=view)} {buckets[-1]!r}')
+        lines.append(f'license_http_request_duration_seconds_count{_labels(view=view)} {cumulative}')
+
+    lines += [
+        '# HELP license_db_queries_total Database queries by URL name.',
+        '# TYPE license_db_queries_total counter',
+    ]
+    for view, (queries, _) in sorted(data['db'].items()):
+        lines.append(f'license_db_queries_total{_labels(view=view)} {queries}')
+    lines += [
+        '# HELP license_db_duration_seconds_total Time spent in database queries by URL name.',
+        '# TYPE license_db_duration_seconds_total counter',
+    ]
+    for view, (_, seconds) in sorted(data['db'].items()):
+        lines.append(f'license_db_duration_seconds_total{_labels(view=view)} {seconds!r}')
+    return '\n'.join(lines) + '\n'
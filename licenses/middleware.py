@@ -0,0 +1,204 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from . import db_router
+from .metrics import UNRESOLVED, registry
+from .ratelimit import rate_limit_headers
+
+
+logger = logging.getLogger('licenses.queries')
+
+
+class QueryStats:
+    """Đếm số truy vấn và tổng thời gian DB trong phạm vi một request."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+class QueryStatsMiddleware:
+    """Ghi nhận số truy vấn/thời gian DB của mỗi request.
+
+    - QUERY_STATS_HEADERS: thêm header X-DB-Query-Count và X-DB-Time-Ms vào response.
+    - QUERY_STATS_LOG: ghi một dòng log (logger `licenses.queries`) cho mỗi request.
+    Số liệu cũng được gắn vào `request.query_stats` cho các middleware khác dùng.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    @staticmethod
+    def _wrap_connections(stack, stats):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = QueryStats()
+        request.query_stats = stats
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            self._wrap_connections(stack, stats)
+            response = self.get_response(request)
+        return self._finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = QueryStats()
+        request.query_stats = stats
+        start = time.perf_counter()
+        # Kết nối DB là thread-local: async ORM chạy truy vấn trong thread của sync_to_async
+        # nên wrapper phải được gắn (và gỡ) trong chính thread đó.
+        stack = ExitStack()
+        await sync_to_async(self._wrap_connections)(stack, stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._finish(request, response, stats, time.perf_counter() - start)
+
+    def _finish(self, request, response, stats, elapsed):
+        if getattr(settings, 'QUERY_STATS_HEADERS', False):
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f'{stats.duration * 1000:.2f}'
+        if getattr(settings, 'QUERY_STATS_LOG', False):
+            logger.info(
+                '%s %s status=%s queries=%d db_ms=%.2f total_ms=%.2f',
+                request.method,
+                request.path,
+                response.status_code,
+                stats.count,
+                stats.duration * 1000,
+                elapsed * 1000,
+            )
+        return response
+
+
+class MetricsMiddleware:
+    """Ghi số request, status code, latency và số truy vấn/thời gian DB theo tên URL cho /metrics.
+
+    Đặt ngay sau QueryStatsMiddleware để dùng `request.query_stats`. Tắt bằng METRICS_ENABLED=False.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, time.perf_counter() - start)
+        return response
+
+    def _record(self, request, response, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        stats = getattr(request, 'query_stats', None)
+        registry.observe(
+            match.view_name if match else UNRESOLVED,
+            request.method,
+            response.status_code,
+            elapsed,
+            stats.count if stats else 0,
+            stats.duration if stats else 0.0,
+        )
+
+
+class RateLimitHeadersMiddleware:
+    """Thêm header RateLimit-Limit/Remaining/Reset (và Retry-After khi bị chặn) cho request có rate limit."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self._add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self._add_headers(request, await self.get_response(request))
+
+    def _add_headers(self, request, response):
+        decision = getattr(request, 'rate_limit', None)
+        if decision is not None:
+            for name, value in rate_limit_headers(decision).items():
+                response.headers.setdefault(name, value)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Cho các view chỉ đọc đọc từ replica và ghim client vào primary sau khi ghi (licenses/db_router.py).
+
+    Không dùng khi không cấu hình replica (DATABASE_REPLICAS rỗng).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = db_router.begin_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        db_router.pin_after_write(request, state)
+        return response
+
+    async def __acall__(self, request):
+        token = db_router.begin_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = db_router.end_request(token)
+        await db_router.apin_after_write(request, state)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        db_router.route_view(request)
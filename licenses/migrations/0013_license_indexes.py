@@ -0,0 +1,44 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:23
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY không chạy được trong transaction
+    atomic = False
+
+    dependencies = [
+        ('licenses', '0012_remove_paymentinfo_group'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='license',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='license_zalo_owner_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='license',
+            index=models.Index(fields=['created_at', 'id'], name='license_zalo_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='license',
+            index=models.Index(fields=['expired_at'], name='license_zalo_expired_at'),
+        ),
+        AddIndexConcurrently(
+            model_name='licensetiktok',
+            index=models.Index(fields=['shop_id', 'owner'], name='license_tt_shop_owner'),
+        ),
+        AddIndexConcurrently(
+            model_name='licensetiktok',
+            index=models.Index(fields=['owner', 'created_at', 'id'], name='license_tt_owner_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='licensetiktok',
+            index=models.Index(fields=['created_at', 'id'], name='license_tt_created'),
+        ),
+        AddIndexConcurrently(
+            model_name='licensetiktok',
+            index=models.Index(fields=['expired_at'], name='license_tt_expired_at'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('licenses', '0013_license_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevokedLicenseToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('license_type', models.CharField(choices=[('zalo', 'Zalo'), ('tiktok', 'TikTok')], max_length=10, verbose_name='Loại license')),
+                ('code', models.UUIDField(verbose_name='Mã license')),
+                ('revoked_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Thu hồi lúc')),
+                ('owner', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='revoked_license_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Token license bị thu hồi',
+                'verbose_name_plural': 'Token license bị thu hồi',
+                'ordering': ['-revoked_at'],
+                'indexes': [models.Index(fields=['owner', 'revoked_at'], name='revoked_token_owner')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.26 on 2026-10-17 09:12
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY không chạy được trong transaction
+    atomic = False
+
+    dependencies = [
+        ('licenses', '0014_revokedlicensetoken'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='license',
+            index=models.Index(fields=['owner', 'updated_at'], name='license_zalo_owner_updated'),
+        ),
+        AddIndexConcurrently(
+            model_name='licensetiktok',
+            index=models.Index(fields=['owner', 'updated_at'], name='license_tt_owner_updated'),
+        ),
+    ]
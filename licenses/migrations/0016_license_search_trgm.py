@@ -0,0 +1,63 @@
+import logging
+
+from django.db import migrations
+
+
+logger = logging.getLogger('licenses')
+
+# Index trigram GIN cho tìm kiếm chuỗi con (contains / icontains) trên dashboard và /list.
+# Biểu thức phải khớp với SQL Django sinh ra: contains -> "col"::text LIKE ...,
+# icontains -> UPPER("col"::text) LIKE UPPER(...).
+TRGM_INDEXES = [
+    ('license_zalo_phone_trgm', 'license_zalo', 'phone_number gin_trgm_ops'),
+    ('license_zalo_code_trgm', 'license_zalo', '(UPPER(code::text)) gin_trgm_ops'),
+    ('license_tt_shop_trgm', 'license_tiktok', '(UPPER(shop_id::text)) gin_trgm_ops'),
+    ('license_tt_code_trgm', 'license_tiktok', '(UPPER(code::text)) gin_trgm_ops'),
+]
+
+
+def _has_trgm(cursor):
+    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    if cursor.fetchone():
+        return True
+    cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+    if not cursor.fetchone():
+        return False
+    try:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception:
+        # Không đủ quyền tạo extension: nhờ DBA chạy CREATE EXTENSION pg_trgm rồi migrate lại
+        return False
+    return True
+
+
+def create_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if not _has_trgm(cursor):
+            logger.warning('pg_trgm không khả dụng, bỏ qua index tìm kiếm trigram (tìm kiếm vẫn hoạt động nhưng quét tuần tự).')
+            return
+        for name, table, expression in TRGM_INDEXES:
+            cursor.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} USING gin ({expression})')
+
+
+def drop_trgm_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for name, _, _ in TRGM_INDEXES:
+            cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY không chạy được trong transaction
+    atomic = False
+
+    dependencies = [
+        ('licenses', '0015_license_owner_updated_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trgm_indexes, drop_trgm_indexes),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:42
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_stats(apps, schema_editor):
+    # Tính số liệu ban đầu từ dữ liệu hiện có (bảng license_stats vừa tạo, còn trống)
+    LicenseStats = apps.get_model('licenses', 'LicenseStats')
+    now = django.utils.timezone.now()
+    soon = now + timedelta(days=int(getattr(settings, 'LICENSE_EXPIRING_SOON_DAYS', 3)))
+    quote = schema_editor.connection.ops.quote_name
+    table = quote(LicenseStats._meta.db_table)
+    with schema_editor.connection.cursor() as cursor:
+        for kind, model_name in (('zalo', 'License'), ('tiktok', 'LicenseTikTok')):
+            license_table = quote(apps.get_model('licenses', model_name)._meta.db_table)
+            cursor.execute(
+                f'''
+                INSERT INTO {table} (owner_id, license_type, total, expired, expiring_soon, as_of, updated_at)
+                SELECT owner_id, %s, COUNT(*),
+                       COUNT(*) FILTER (WHERE expired_at <= %s),
+                       COUNT(*) FILTER (WHERE expired_at > %s AND expired_at <= %s),
+                       %s, %s
+                FROM {license_table}
+                GROUP BY owner_id
+                ''',
+                [kind, now, now, soon, now, now],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('licenses', '0016_license_search_trgm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LicenseStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('license_type', models.CharField(choices=[('zalo', 'Zalo'), ('tiktok', 'TikTok')], max_length=10, verbose_name='Loại license')),
+                ('total', models.IntegerField(default=0, verbose_name='Tổng')),
+                ('expired', models.IntegerField(default=0, verbose_name='Hết hạn')),
+                ('expiring_soon', models.IntegerField(default=0, verbose_name='Sắp hết hạn')),
+                ('as_of', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Tính tại')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='license_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Thống kê license',
+                'verbose_name_plural': 'Thống kê license',
+                'db_table': 'license_stats',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='licensestats',
+            constraint=models.UniqueConstraint(fields=('owner', 'license_type'), name='license_stats_owner_type'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('licenses', '0017_licensestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LicenseJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('purge', 'Xóa license')], max_length=20, verbose_name='Loại tác vụ')),
+                ('license_type', models.CharField(choices=[('zalo', 'Zalo'), ('tiktok', 'TikTok')], max_length=10, verbose_name='Loại license')),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Đang chờ'), ('running', 'Đang chạy'), ('done', 'Hoàn tất'), ('failed', 'Lỗi')], default='pending', max_length=10, verbose_name='Trạng thái')),
+                ('total', models.IntegerField(blank=True, null=True, verbose_name='Tổng')),
+                ('processed', models.IntegerField(default=0, verbose_name='Đã xử lý')),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='license_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tác vụ nền',
+                'verbose_name_plural': 'Tác vụ nền',
+                'db_table': 'license_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='license_job_status')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0018_license_job'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='licensejob',
+            name='kind',
+            field=models.CharField(choices=[('purge', 'Xóa license'), ('import', 'Nhập license từ file')], max_length=20, verbose_name='Loại tác vụ'),
+        ),
+        migrations.CreateModel(
+            name='LicenseJobChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seq', models.PositiveIntegerField()),
+                ('values', models.JSONField(blank=True, default=list)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='licenses.licensejob')),
+            ],
+            options={
+                'db_table': 'license_job_chunk',
+                'ordering': ['job', 'seq'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='licensejobchunk',
+            constraint=models.UniqueConstraint(fields=('job', 'seq'), name='license_job_chunk_seq'),
+        ),
+    ]
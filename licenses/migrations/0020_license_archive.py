@@ -0,0 +1,55 @@
+# Generated by Django 4.2.26 on 2026-10-17 02:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('licenses', '0019_license_job_chunk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedLicenseTikTok',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('code', models.UUIDField(unique=True)),
+                ('shop_id', models.CharField(db_index=True, max_length=200, verbose_name='Mã cửa hàng')),
+                ('expired_at', models.DateTimeField(verbose_name='Hết hạn')),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Lưu trữ lúc')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_tiktok_licenses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'License TikTok lưu trữ',
+                'verbose_name_plural': 'Licenses TikTok lưu trữ',
+                'db_table': 'license_tiktok_archive',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedLicense',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('code', models.UUIDField(unique=True)),
+                ('phone_number', models.CharField(db_index=True, max_length=20)),
+                ('expired_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Lưu trữ lúc')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_licenses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'License lưu trữ',
+                'verbose_name_plural': 'Licenses lưu trữ',
+                'db_table': 'license_zalo_archive',
+                'ordering': ['-archived_at'],
+            },
+        ),
+    ]
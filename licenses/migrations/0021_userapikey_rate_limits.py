@@ -0,0 +1,19 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:06
+
+from django.db import migrations, models
+import licenses.ratelimit
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0020_license_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userapikey',
+            name='rate_limits',
+            field=models.JSONField(blank=True, default=dict, help_text='Ghi đè API_RATE_LIMITS cho key này, vd. {"verify": "50/s:100", "default": "20/s"}; "off" để không giới hạn.', validators=[licenses.ratelimit.validate_rate_limits], verbose_name='Giới hạn request'),
+        ),
+    ]
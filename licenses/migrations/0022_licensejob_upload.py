@@ -0,0 +1,18 @@
+# Generated by Django 4.2.26 on 2026-10-17 03:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('licenses', '0021_userapikey_rate_limits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licensejob',
+            name='upload',
+            field=models.FileField(blank=True, upload_to='imports/%Y/%m/', verbose_name='File import'),
+        ),
+    ]
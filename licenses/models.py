@@ -1,12 +1,41 @@
 import uuid
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 from django.utils.crypto import get_random_string
 
+from .ratelimit import validate_rate_limits
+
+
+class LoadedExpiryMixin:
+    """Ghi nhớ giá trị lúc load từ DB để signal biết license thực sự đổi gì.
+
+    - _loaded_expiry: (owner_id, expired_at), tính thay đổi cho LicenseStats.
+    - _loaded_token_state: các trường nằm trong token offline (xem token_state), chỉ thu hồi
+      token khi một trong các trường này đổi.
+    """
+
+    identity_field = None
+
+    def token_state(self):
+        return (self.code, self.owner_id, getattr(self, self.identity_field), self.expired_at)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = instance.__dict__
+        if 'owner_id' in loaded and 'expired_at' in loaded:
+            instance._loaded_expiry = (instance.owner_id, instance.expired_at)
+            if 'code' in loaded and cls.identity_field in loaded:
+                instance._loaded_token_state = instance.token_state()
+        return instance
+
+
+class License(LoadedExpiryMixin, models.Model):
+    identity_field = 'phone_number'
 
-class License(models.Model):
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -21,16 +50,32 @@ class License(models.Model):
     class Meta:
         db_table = 'license_zalo'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'id'], name='license_zalo_owner_created'),
+            models.Index(fields=['owner', 'updated_at'], name='license_zalo_owner_updated'),
+            models.Index(fields=['created_at', 'id'], name='license_zalo_created'),
+            models.Index(fields=['expired_at'], name='license_zalo_expired_at'),
+        ]
 
     def __str__(self):
         return f'{self.phone_number} ({self.code})'
 
+    def validate_unique(self, exclude=None):
+        super().validate_unique(exclude=exclude)
+        # Số điện thoại của license lưu trữ vẫn "đang dùng": license đó được khôi phục khi gia hạn
+        if exclude and 'phone_number' in exclude:
+            return
+        if ArchivedLicense.objects.filter(phone_number=self.phone_number).exists():
+            raise ValidationError({'phone_number': 'Số điện thoại đã có license (đang lưu trữ).'})
+
     @property
     def is_expired(self) -> bool:
         return timezone.now() >= self.expired_at
 
 
-class LicenseTikTok(models.Model):
+class LicenseTikTok(LoadedExpiryMixin, models.Model):
+    identity_field = 'shop_id'
+
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -45,6 +90,13 @@ class LicenseTikTok(models.Model):
     class Meta:
         db_table = 'license_tiktok'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['shop_id', 'owner'], name='license_tt_shop_owner'),
+            models.Index(fields=['owner', 'created_at', 'id'], name='license_tt_owner_created'),
+            models.Index(fields=['owner', 'updated_at'], name='license_tt_owner_updated'),
+            models.Index(fields=['created_at', 'id'], name='license_tt_created'),
+            models.Index(fields=['expired_at'], name='license_tt_expired_at'),
+        ]
         verbose_name = 'License TikTok'
         verbose_name_plural = 'Licenses TikTok'
 
@@ -61,6 +113,13 @@ class UserApiKey(models.Model):
     key = models.CharField(max_length=64, unique=True, db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
     last_used_at = models.DateTimeField(null=True, blank=True)
+    rate_limits = models.JSONField(
+        default=dict,
+        blank=True,
+        validators=[validate_rate_limits],
+        verbose_name='Giới hạn request',
+        help_text='Ghi đè API_RATE_LIMITS cho key này, vd. {"verify": "50/s:100", "default": "20/s"}; "off" để không giới hạn.',
+    )
 
     def __str__(self):
         return f'API Key for {self.user}'
@@ -127,3 +186,191 @@ class PaymentInfo(models.Model):
 
     def __str__(self):
         return f'{self.account_name} - {self.account_number} ({self.bank_name})'
+
+
+class RevokedLicenseToken(models.Model):
+    """License bị xóa/sửa: các token offline phát hành trước revoked_at không còn hiệu lực."""
+
+    TYPE_CHOICES = [('zalo', 'Zalo'), ('tiktok', 'TikTok')]
+
+    # Không ràng buộc FK: bản ghi được tạo ngay trong lúc xóa cascade license của user
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='revoked_license_tokens',
+    )
+    license_type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name='Loại license')
+    code = models.UUIDField(verbose_name='Mã license')
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Thu hồi lúc')
+
+    class Meta:
+        ordering = ['-revoked_at']
+        indexes = [models.Index(fields=['owner', 'revoked_at'], name='revoked_token_owner')]
+        verbose_name = 'Token license bị thu hồi'
+        verbose_name_plural = 'Token license bị thu hồi'
+
+    def __str__(self):
+        return f'{self.license_type}:{self.code} ({self.revoked_at})'
+
+
+class LicenseStats(models.Model):
+    """Số license theo owner, cập nhật dần khi tạo/gia hạn/xóa (xem licenses/stats.py).
+
+    expired / expiring_soon được tính tại thời điểm as_of; lệnh `license_stats` dời as_of
+    về hiện tại và định kỳ đối soát lại toàn bộ.
+    """
+
+    TYPE_CHOICES = RevokedLicenseToken.TYPE_CHOICES
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='license_stats',
+    )
+    license_type = models.CharField(max_length=10, choices=TYPE_CHOICES, verbose_name='Loại license')
+    total = models.IntegerField(default=0, verbose_name='Tổng')
+    expired = models.IntegerField(default=0, verbose_name='Hết hạn')
+    expiring_soon = models.IntegerField(default=0, verbose_name='Sắp hết hạn')
+    as_of = models.DateTimeField(default=timezone.now, verbose_name='Tính tại')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'license_stats'
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'license_type'], name='license_stats_owner_type'),
+        ]
+        verbose_name = 'Thống kê license'
+        verbose_name_plural = 'Thống kê license'
+
+    def __str__(self):
+        return f'{self.owner_id}:{self.license_type} ({self.total})'
+
+    @property
+    def active(self):
+        return self.total - self.expired
+
+
+class LicenseJob(models.Model):
+    """Tác vụ nền chạy bởi worker (`manage.py run_jobs`), lưu tiến độ để client theo dõi."""
+
+    KIND_PURGE = 'purge'
+    KIND_IMPORT = 'import'
+    KIND_CHOICES = [(KIND_PURGE, 'Xóa license'), (KIND_IMPORT, 'Nhập license từ file')]
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Đang chờ'),
+        (STATUS_RUNNING, 'Đang chạy'),
+        (STATUS_DONE, 'Hoàn tất'),
+        (STATUS_FAILED, 'Lỗi'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Loại tác vụ')
+    license_type = models.CharField(max_length=10, choices=RevokedLicenseToken.TYPE_CHOICES, verbose_name='Loại license')
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='license_jobs',
+    )
+    params = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name='Trạng thái')
+    total = models.IntegerField(null=True, blank=True, verbose_name='Tổng')
+    processed = models.IntegerField(default=0, verbose_name='Đã xử lý')
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='')
+    # File import gốc (MEDIA_ROOT / storage dùng chung với worker); worker chia thành chunk rồi xóa
+    upload = models.FileField(upload_to='imports/%Y/%m/', blank=True, verbose_name='File import')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Worker cập nhật sau mỗi chunk; job "running" lâu không cập nhật được coi là worker đã chết
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'license_job'
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'], name='license_job_status')]
+        verbose_name = 'Tác vụ nền'
+        verbose_name_plural = 'Tác vụ nền'
+
+    def __str__(self):
+        return f'{self.kind}:{self.id} ({self.status})'
+
+
+class LicenseJobChunk(models.Model):
+    """Dữ liệu đầu vào của job (vd. các dòng của file import), chia theo chunk để worker xử lý dần."""
+
+    job = models.ForeignKey(LicenseJob, on_delete=models.CASCADE, related_name='chunks')
+    seq = models.PositiveIntegerField()
+    values = models.JSONField(default=list, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'license_job_chunk'
+        ordering = ['job', 'seq']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'seq'], name='license_job_chunk_seq'),
+        ]
+
+    def __str__(self):
+        return f'{self.job_id}#{self.seq}'
+
+
+class ArchivedLicense(models.Model):
+    """License Zalo hết hạn lâu, được chuyển khỏi license_zalo (lệnh `archive_licenses`).
+
+    Giữ nguyên id/code; gia hạn qua API sẽ chuyển license về lại bảng chính.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_licenses',
+    )
+    code = models.UUIDField(unique=True)
+    phone_number = models.CharField(max_length=20, db_index=True)
+    expired_at = models.DateTimeField()
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Lưu trữ lúc')
+
+    class Meta:
+        db_table = 'license_zalo_archive'
+        ordering = ['-archived_at']
+        verbose_name = 'License lưu trữ'
+        verbose_name_plural = 'Licenses lưu trữ'
+
+    def __str__(self):
+        return f'{self.phone_number} ({self.code})'
+
+
+class ArchivedLicenseTikTok(models.Model):
+    """License TikTok hết hạn lâu, được chuyển khỏi license_tiktok (lệnh `archive_licenses`)."""
+
+    id = models.BigIntegerField(primary_key=True)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_tiktok_licenses',
+    )
+    code = models.UUIDField(unique=True)
+    shop_id = models.CharField(max_length=200, db_index=True, verbose_name='Mã cửa hàng')
+    expired_at = models.DateTimeField(verbose_name='Hết hạn')
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Lưu trữ lúc')
+
+    class Meta:
+        db_table = 'license_tiktok_archive'
+        ordering = ['-archived_at']
+        verbose_name = 'License TikTok lưu trữ'
+        verbose_name_plural = 'Licenses TikTok lưu trữ'
+
+    def __str__(self):
+        return f'{self.shop_id} ({self.code})'
@@ -0,0 +1,137 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db import connections
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def parse_page_size(value, default, maximum):
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, maximum))
+
+
+def _keyset_queryset(queryset, cursor, page_size):
+    if cursor:
+        created_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return queryset.order_by('-created_at', '-id')[:page_size + 1]
+
+
+def _keyset_result(rows, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        if isinstance(last, dict):
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        else:
+            next_cursor = encode_cursor(last.created_at, last.id)
+    return rows, next_cursor
+
+
+def keyset_page(queryset, cursor, page_size):
+    """Lấy một trang theo thứ tự (-created_at, -id) bắt đầu sau `cursor`.
+
+    `queryset` có thể là queryset model hoặc values(); mỗi dòng cần có created_at và id.
+    Trả về (rows, next_cursor); next_cursor là None khi đã hết dữ liệu.
+    """
+    return _keyset_result(list(_keyset_queryset(queryset, cursor, page_size)), page_size)
+
+
+async def akeyset_page(queryset, cursor, page_size):
+    """Bản async của keyset_page (dùng async ORM)."""
+    rows = [row async for row in _keyset_queryset(queryset, cursor, page_size)]
+    return _keyset_result(rows, page_size)
+
+
+class KeysetPage:
+    """Một trang dashboard phân trang theo cursor (không COUNT, không OFFSET)."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None, page_size=10):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.page_size = page_size
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _row_cursor(row):
+    return encode_cursor(row.created_at, row.id)
+
+
+def keyset_window(queryset, after=None, before=None, page_size=10):
+    """Trang theo thứ tự (-created_at, -id) nằm sau `after` hoặc trước `before`.
+
+    Trả về KeysetPage với cursor cho nút trang sau (`after`) và trang trước (`before`).
+    """
+    if before:
+        created_at, pk = decode_cursor(before)
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by('created_at', 'id')[:page_size + 1]
+        )
+        has_previous = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        return KeysetPage(
+            rows,
+            next_cursor=_row_cursor(rows[-1]) if rows else before,
+            previous_cursor=_row_cursor(rows[0]) if rows and has_previous else None,
+            page_size=page_size,
+        )
+
+    rows, next_cursor = keyset_page(queryset, after, page_size)
+    previous_cursor = None
+    if after:
+        previous_cursor = _row_cursor(rows[0]) if rows else after
+    return KeysetPage(rows, next_cursor=next_cursor, previous_cursor=previous_cursor, page_size=page_size)
+
+
+def estimated_count(queryset, cap):
+    """Trả về (số dòng, chính_xác) mà không COUNT(*) toàn bộ queryset.
+
+    Đếm tối đa `cap` + 1 dòng; nếu vượt quá và queryset không lọc gì (PostgreSQL) thì
+    ước lượng bằng pg_class.reltuples (thống kê của ANALYZE), ngược lại trả về `cap`.
+    """
+    count = queryset.order_by()[:cap + 1].count()
+    if count <= cap:
+        return count, True
+    db = connections[queryset.db]
+    if db.vendor == 'postgresql' and not queryset.query.where:
+        with db.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > cap:
+            return int(row[0]), False
+    return cap, False
@@ -0,0 +1,96 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, pre_delete
+
+from .cache import KIND_TIKTOK, KIND_ZALO, invalidate_verify
+from .models import License, LicenseTikTok
+from .signals import BULK_DELETE_RECEIVERS
+from .stats import record_license_change
+from .tokens import revoke_tokens_bulk
+
+
+# Xóa license theo từng chunk, mỗi chunk một transaction ngắn, để không giữ lock lâu và
+# không nạp toàn bộ dòng vào bộ nhớ như Collector của Django (queryset.delete()).
+
+KINDS = {License: KIND_ZALO, LicenseTikTok: KIND_TIKTOK}
+
+
+def can_raw_delete(model):
+    """True nếu không có FK trỏ tới model và mọi receiver post_delete đang nối đều được xử lý theo lô ở đây.
+
+    Receiver nào ngoài BULK_DELETE_RECEIVERS (vd. của app khác, nối bằng post_delete.connect)
+    thì xóa qua Collector để receiver đó vẫn được gọi.
+    """
+    if model._meta.related_objects or pre_delete.has_listeners(model):
+        return False
+    known = BULK_DELETE_RECEIVERS.get(model, set())
+    return all(receiver in known for receiver in post_delete._live_receivers(model))
+
+
+def _raw_delete_chunk(model, owner_id, ids, chunk_size):
+    table = connection.ops.quote_name(model._meta.db_table)
+    where, params = [], []
+    if owner_id is not None:
+        where.append('owner_id = %s')
+        params.append(owner_id)
+    if ids is not None:
+        where.append('id = ANY(%s)')
+        params.append(list(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+            WITH doomed AS (
+                SELECT id FROM {table}
+                WHERE {' AND '.join(where)}
+                LIMIT %s
+            )
+            DELETE FROM {table} AS t
+            USING doomed
+            WHERE t.id = doomed.id
+            RETURNING t.owner_id, t.code, t.expired_at
+            ''',
+            [*params, chunk_size],
+        )
+        rows = cursor.fetchall()
+    kind = KINDS[model]
+    # Thay cho các signal post_delete
+    for owner, _, expired_at in rows:
+        record_license_change(kind, old=(owner, expired_at))
+    revoke_tokens_bulk(kind, [(owner, code) for owner, code, _ in rows])
+    codes = [str(code) for _, code, _ in rows]
+    transaction.on_commit(lambda: invalidate_verify(kind, *codes))
+    return len(rows)
+
+
+def _collector_delete_chunk(model, owner_id, ids, chunk_size):
+    queryset = model.objects.all()
+    if owner_id is not None:
+        queryset = queryset.filter(owner_id=owner_id)
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    chunk = list(queryset.order_by('id').values_list('id', flat=True)[:chunk_size])
+    if not chunk:
+        return 0
+    _, deleted_per_model = model.objects.filter(id__in=chunk).delete()
+    return deleted_per_model.get(model._meta.label, 0)
+
+
+def purge_licenses(model, owner_id=None, ids=None, chunk_size=None, on_progress=None):
+    """Xóa license của owner_id (và/hoặc trong ids) theo chunk; trả về số dòng đã xóa.
+
+    on_progress(deleted) được gọi sau mỗi chunk đã commit.
+    """
+    if owner_id is None and ids is None:
+        raise ValueError('Cần owner_id hoặc ids để xóa license')
+    chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+    delete_chunk = _raw_delete_chunk if can_raw_delete(model) else _collector_delete_chunk
+    deleted = 0
+    while True:
+        # Như Collector của Django: không tạo savepoint khi đã ở trong transaction
+        with transaction.atomic(savepoint=False):
+            count = delete_chunk(model, owner_id, ids, chunk_size)
+        deleted += count
+        if count and on_progress:
+            on_progress(deleted)
+        if count < chunk_size:
+            return deleted
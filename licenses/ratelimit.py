@@ -0,0 +1,216 @@
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import NamedTuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from rest_framework.throttling import BaseThrottle
+
+
+logger = logging.getLogger('licenses')
+
+# Giới hạn request theo token bucket cho từng (API key, endpoint).
+# - Endpoint (scope) là tên URL: verify, verify_tiktok, create_api, list_api, ...; "default" áp dụng
+#   cho endpoint không có cấu hình riêng.
+# - Thứ tự ưu tiên: UserApiKey.rate_limits[scope], UserApiKey.rate_limits["default"],
+#   API_RATE_LIMITS[scope], API_RATE_LIMITS["default"]. Giới hạn của key nằm sẵn trong cache
+#   xác thực nên việc kiểm tra không thêm truy vấn DB.
+# - Cú pháp "N/s|m|h|d[:burst]": nạp N token mỗi chu kỳ, chứa tối đa burst (mặc định N) token;
+#   "off" để không giới hạn.
+# - Bucket nằm trong Redis (script Lua, nguyên tử, dùng chung mọi worker) khi cache
+#   API_RATE_LIMIT_CACHE là RedisCache; nếu không, hoặc khi Redis lỗi, dùng bucket trong process.
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+OFF_VALUES = {'', 'off', 'none', '0'}
+LOCAL_MAX_BUCKETS = 100000
+# Sau khi Redis lỗi, dùng bucket trong process trong chừng này giây rồi mới thử lại Redis
+SHARED_RETRY_SECONDS = 5
+
+
+class Rate(NamedTuple):
+    capacity: int
+    refill: float  # token mỗi giây
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: int
+    retry_after: int
+
+
+@lru_cache(maxsize=256)
+def parse_rate(value):
+    """'100/m' -> Rate(100, 100/60); '50/s:200' -> Rate(200, 50); 'off' -> None."""
+    text = str(value if value is not None else '').strip().lower()
+    if text in OFF_VALUES:
+        return None
+    try:
+        spec, _, burst = text.partition(':')
+        count, period = spec.split('/')
+        count = int(count)
+        capacity = int(burst) if burst else count
+        if count <= 0 or capacity <= 0 or period not in PERIODS:
+            raise ValueError
+    except ValueError:
+        raise ValueError(f'Giới hạn không hợp lệ: "{value}" (dạng N/s, N/m, N/h, N/d, có thể thêm :burst)')
+    return Rate(capacity, count / PERIODS[period])
+
+
+def validate_rate_limits(value):
+    """Validator cho UserApiKey.rate_limits: {scope: "N/s[:burst]" | "off"}."""
+    if not isinstance(value, dict):
+        raise ValidationError('rate_limits phải là object {endpoint: giới hạn}')
+    for scope, rate in value.items():
+        try:
+            if not isinstance(rate, str):
+                raise ValueError(f'Giới hạn phải là chuỗi: {rate!r}')
+            parse_rate(rate)
+        except ValueError as exc:
+            raise ValidationError(f'{scope}: {exc}')
+
+
+def rate_for(scope, key_limits=None):
+    for limits in (key_limits or {}, settings.API_RATE_LIMITS):
+        for name in (scope, 'default'):
+            if name in limits:
+                return parse_rate(limits[name])
+    return None
+
+
+class _LocalBuckets:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, rate):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rate.capacity, now))
+            tokens = min(rate.capacity, tokens + (now - updated) * rate.refill)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > LOCAL_MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# KEYS[1]: bucket; ARGV: capacity, refill (token/giây). Dùng đồng hồ của Redis để các worker
+# trên nhiều máy tính cùng một mốc thời gian.
+TOKEN_BUCKET_LUA = '''
+local capacity = tonumber(ARGV[1])
+local refill = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * refill)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / refill) + 1)
+return {allowed, tostring(tokens)}
+'''
+
+
+class _SharedBuckets:
+    def __init__(self):
+        self._script = None
+        self._down_until = 0.0
+
+    def _client(self):
+        cache = caches[settings.API_RATE_LIMIT_CACHE]
+        backend = getattr(cache, '_cache', None)
+        if backend is None or not hasattr(backend, 'get_client'):
+            return None, None
+        return cache, backend.get_client(write=True)
+
+    def take(self, key, rate):
+        """(allowed, tokens) hoặc None nếu không có Redis / Redis đang lỗi."""
+        if time.monotonic() < self._down_until:
+            return None
+        cache, client = self._client()
+        if client is None:
+            return None
+        try:
+            if self._script is None:
+                self._script = client.register_script(TOKEN_BUCKET_LUA)
+            allowed, tokens = self._script(keys=[cache.make_key(key)], args=[rate.capacity, rate.refill], client=client)
+        except Exception:
+            logger.warning('Redis lỗi, tạm dùng rate limit trong process %ss', SHARED_RETRY_SECONDS, exc_info=True)
+            self._down_until = time.monotonic() + SHARED_RETRY_SECONDS
+            return None
+        return bool(allowed), float(tokens)
+
+
+local_buckets = _LocalBuckets()
+shared_buckets = _SharedBuckets()
+
+
+def check_rate_limit(key_pk, scope, key_limits=None):
+    """Lấy một token của (key, scope); trả về Decision hoặc None nếu không giới hạn."""
+    rate = rate_for(scope, key_limits)
+    if rate is None:
+        return None
+    bucket = f'ratelimit:{key_pk}:{scope}'
+    result = shared_buckets.take(bucket, rate)
+    if result is None:
+        result = local_buckets.take(bucket, rate)
+    allowed, tokens = result
+    return Decision(
+        allowed=allowed,
+        limit=rate.capacity,
+        remaining=int(tokens),
+        reset=math.ceil((rate.capacity - tokens) / rate.refill),
+        retry_after=0 if allowed else max(1, math.ceil((1 - tokens) / rate.refill)),
+    )
+
+
+def rate_limit_request(request, key_info):
+    """Kiểm tra rate limit cho HttpRequest đã xác thực bằng API key; gắn kết quả vào request.rate_limit."""
+    if key_info is None:
+        return None
+    match = getattr(request, 'resolver_match', None)
+    scope = match.url_name if match and match.url_name else 'default'
+    decision = check_rate_limit(key_info.pk, scope, key_info.rate_limits)
+    request.rate_limit = decision
+    return decision
+
+
+def rate_limit_headers(decision):
+    headers = {
+        'RateLimit-Limit': str(decision.limit),
+        'RateLimit-Remaining': str(decision.remaining),
+        'RateLimit-Reset': str(decision.reset),
+    }
+    if not decision.allowed:
+        headers['Retry-After'] = str(decision.retry_after)
+    return headers
+
+
+class APIKeyRateThrottle(BaseThrottle):
+    """Throttle của DRF (DEFAULT_THROTTLE_CLASSES) cho các view dùng APIKeyAuthentication."""
+
+    def allow_request(self, request, view):
+        key_info = request.auth if hasattr(request.auth, 'rate_limits') else None
+        self.decision = rate_limit_request(request._request, key_info)
+        return self.decision is None or self.decision.allowed
+
+    def wait(self):
+        return self.decision.retry_after
@@ -1,9 +1,15 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 
-from .models import UserApiKey
+from .auth import api_key_cache
+from .cache import KIND_TIKTOK, KIND_ZALO, invalidate_verify_on_commit
+from .catalog import invalidate_catalog
+from .models import ExtensionPackage, ExtensionPackageGroup, License, LicenseTikTok, PaymentInfo, UserApiKey
+from .stats import record_license_change
+from .tokens import revoke_tokens_bulk
 
 
 @receiver(post_save, sender=get_user_model())
@@ -18,3 +24,114 @@ def ensure_api_key(sender, instance, created, **kwargs):
     except UserApiKey.DoesNotExist:
         UserApiKey.objects.create(user=instance, key=UserApiKey.generate_key(), last_used_at=timezone.now())
 
+
+def _invalidate_api_keys(user_id):
+    api_key_cache.invalidate_user(user_id)
+    # Đổi version lần nữa sau commit: worker đọc DB trước khi commit không giữ được bản cũ
+    transaction.on_commit(lambda: api_key_cache.invalidate_user(user_id))
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_user_api_key_cache(sender, instance, **kwargs):
+    _invalidate_api_keys(instance.pk)
+
+
+@receiver(post_save, sender=UserApiKey)
+@receiver(post_delete, sender=UserApiKey)
+def invalidate_api_key_cache(sender, instance, **kwargs):
+    _invalidate_api_keys(instance.user_id)
+
+
+@receiver(post_save, sender=License)
+@receiver(post_delete, sender=License)
+def invalidate_license_verify_cache(sender, instance, **kwargs):
+    invalidate_verify_on_commit(KIND_ZALO, str(instance.code))
+
+
+@receiver(post_save, sender=LicenseTikTok)
+@receiver(post_delete, sender=LicenseTikTok)
+def invalidate_tiktok_verify_cache(sender, instance, **kwargs):
+    invalidate_verify_on_commit(KIND_TIKTOK, str(instance.code))
+
+
+@receiver(post_save, sender=ExtensionPackage)
+@receiver(post_delete, sender=ExtensionPackage)
+@receiver(post_save, sender=ExtensionPackageGroup)
+@receiver(post_delete, sender=ExtensionPackageGroup)
+@receiver(post_save, sender=PaymentInfo)
+@receiver(post_delete, sender=PaymentInfo)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    # Xóa sau khi commit để request đồng thời không ghi lại dữ liệu cũ vào cache
+    transaction.on_commit(invalidate_catalog)
+
+
+def _revoked_tokens(instance, created=False, deleted=False):
+    """Các cặp (owner_id, code) cần thu hồi token khi license bị xóa hoặc đổi trường nằm trong token."""
+    old = getattr(instance, '_loaded_token_state', None)
+    new = None if deleted else instance.token_state()
+    instance._loaded_token_state = new
+    current = (instance.owner_id, instance.code)
+    if created:
+        # License mới chưa có token
+        return []
+    if old is None:
+        # Không biết giá trị cũ (vd. instance load bằng only()): thu hồi cho chắc
+        return [current]
+    if old == new:
+        return []
+    previous = (old[1], old[0])
+    return [current] if previous == current else [previous, current]
+
+
+@receiver(post_save, sender=License)
+@receiver(post_delete, sender=License)
+def revoke_license_tokens(sender, instance, signal, created=False, **kwargs):
+    # Lưu lại mà không đổi gì (vd. sửa ghi chú) thì token đã phát hành vẫn đúng, không cần thu hồi
+    revoke_tokens_bulk(KIND_ZALO, _revoked_tokens(instance, created=created, deleted=signal is post_delete))
+
+
+@receiver(post_save, sender=LicenseTikTok)
+@receiver(post_delete, sender=LicenseTikTok)
+def revoke_tiktok_license_tokens(sender, instance, signal, created=False, **kwargs):
+    revoke_tokens_bulk(KIND_TIKTOK, _revoked_tokens(instance, created=created, deleted=signal is post_delete))
+
+
+def _track_stats(kind, instance, created=False, deleted=False):
+    if created:
+        old = None
+    elif hasattr(instance, '_loaded_expiry'):
+        old = instance._loaded_expiry
+    else:
+        # Không biết giá trị cũ (vd. instance load bằng only()): để reconcile sửa
+        return
+    new = None if deleted else (instance.owner_id, instance.expired_at)
+    record_license_change(kind, old, new)
+    instance._loaded_expiry = new
+
+
+@receiver(post_save, sender=License)
+def track_license_stats_on_save(sender, instance, created=False, **kwargs):
+    _track_stats(KIND_ZALO, instance, created=created)
+
+
+@receiver(post_delete, sender=License)
+def track_license_stats_on_delete(sender, instance, **kwargs):
+    _track_stats(KIND_ZALO, instance, deleted=True)
+
+
+@receiver(post_save, sender=LicenseTikTok)
+def track_tiktok_stats_on_save(sender, instance, created=False, **kwargs):
+    _track_stats(KIND_TIKTOK, instance, created=created)
+
+
+@receiver(post_delete, sender=LicenseTikTok)
+def track_tiktok_stats_on_delete(sender, instance, **kwargs):
+    _track_stats(KIND_TIKTOK, instance, deleted=True)
+
+
+# Receiver post_delete mà licenses.purge tự làm thay theo lô khi xóa bằng SQL thô
+BULK_DELETE_RECEIVERS = {
+    License: {invalidate_license_verify_cache, revoke_license_tokens, track_license_stats_on_delete},
+    LicenseTikTok: {invalidate_tiktok_verify_cache, revoke_tiktok_license_tokens, track_tiktok_stats_on_delete},
+}
@@ -0,0 +1,230 @@
+import weakref
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Min, Sum
+from django.utils import timezone
+
+from .cache import KIND_TIKTOK, KIND_ZALO
+from .models import License, LicenseStats, LicenseTikTok
+
+
+# Bảng license_stats giữ (total, expired, expiring_soon) của mỗi owner tại thời điểm as_of.
+# - Mỗi thay đổi license được ghi thành sự kiện (owner, loại, expired_at, +1/-1) và gộp lại,
+#   ghi xuống DB bằng một câu upsert sau khi transaction commit.
+# - advance_stats() dời as_of về hiện tại, chỉ đọc các license có expired_at vừa "vượt mốc"
+#   (index expired_at), nên chạy được thường xuyên.
+# - reconcile_stats() tính lại toàn bộ để sửa sai lệch (vd. thay đổi ngoài ORM).
+
+MODELS = {KIND_ZALO: License, KIND_TIKTOK: LicenseTikTok}
+
+
+def expiring_soon_delta():
+    return timedelta(days=int(getattr(settings, 'LICENSE_EXPIRING_SOON_DAYS', 3)))
+
+
+class _Batch:
+    def __init__(self):
+        self.events = []
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        events, self.events = self.events, []
+        _write_events(events)
+
+
+def _current_batch():
+    """Batch đang chờ commit của savepoint hiện tại, hoặc None nếu phải tạo batch mới.
+
+    Batch được giữ bằng weakref theo danh sách savepoint: chỉ on_commit giữ tham chiếu thật,
+    nên khi savepoint/transaction rollback (Django bỏ callback) batch cũng mất theo.
+    """
+    batches = getattr(connection, '_license_stats_batches', None)
+    if batches is None:
+        batches = connection._license_stats_batches = weakref.WeakValueDictionary()
+    batch = batches.get(tuple(connection.savepoint_ids))
+    return batch if batch is not None and not batch.done else None
+
+
+def record_license_change(kind, old=None, new=None):
+    """Ghi nhận thay đổi một license; old/new là (owner_id, expired_at) hoặc None."""
+    if old == new:
+        return
+    batch = _current_batch()
+    is_new = batch is None
+    if is_new:
+        batch = _Batch()
+    if old is not None and old[1] is not None:
+        batch.events.append((old[0], kind, old[1], -1))
+    if new is not None and new[1] is not None:
+        batch.events.append((new[0], kind, new[1], 1))
+    if is_new and batch.events:
+        # Ngoài transaction thì on_commit chạy ngay
+        transaction.on_commit(batch)
+        connection._license_stats_batches[tuple(connection.savepoint_ids)] = batch
+
+
+def record_licenses_created(kind, licenses):
+    for obj in licenses:
+        record_license_change(kind, new=(obj.owner_id, obj.expired_at))
+
+
+def _write_events(events):
+    if not events:
+        return
+    now = timezone.now()
+    soon = expiring_soon_delta()
+    owners, kinds, expiries, signs = (list(column) for column in zip(*events))
+    table = connection.ops.quote_name(LicenseStats._meta.db_table)
+    user_table = connection.ops.quote_name(LicenseStats._meta.get_field('owner').related_model._meta.db_table)
+    with connection.cursor() as cursor:
+        # Dòng mới tính theo now; dòng đã có tính theo as_of của chính dòng đó.
+        # Bỏ qua owner đã bị xóa (license bị xóa cascade cùng user).
+        cursor.execute(
+            f'''
+            WITH e AS (
+                SELECT * FROM unnest(%s::integer[], %s::varchar[], %s::timestamptz[], %s::integer[])
+                    AS e(owner_id, kind, expired_at, sign)
+            )
+            INSERT INTO {table} AS s (owner_id, license_type, total, expired, expiring_soon, as_of, updated_at)
+            SELECT e.owner_id, e.kind, SUM(e.sign),
+                   COALESCE(SUM(e.sign) FILTER (WHERE e.expired_at <= %s), 0),
+                   COALESCE(SUM(e.sign) FILTER (WHERE e.expired_at > %s AND e.expired_at <= %s), 0),
+                   %s, %s
+            FROM e
+            WHERE EXISTS (SELECT 1 FROM {user_table} u WHERE u.id = e.owner_id)
+            GROUP BY e.owner_id, e.kind
+            ON CONFLICT (owner_id, license_type) DO UPDATE SET
+                total = s.total + EXCLUDED.total,
+                expired = s.expired + COALESCE((
+                    SELECT SUM(e.sign) FROM e
+                    WHERE e.owner_id = s.owner_id AND e.kind = s.license_type AND e.expired_at <= s.as_of
+                ), 0),
+                expiring_soon = s.expiring_soon + COALESCE((
+                    SELECT SUM(e.sign) FROM e
+                    WHERE e.owner_id = s.owner_id AND e.kind = s.license_type
+                      AND e.expired_at > s.as_of AND e.expired_at <= s.as_of + %s
+                ), 0),
+                updated_at = EXCLUDED.updated_at
+            ''',
+            [owners, kinds, expiries, signs, now, now, now + soon, now, now, soon],
+        )
+
+
+def advance_stats(now=None):
+    """Dời as_of của mọi dòng về `now`, cộng dồn các license vừa hết hạn / vừa vào diện sắp hết hạn."""
+    now = now or timezone.now()
+    soon = expiring_soon_delta()
+    table = connection.ops.quote_name(LicenseStats._meta.db_table)
+    updated = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        for kind, model in MODELS.items():
+            license_table = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(f'SELECT MIN(as_of) FROM {table} WHERE license_type = %s', [kind])
+            min_as_of = cursor.fetchone()[0]
+            if min_as_of is None or min_as_of >= now:
+                continue
+            cursor.execute(
+                f'''
+                WITH c AS (
+                    SELECT s.id,
+                           COUNT(*) FILTER (WHERE l.expired_at > s.as_of AND l.expired_at <= %s) AS newly_expired,
+                           COUNT(*) FILTER (WHERE l.expired_at > s.as_of + %s AND l.expired_at <= %s) AS newly_soon
+                    FROM {table} s
+                    JOIN {license_table} l ON l.owner_id = s.owner_id
+                    WHERE s.license_type = %s AND s.as_of < %s
+                      AND ((l.expired_at > %s AND l.expired_at <= %s) OR (l.expired_at > %s AND l.expired_at <= %s))
+                    GROUP BY s.id
+                )
+                UPDATE {table} s
+                SET expired = s.expired + c.newly_expired,
+                    expiring_soon = s.expiring_soon - c.newly_expired + c.newly_soon
+                FROM c
+                WHERE s.id = c.id
+                ''',
+                [now, soon, now + soon, kind, now, min_as_of, now, min_as_of + soon, now + soon],
+            )
+            cursor.execute(
+                f'UPDATE {table} SET as_of = %s, updated_at = %s WHERE license_type = %s AND as_of < %s',
+                [now, now, kind, now],
+            )
+            updated += cursor.rowcount
+    return updated
+
+
+def reconcile_stats(now=None):
+    """Tính lại toàn bộ từ bảng license; trả về số dòng bị sai lệch đã được sửa."""
+    now = now or timezone.now()
+    soon = expiring_soon_delta()
+    table = connection.ops.quote_name(LicenseStats._meta.db_table)
+    fixed = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        advance_stats(now)
+        for kind, model in MODELS.items():
+            license_table = connection.ops.quote_name(model._meta.db_table)
+            cursor.execute(
+                f'''
+                INSERT INTO {table} AS s (owner_id, license_type, total, expired, expiring_soon, as_of, updated_at)
+                SELECT owner_id, %s, COUNT(*),
+                       COUNT(*) FILTER (WHERE expired_at <= %s),
+                       COUNT(*) FILTER (WHERE expired_at > %s AND expired_at <= %s),
+                       %s, %s
+                FROM {license_table}
+                GROUP BY owner_id
+                ON CONFLICT (owner_id, license_type) DO UPDATE SET
+                    total = EXCLUDED.total,
+                    expired = EXCLUDED.expired,
+                    expiring_soon = EXCLUDED.expiring_soon,
+                    as_of = EXCLUDED.as_of,
+                    updated_at = EXCLUDED.updated_at
+                WHERE (s.total, s.expired, s.expiring_soon, s.as_of)
+                      IS DISTINCT FROM (EXCLUDED.total, EXCLUDED.expired, EXCLUDED.expiring_soon, EXCLUDED.as_of)
+                ''',
+                [kind, now, now, now + soon, now, now],
+            )
+            fixed += cursor.rowcount
+            # Owner không còn license nào
+            cursor.execute(
+                f'''
+                UPDATE {table} s
+                SET total = 0, expired = 0, expiring_soon = 0, as_of = %s, updated_at = %s
+                WHERE s.license_type = %s AND s.total <> 0
+                  AND NOT EXISTS (SELECT 1 FROM {license_table} l WHERE l.owner_id = s.owner_id)
+                ''',
+                [now, now, kind],
+            )
+            fixed += cursor.rowcount
+    return fixed
+
+
+def _stats_to_dict(total=0, expired=0, expiring_soon=0):
+    return {
+        'total': total,
+        'active': total - expired,
+        'expired': expired,
+        'expiring_soon': expiring_soon,
+    }
+
+
+def owner_stats(owner_id=None):
+    """Số liệu của một owner (hoặc cộng tất cả owner nếu owner_id là None) theo từng loại license.
+
+    Trả về ({kind: {...}}, as_of); một truy vấn trên bảng license_stats.
+    """
+    rows = LicenseStats.objects.order_by()
+    if owner_id is not None:
+        rows = rows.filter(owner_id=owner_id)
+    rows = rows.values('license_type').annotate(
+        sum_total=Sum('total'),
+        sum_expired=Sum('expired'),
+        sum_expiring_soon=Sum('expiring_soon'),
+        min_as_of=Min('as_of'),
+    )
+    data = {kind: _stats_to_dict() for kind in MODELS}
+    as_of = None
+    for row in rows:
+        data[row['license_type']] = _stats_to_dict(row['sum_total'], row['sum_expired'], row['sum_expiring_soon'])
+        as_of = row['min_as_of'] if as_of is None else min(as_of, row['min_as_of'])
+    return data, as_of
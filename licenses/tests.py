@@ -1,3 +1,1593 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import IntegrityError, connection, router, transaction
+from django.db.models.signals import post_delete
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, resolve
+from django.utils import timezone
+
+from . import async_views, db_router, urls, urls_api
+from .auth import api_key_cache
+from .banks import bank_directory
+from .bulk import bulk_create_licenses, bulk_create_tiktok_licenses, bulk_extend
+from .cache import KIND_TIKTOK, KIND_ZALO, NOT_FOUND, get_verify_entry, set_verify_entry
+from .checks import check_replica_pin
+from .imports import import_licenses
+from .jobs import _split_upload, claim_job, enqueue_import, run_pending_jobs
+from .loadtest import format_results
+from .management.commands.bench_suite import Command as BenchSuiteCommand
+from .archive import archive_expired, restore_archived
+from .metrics import registry as metrics_registry
+from .pagination import keyset_window
+from .middleware import QueryStatsMiddleware, ReplicaRoutingMiddleware
+from .purge import can_raw_delete, purge_licenses
+from .ratelimit import local_buckets
+from .stats import advance_stats, owner_stats, reconcile_stats
+from .tokens import decode_token
+from .vietqr import ascii_content, build_payload, crc16, qr_images
+from .models import (
+    ArchivedLicense,
+    ExtensionPackage,
+    ExtensionPackageGroup,
+    License,
+    LicenseJob,
+    LicenseStats,
+    LicenseTikTok,
+    PaymentInfo,
+    RevokedLicenseToken,
+    UserApiKey,
+)
+
+
+USERS = 3
+LICENSES_PER_USER = 25
+
+
+TEST_MEDIA_ROOT = tempfile.mkdtemp(prefix='license-media-')
+
+
+def tearDownModule():
+    shutil.rmtree(TEST_MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=TEST_MEDIA_ROOT)
+class QueryBudgetTestCase(TestCase):
+    """Seed dữ liệu giống thực tế và kiểm tra số truy vấn tối đa của từng URL."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        now = timezone.now()
+        cls.superuser = User.objects.create_user('admin', password='pass', is_superuser=True, is_staff=True)
+        cls.users = [User.objects.create_user(f'user{i}', password='pass') for i in range(USERS)]
+        for index, owner in enumerate([cls.superuser, *cls.users]):
+            License.objects.bulk_create(
+                [
+                    License(
+                        owner=owner,
+                        phone_number=f'09{index:02d}{i:06d}',
+                        expired_at=now + timedelta(days=i - 5),
+                    )
+                    for i in range(LICENSES_PER_USER)
+                ]
+            )
+            LicenseTikTok.objects.bulk_create(
+                [
+                    LicenseTikTok(owner=owner, shop_id=f'shop-{index}-{i}', expired_at=now + timedelta(days=i - 5))
+                    for i in range(LICENSES_PER_USER)
+                ]
+            )
+        group = ExtensionPackageGroup.objects.create(name='Zalo', code='zalo')
+        cls.package = ExtensionPackage.objects.create(group=group, name='1 tháng', days=30, amount=100000)
+        ExtensionPackage.objects.create(group=group, name='1 năm', days=365, amount=1000000)
+        cls.payment = PaymentInfo.objects.create(
+            account_name='NGUYEN VAN A',
+            account_number='0123456789',
+            bank_code='VCB',
+            bank_name='Vietcombank',
+            note='{phone_number}',
+        )
+        cls.user = cls.users[0]
+        cls.license = cls.user.licenses.order_by('id').first()
+        cls.tiktok = cls.user.tiktok_licenses.order_by('id').first()
+        # on_commit không chạy trong setUpTestData nên tính license_stats một lần
+        reconcile_stats()
+
+    def setUp(self):
+        cache.clear()
+        api_key_cache.clear()
+        local_buckets.clear()
+        qr_images.clear()
+
+    def assertQueryBudget(self, budget, func, *args, **kwargs):
+        with CaptureQueriesContext(connection) as ctx:
+            response = func(*args, **kwargs)
+        if hasattr(response, 'streaming_content'):
+            with CaptureQueriesContext(connection) as stream_ctx:
+                b''.join(response.streaming_content)
+            captured = ctx.captured_queries + stream_ctx.captured_queries
+        else:
+            captured = ctx.captured_queries
+        self.assertLessEqual(
+            len(captured),
+            budget,
+            f'{len(captured)} queries > budget {budget}:\n' + '\n'.join(q['sql'] for q in captured),
+        )
+        return response
+
+    def api_client(self, user=None):
+        user = user or self.user
+        self.client.defaults['HTTP_X_API_KEY'] = user.api_key.key
+        return self.client
+
+    def web_client(self, user=None):
+        self.client.force_login(user or self.user)
+        return self.client
+
+
+class DashboardQueryBudgetTests(QueryBudgetTestCase):
+    def test_dashboard(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(6, client.get, '/license/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_superuser_filters(self):
+        client = self.web_client(self.superuser)
+        response = self.assertQueryBudget(
+            8, client.get, '/license/', {'q': '09', 'status': 'active', 'days_max': '30', 'page': 2}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_keyset_pages(self):
+        client = self.web_client(self.superuser)
+        seen = []
+        params = {'per_page': 30}
+        while True:
+            response = self.assertQueryBudget(8, client.get, '/license/', params)
+            seen.extend(obj.id for obj in response.context['licenses'])
+            keyset = response.context['keyset']
+            if not keyset.has_next:
+                break
+            params = {'per_page': 30, 'after': keyset.next_cursor}
+        expected = list(License.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+        # Quay lại trang trước bằng cursor "before"
+        response = client.get('/license/', {'per_page': 30, 'before': keyset.previous_cursor})
+        self.assertEqual([obj.id for obj in response.context['licenses']], expected[60:90])
+        self.assertEqual(response.context['total_label'], str(len(expected)))
+
+    def test_dashboard_search(self):
+        client = self.web_client()
+        code = str(self.license.code)
+        for q in (code, code.upper(), code[:13], self.license.phone_number, self.license.phone_number[2:8]):
+            response = self.assertQueryBudget(6, client.get, '/license/', {'q': q, 'per_page': 100})
+            self.assertIn(self.license, response.context['licenses'], q)
+        response = client.get('/license/', {'q': self.license.phone_number})
+        self.assertEqual(list(response.context['licenses']), [self.license])
+
+    def test_dashboard_search_substring_of_full_number(self):
+        prefixed = License.objects.create(owner=self.user, phone_number='+84912345678', expired_at=timezone.now() + timedelta(days=1))
+        longer = License.objects.create(owner=self.user, phone_number='09123456789', expired_at=timezone.now() + timedelta(days=1))
+        client = self.web_client()
+        response = client.get('/license/', {'q': '84912345678', 'per_page': 100})
+        self.assertIn(prefixed, response.context['licenses'])
+        response = client.get('/license/', {'q': '0912345678', 'per_page': 100})
+        self.assertIn(longer, response.context['licenses'])
+        # Đoạn giữa của code (không phải phần đầu) vẫn tìm được
+        response = client.get('/license/', {'q': str(prefixed.code)[14:23], 'per_page': 100})
+        self.assertIn(prefixed, response.context['licenses'])
+
+    def test_dashboard_tiktok_search_owner(self):
+        client = self.web_client(self.superuser)
+        response = client.get('/license/tiktok/', {'q': self.user.username, 'per_page': 100})
+        self.assertEqual({obj.owner_id for obj in response.context['licenses']}, {self.user.id})
+        self.assertEqual(len(response.context['licenses']), LICENSES_PER_USER)
+
+    @override_settings(DASHBOARD_COUNT_CAP=20)
+    def test_dashboard_total_capped(self):
+        client = self.web_client(self.superuser)
+        response = client.get('/license/', {'q': '09'})
+        self.assertEqual(response.context['total_label'], 'hơn 20')
+
+    @override_settings(DASHBOARD_PAGINATION='offset', DASHBOARD_PAGE_SIZE=7)
+    def test_dashboard_offset_mode(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(6, client.get, '/license/', {'page': 2})
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['licenses']), 7)
+
+    def test_dashboard_delete_selected(self):
+        client = self.web_client()
+        ids = list(self.user.licenses.values_list('id', flat=True)[:5])
+        response = self.assertQueryBudget(
+            4, client.post, '/license/', {'action': 'delete_selected', 'selected_ids': ids}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(License.objects.filter(id__in=ids).exists())
+
+    def test_dashboard_create(self):
+        client = self.web_client(self.superuser)
+        numbers = '\n'.join(f'0800{i:06d}' for i in range(200))
+        response = self.assertQueryBudget(
+            10, client.post, '/license/', {'action': 'create', 'phone_numbers': numbers, 'expires_in': 30}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(License.objects.filter(phone_number__startswith='0800').count(), 200)
+
+    def test_dashboard_import(self):
+        client = self.web_client(self.superuser)
+        upload = SimpleUploadedFile('a.txt', b'0400000001\n0400000002\n')
+        response = self.assertQueryBudget(
+            9, client.post, '/license/', {'action': 'import', 'file': upload, 'expires_in': 10, 'owner_id': self.user.id}
+        )
+        self.assertEqual(response.status_code, 302)
+        job = LicenseJob.objects.get()
+        self.assertEqual((job.kind, job.license_type, job.total), ('import', 'zalo', None))
+        self.assertEqual(job.params['owner_id'], self.user.id)
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.total), (LicenseJob.STATUS_DONE, 2))
+
+    def test_dashboard_import_unknown_owner(self):
+        client = self.web_client(self.superuser)
+        upload = SimpleUploadedFile('a.txt', b'0400000001\n')
+        response = client.post('/license/', {'action': 'import', 'file': upload, 'expires_in': 10, 'owner_id': 10**9})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(LicenseJob.objects.exists())
+
+    def test_dashboard_tiktok(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(7, client.get, '/license/tiktok/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_tiktok_superuser_filters(self):
+        client = self.web_client(self.superuser)
+        response = self.assertQueryBudget(
+            8, client.get, '/license/tiktok/', {'q': 'shop', 'status': 'expired', 'user_id': self.user.id}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_tiktok_delete_selected(self):
+        client = self.web_client()
+        ids = list(self.user.tiktok_licenses.values_list('id', flat=True)[:5])
+        response = self.assertQueryBudget(
+            4, client.post, '/license/tiktok/', {'action': 'delete_selected', 'selected_ids': ids}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(LicenseTikTok.objects.filter(id__in=ids).exists())
+
+    def test_profile(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(3, client.get, '/license/profile/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_extend(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(4, client.post, f'/license/licenses/{self.license.pk}/extend/', {'expires_in': 10})
+        self.assertEqual(response.status_code, 302)
+
+    def test_delete(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(4, client.post, f'/license/licenses/{self.license.pk}/delete/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_extend_tiktok(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(4, client.post, f'/license/tiktok/{self.tiktok.pk}/extend/', {'expires_in': 10})
+        self.assertEqual(response.status_code, 302)
+
+    def test_delete_tiktok(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(4, client.post, f'/license/tiktok/{self.tiktok.pk}/delete/')
+        self.assertEqual(response.status_code, 302)
+
+    def test_get_packages(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(3, client.get, '/license/packages/', {'group_code': 'zalo'})
+        self.assertEqual(len(response.json()['packages']), 2)
+
+    def test_get_payment_info(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(3, client.get, '/license/payment-info/')
+        self.assertEqual(response.json()['id'], self.payment.id)
+
+    def test_banks(self):
+        response = self.assertQueryBudget(0, self.client.get, '/license/banks.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertTrue(response.json())
+
+        payload, version = bank_directory.payload()
+        response = self.client.get('/license/banks.json', {'v': version}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('immutable', response['Cache-Control'])
+
+    def test_renewal_bootstrap(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(4, client.get, '/license/renewal/', {'group_code': 'zalo'})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([p['days'] for p in data['packages']], [30, 365])
+        self.assertEqual(data['payment_info']['id'], self.payment.id)
+
+        # Đã có trong cache: chỉ còn truy vấn session/user, kể cả khi tạo QR ngay sau đó
+        response = self.assertQueryBudget(2, client.get, '/license/renewal/', {'group_code': 'zalo'})
+        self.assertEqual(response.json(), data)
+        response = self.assertQueryBudget(
+            3,
+            client.get,
+            '/license/qr-code/',
+            {'payment_id': self.payment.id, 'package_id': self.package.id, 'license_id': self.license.id},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.get('/license/renewal/', {'group_code': 'tiktok'}).json()['packages'], [])
+
+    def test_renewal_bootstrap_invalidated_on_save(self):
+        client = self.web_client()
+        client.get('/license/renewal/', {'group_code': 'zalo'})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.package.amount = 150000
+            self.package.save()
+        data = client.get('/license/renewal/', {'group_code': 'zalo'}).json()
+        self.assertEqual(data['packages'][0]['amount'], 150000)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.delete()
+        self.assertIsNone(client.get('/license/renewal/', {'group_code': 'zalo'}).json()['payment_info'])
+        self.assertEqual(client.get('/license/payment-info/').status_code, 404)
+
+    def test_generate_qr(self):
+        client = self.web_client()
+        response = self.assertQueryBudget(
+            5,
+            client.get,
+            '/license/qr-code/',
+            {'payment_id': self.payment.id, 'package_id': self.package.id, 'license_id': self.license.id},
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['qr_code'].startswith('/license/qr-code/image/?'))
+        self.assertIn('0006970436', data['qr_payload'])  # BIN của VCB trong banks.json
+        self.assertIn(f'lzl 30 {self.license.phone_number}', data['qr_payload'])
+
+    def test_generate_qr_image(self):
+        client = self.web_client()
+        params = {'payment_id': self.payment.id, 'package_id': self.package.id, 'license_id': self.license.id}
+        url = client.get('/license/qr-code/', params).json()['qr_code']
+
+        # Ảnh đã có trong LRU từ lúc tạo URL: chỉ còn truy vấn session/user
+        response = self.assertQueryBudget(2, client.get, url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response.content.startswith(b'\x89PNG'))
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        response = client.get(url + '&format=svg')
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+
+        # Process khác (LRU trống) tính lại từ DB
+        qr_images.clear()
+        response = self.assertQueryBudget(5, client.get, url)
+        self.assertEqual(response.status_code, 200)
+
+        # Link cũ (version khác) không được cache lâu dài
+        response = client.get('/license/qr-code/image/', {**params, 'v': 'stale'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+        self.assertEqual(client.get('/license/qr-code/image/', {**params, 'format': 'gif'}).status_code, 400)
+        self.assertEqual(self.web_client(self.users[1]).get(url).status_code, 403)
+
+
+class ApiQueryBudgetTests(QueryBudgetTestCase):
+    def test_verify(self):
+        client = self.api_client()
+        payload = {'code': str(self.license.code), 'phone_number': self.license.phone_number}
+        response = self.assertQueryBudget(3, client.post, '/verify', payload, content_type='application/json')
+        self.assertIn(response.status_code, (200, 410))
+        # Lần gọi lại dùng cache API key và cache verify
+        self.assertQueryBudget(0, client.post, '/verify', payload, content_type='application/json')
+
+    def test_verify_batch(self):
+        client = self.api_client()
+        items = [{'code': str(obj.code), 'phone_number': obj.phone_number} for obj in License.objects.all()]
+        response = self.assertQueryBudget(3, client.post, '/verify/batch', {'items': items}, content_type='application/json')
+        self.assertEqual(len(response.json()['data']), len(items))
+
+    def test_verify_cache_stats(self):
+        client = self.api_client(self.superuser)
+        response = self.assertQueryBudget(2, client.get, '/verify/cache-stats')
+        self.assertEqual(response.status_code, 200)
+
+    def test_license_stats(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(3, client.get, '/stats')
+        data = response.json()['data']
+        self.assertEqual(data['zalo']['total'], LICENSES_PER_USER)
+        self.assertEqual(data['zalo']['expired'], 6)
+        self.assertEqual(data['zalo']['expiring_soon'], 3)
+        self.assertEqual(data['tiktok']['active'], LICENSES_PER_USER - 6)
+
+        # Superuser xem tổng mọi owner hoặc một owner qua user_id
+        client = self.api_client(self.superuser)
+        data = self.assertQueryBudget(3, client.get, '/stats').json()['data']
+        self.assertEqual(data['zalo']['total'], License.objects.count())
+        data = client.get('/stats', {'user_id': self.user.id}).json()['data']
+        self.assertEqual(data['tiktok']['total'], LICENSES_PER_USER)
+
+    @override_settings(LICENSE_TOKEN_SECRET='test-secret')
+    def test_verify_with_token(self):
+        client = self.api_client()
+        self.license.expired_at = timezone.now() + timedelta(days=30)
+        self.license.save()
+        payload = {'code': str(self.license.code), 'phone_number': self.license.phone_number, 'token': True}
+        response = self.assertQueryBudget(3, client.post, '/verify', payload, content_type='application/json')
+        token = decode_token(response.json()['token'])
+        self.assertEqual(token['code'], str(self.license.code))
+        self.assertEqual(token['phone_number'], self.license.phone_number)
+        self.assertLessEqual(token['exp'], token['expired_at'])
+        self.assertIsNone(decode_token(response.json()['token'] + 'x'))
+
+    @override_settings(LICENSE_TOKEN_SECRET='test-secret')
+    def test_token_key(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(2, client.get, '/tokens/key')
+        self.assertEqual(response.json()['alg'], 'HS256')
+
+    @override_settings(LICENSE_TOKEN_SECRET='test-secret')
+    def test_token_revocations(self):
+        self.license.delete()
+        client = self.api_client()
+        response = self.assertQueryBudget(3, client.get, '/tokens/revocations')
+        self.assertEqual([item['code'] for item in response.json()['data']], [str(self.license.code)])
+
+    @override_settings(LICENSE_TOKEN_SECRET='test-secret')
+    def test_token_revoked_only_on_token_fields(self):
+        license_obj = License.objects.get(pk=self.license.pk)
+        license_obj.save()
+        license_obj.save(update_fields=['updated_at'])
+        self.assertFalse(RevokedLicenseToken.objects.exists())
+
+        old_code = license_obj.code
+        license_obj.code = uuid.uuid4()
+        license_obj.save()
+        self.assertEqual(
+            set(RevokedLicenseToken.objects.values_list('code', flat=True)), {old_code, license_obj.code}
+        )
+
+        RevokedLicenseToken.objects.all().delete()
+        license_obj.expired_at += timedelta(days=1)
+        license_obj.save()
+        self.assertEqual(RevokedLicenseToken.objects.count(), 1)
+
+    @override_settings(LICENSE_TOKEN_SECRET='test-secret', LICENSE_TOKEN_MAX_AGE=3600)
+    def test_prune_token_revocations(self):
+        self.license.delete()
+        RevokedLicenseToken.objects.update(revoked_at=timezone.now() - timedelta(hours=2))
+        self.tiktok.delete()
+        call_command('prune_token_revocations', stdout=io.StringIO())
+        self.assertEqual(list(RevokedLicenseToken.objects.values_list('license_type', flat=True)), ['tiktok'])
+
+    def test_create(self):
+        client = self.api_client()
+        phone_numbers = [f'0700{i:06d}' for i in range(500)] + [self.license.phone_number]
+        response = self.assertQueryBudget(
+            8, client.post, '/create', {'phone_numbers': phone_numbers, 'expires_in': 30}, content_type='application/json'
+        )
+        self.assertEqual(len(response.json()['data']), 500)
+
+    def test_list(self):
+        client = self.api_client(self.superuser)
+        response = self.assertQueryBudget(4, client.get, '/list', {'limit': 50})
+        self.assertEqual(len(response.json()['data']), 50)
+
+    def test_list_search(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(4, client.get, '/list', {'q': str(self.license.code)[:8]})
+        self.assertIn(str(self.license.code), [item['code'] for item in response.json()['data']])
+        response = client.get('/tiktok/list', {'q': self.tiktok.shop_id.upper()})
+        self.assertEqual([item['code'] for item in response.json()['data']], [str(self.tiktok.code)])
+
+    def test_list_not_modified(self):
+        client = self.api_client()
+        etag = client.get('/list')['ETag']
+        # Chỉ còn câu aggregate tính ETag, không đọc các dòng
+        response = self.assertQueryBudget(1, client.get, '/list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(client.get('/list', {'limit': 5}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.license.phone_number = '0999999999'
+        self.license.save()
+        response = client.get('/list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_export(self):
+        client = self.api_client(self.superuser)
+        response = self.assertQueryBudget(3, client.get, '/export')
+        self.assertEqual(response.status_code, 200)
+
+    def test_update(self):
+        client = self.api_client()
+        codes = [str(code) for code in self.user.licenses.values_list('code', flat=True)]
+        response = self.assertQueryBudget(
+            3, client.put, '/update', {'code': codes, 'expires_in': 30}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['updated_count'], LICENSES_PER_USER)
+
+    def test_delete(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(
+            4, client.delete, '/delete', {'code': str(self.license.code)}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_all(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(4, client.delete, '/delete-all')
+        self.assertEqual(response.json()['deleted_count'], LICENSES_PER_USER)
+
+    def test_delete_all_background(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(4, client.delete, '/delete-all?background=1')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['job_id']
+        self.assertEqual(response.json()['job']['total'], LICENSES_PER_USER)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(run_pending_jobs(), 1)
+        self.assertFalse(self.user.licenses.exists())
+
+        response = self.assertQueryBudget(3, client.get, f'/jobs/{job_id}')
+        data = response.json()['data']
+        self.assertEqual(data['status'], 'done')
+        self.assertEqual(data['progress'], 1.0)
+        self.assertEqual(data['result'], {'deleted_count': LICENSES_PER_USER})
+        # Job của người khác
+        self.assertEqual(self.api_client(self.users[1]).get(f'/jobs/{job_id}').status_code, 404)
+
+    @override_settings(IMPORT_CHUNK_SIZE=1000)
+    def test_import(self):
+        client = self.api_client()
+        lines = ['phone_number'] + [f'0600{i:06d}' for i in range(2500)]
+        lines += [self.license.phone_number, '0600000001', '0' * 30, '']
+        upload = SimpleUploadedFile('numbers.csv', '\n'.join(lines).encode(), content_type='text/csv')
+        response = self.assertQueryBudget(7, client.post, '/import', {'file': upload, 'expires_in': 30})
+        self.assertEqual(response.status_code, 202)
+        job = LicenseJob.objects.get(pk=response.json()['job_id'])
+        # Request chỉ lưu file; worker chia chunk
+        self.assertIsNone(job.total)
+        self.assertFalse(job.chunks.exists())
+        upload_name = job.upload.name
+        self.assertTrue(job.upload.storage.exists(upload_name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, LicenseJob.STATUS_DONE)
+        self.assertEqual(job.total, 2503)
+        self.assertFalse(job.upload.storage.exists(upload_name))
+        self.assertEqual(job.result, {'created': 2500, 'skipped': 2, 'invalid': 1})
+        self.assertEqual(job.processed, 2503)
+        self.assertFalse(job.chunks.exists())
+        self.assertEqual(self.user.licenses.count(), LICENSES_PER_USER + 2500)
+        self.assertEqual(reconcile_stats(), 0)
+
+    def test_import_tiktok_for_other_user(self):
+        client = self.api_client(self.superuser)
+        upload = SimpleUploadedFile('shops.txt', b'shop-a\r\nshop-b\r\n', content_type='text/plain')
+        response = self.assertQueryBudget(
+            8, client.post, '/tiktok/import', {'file': upload, 'expires_in': 7, 'owner_id': self.user.id}
+        )
+        self.assertEqual(response.status_code, 202)
+        run_pending_jobs()
+        self.assertEqual(set(self.user.tiktok_licenses.filter(shop_id__in=['shop-a', 'shop-b']).values_list('shop_id', flat=True)), {'shop-a', 'shop-b'})
+
+    def test_import_errors(self):
+        client = self.api_client()
+        cases = [
+            ({'expires_in': 1}, 400),
+            ({'file': SimpleUploadedFile('a.csv', b'phone_number\n\n'), 'expires_in': 1}, 400),
+            ({'file': SimpleUploadedFile('a.csv', b'\xff\xfe\x00\x81'), 'expires_in': 1}, 400),
+            ({'file': SimpleUploadedFile('a.csv', b'0911111111'), 'expires_in': 0}, 400),
+            ({'file': SimpleUploadedFile('a.csv', b'0911111111'), 'expires_in': 1, 'owner_id': self.users[1].id}, 403),
+        ]
+        for data, expected in cases:
+            self.assertEqual(client.post('/import', data).status_code, expected, data)
+        self.assertFalse(LicenseJob.objects.exists())
+
+    def test_users_create(self):
+        client = self.api_client(self.superuser)
+        payload = {'username': 'newuser', 'password': 'StrongPass123'}
+        response = self.assertQueryBudget(6, client.post, '/users/create', payload, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_admin_users_create(self):
+        client = self.api_client(self.superuser)
+        payload = {'username': 'newuser2', 'password': 'StrongPass123'}
+        response = self.assertQueryBudget(
+            6, client.post, '/admin/users/create', payload, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+
+    def test_verify_tiktok(self):
+        client = self.api_client()
+        payload = {'code': str(self.tiktok.code), 'shop_id': self.tiktok.shop_id}
+        response = self.assertQueryBudget(3, client.post, '/tiktok/verify', payload, content_type='application/json')
+        self.assertIn(response.status_code, (200, 410))
+
+    def test_verify_tiktok_batch(self):
+        client = self.api_client()
+        items = [{'code': str(obj.code), 'shop_id': obj.shop_id} for obj in LicenseTikTok.objects.all()]
+        response = self.assertQueryBudget(
+            3, client.post, '/tiktok/verify/batch', {'items': items}, content_type='application/json'
+        )
+        self.assertEqual(len(response.json()['data']), len(items))
+
+    def test_create_tiktok(self):
+        client = self.api_client()
+        shop_ids = [f'new-shop-{i}' for i in range(500)] + [self.tiktok.shop_id]
+        response = self.assertQueryBudget(
+            6, client.post, '/tiktok/create', {'shop_ids': shop_ids, 'expires_in': 30}, content_type='application/json'
+        )
+        self.assertEqual(len(response.json()['data']), 500)
+
+    def test_list_tiktok(self):
+        client = self.api_client(self.superuser)
+        response = self.assertQueryBudget(4, client.get, '/tiktok/list', {'limit': 50})
+        self.assertEqual(len(response.json()['data']), 50)
+
+    def test_export_tiktok(self):
+        client = self.api_client(self.superuser)
+        response = self.assertQueryBudget(3, client.get, '/tiktok/export')
+        self.assertEqual(response.status_code, 200)
+
+    def test_update_tiktok(self):
+        client = self.api_client()
+        payload = {'id': self.tiktok.id, 'shop_id': 'renamed-shop'}
+        response = self.assertQueryBudget(5, client.put, '/tiktok/update', payload, content_type='application/json')
+        self.assertEqual(response.json()['data']['owner_username'], self.user.username)
+
+    def test_extend_tiktok(self):
+        client = self.api_client()
+        payload = {'code': [str(self.tiktok.code)], 'expires_in': 30}
+        response = self.assertQueryBudget(3, client.put, '/tiktok/extend', payload, content_type='application/json')
+        self.assertEqual(response.json()['updated_count'], 1)
+
+    def test_delete_tiktok(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(
+            4, client.delete, '/tiktok/delete', {'id': self.tiktok.id}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_all_tiktok(self):
+        client = self.api_client()
+        response = self.assertQueryBudget(4, client.delete, '/tiktok/delete-all')
+        self.assertEqual(response.json()['deleted_count'], LICENSES_PER_USER)
+
+
+class AsyncApiQueryBudgetTests(QueryBudgetTestCase):
+    """View async (ASYNC_API_VIEWS) phải trả cùng kết quả và không tốn thêm truy vấn."""
+
+    def call(self, view, method, path, data=None, user=None):
+        factory = AsyncRequestFactory()
+        headers = {'X-API-Key': (user or self.user).api_key.key}
+        if method == 'post':
+            request = factory.post(path, data, content_type='application/json', headers=headers)
+        else:
+            request = factory.get(path, data, headers=headers)
+        return async_to_sync(view)(request)
+
+    def test_verify(self):
+        payload = {'code': str(self.license.code), 'phone_number': self.license.phone_number}
+        response = self.assertQueryBudget(3, self.call, async_views.verify_license, 'post', '/verify', payload)
+        expected = self.api_client().post('/verify', payload, content_type='application/json')
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+        self.assertQueryBudget(0, self.call, async_views.verify_license, 'post', '/verify', payload)
+
+    def test_verify_errors(self):
+        response = self.call(async_views.verify_license, 'post', '/verify', {'code': str(self.license.code)})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(json.loads(response.content)['error'], 'phone_number là bắt buộc')
+        response = self.call(async_views.verify_license, 'get', '/verify')
+        self.assertEqual(response.status_code, 405)
+        request = AsyncRequestFactory().post('/verify', {}, content_type='application/json', headers={'X-API-Key': 'bad'})
+        self.assertEqual(async_to_sync(async_views.verify_license)(request).status_code, 403)
+
+    def test_verify_tiktok(self):
+        payload = {'code': str(self.tiktok.code), 'shop_id': self.tiktok.shop_id}
+        response = self.assertQueryBudget(3, self.call, async_views.verify_tiktok_license, 'post', '/tiktok/verify', payload)
+        self.assertIn(response.status_code, (200, 410))
+
+    def test_list(self):
+        response = self.assertQueryBudget(
+            4, self.call, async_views.list_license_api, 'get', '/list', {'limit': 50}, user=self.superuser
+        )
+        data = json.loads(response.content)
+        expected = self.api_client(self.superuser).get('/list', {'limit': 50}).json()
+        self.assertEqual(data, expected)
+        response = self.call(
+            async_views.list_license_api, 'get', '/list', {'limit': 50, 'cursor': data['next_cursor']}, user=self.superuser
+        )
+        self.assertEqual(len(json.loads(response.content)['data']), 50)
+
+    def test_list_tiktok(self):
+        response = self.assertQueryBudget(4, self.call, async_views.list_tiktok_license_api, 'get', '/tiktok/list')
+        self.assertEqual(len(json.loads(response.content)['data']), LICENSES_PER_USER)
+        request = AsyncRequestFactory().get(
+            '/tiktok/list', headers={'X-API-Key': self.user.api_key.key, 'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(async_to_sync(async_views.list_tiktok_license_api)(request).status_code, 304)
+
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_query_stats_middleware(self):
+        middleware = QueryStatsMiddleware(async_views.list_license_api)
+        request = AsyncRequestFactory().get('/list', headers={'X-API-Key': self.user.api_key.key})
+        response = async_to_sync(middleware)(request)
+        self.assertEqual(response['X-DB-Query-Count'], '4')
+
+
+class VerifyCacheTests(QueryBudgetTestCase):
+    def verify(self, code, phone_number):
+        return self.api_client().post('/verify', {'code': str(code), 'phone_number': phone_number}, content_type='application/json')
+
+    def test_invalidated_on_save_and_delete(self):
+        license_obj = License.objects.create(owner=self.user, phone_number='0911111111', expired_at=timezone.now() - timedelta(days=1))
+        self.assertEqual(self.verify(license_obj.code, '0911111111').status_code, 410)
+        self.assertIsNotNone(get_verify_entry(KIND_ZALO, str(license_obj.code)))
+
+        license_obj.expired_at = timezone.now() + timedelta(days=30)
+        license_obj.save()
+        self.assertIsNone(get_verify_entry(KIND_ZALO, str(license_obj.code)))
+        response = self.verify(license_obj.code, '0911111111')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['expired_at'], int(license_obj.expired_at.timestamp()))
+
+        license_obj.delete()
+        self.assertIsNone(get_verify_entry(KIND_ZALO, str(license_obj.code)))
+        self.assertEqual(self.verify(license_obj.code, '0911111111').status_code, 404)
+
+    def test_stale_entry_dropped_on_commit(self):
+        old_expired_at = timezone.now() - timedelta(days=1)
+        license_obj = License.objects.create(owner=self.user, phone_number='0911111111', expired_at=old_expired_at)
+        code = str(license_obj.code)
+        with self.captureOnCommitCallbacks(execute=True):
+            license_obj.expired_at = timezone.now() + timedelta(days=30)
+            license_obj.save()
+            # Request đồng thời đọc bản đã commit (cũ) và ghi lại cache trước khi transaction commit
+            set_verify_entry(KIND_ZALO, code, '0911111111', old_expired_at)
+        self.assertIsNone(get_verify_entry(KIND_ZALO, code))
+        self.assertEqual(self.verify(code, '0911111111').status_code, 200)
+
+    def test_stale_entry_dropped_after_update(self):
+        old_expired_at = timezone.now() - timedelta(days=1)
+        license_obj = License.objects.create(owner=self.user, phone_number='0911111111', expired_at=old_expired_at)
+        code = str(license_obj.code)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.api_client().put('/update', {'code': code, 'expires_in': 30}, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            # Bản cũ được ghi lại sau khi view trả về nhưng trước khi transaction bên ngoài commit
+            set_verify_entry(KIND_ZALO, code, '0911111111', old_expired_at)
+        self.assertIsNone(get_verify_entry(KIND_ZALO, code))
+        self.assertEqual(self.verify(code, '0911111111').status_code, 200)
+
+    def test_not_found_dropped_on_create(self):
+        code = uuid.uuid4()
+        self.assertEqual(self.verify(code, '0922222222').status_code, 404)
+        self.assertEqual(get_verify_entry(KIND_ZALO, str(code)), NOT_FOUND)
+
+        License.objects.create(owner=self.user, code=code, phone_number='0922222222', expired_at=timezone.now() + timedelta(days=1))
+        self.assertIsNone(get_verify_entry(KIND_ZALO, str(code)))
+        self.assertEqual(self.verify(code, '0922222222').status_code, 200)
+
+    def test_identity_compared_as_string(self):
+        license_obj = License.objects.create(owner=self.user, phone_number='84901234567', expired_at=timezone.now() + timedelta(days=1))
+        # Lần đầu đọc DB, lần sau đọc cache: cả hai đều chấp nhận số điện thoại dạng số JSON
+        self.assertEqual(self.verify(license_obj.code, 84901234567).status_code, 200)
+        self.assertEqual(self.verify(license_obj.code, 84901234567).status_code, 200)
+        self.assertEqual(self.verify(license_obj.code, ' 84901234567 ').status_code, 200)
+        self.assertEqual(self.verify(license_obj.code, 84901234568).status_code, 404)
+
+        items = [{'code': str(license_obj.code), 'phone_number': 84901234567}]
+        data = self.api_client().post('/verify/batch', {'items': items}, content_type='application/json').json()['data']
+        self.assertTrue(data[0]['valid'])
+
+    @override_settings(DATABASE_REPLICA_MAX_LAG=10)
+    def test_replica_reads_cached_for_replica_lag(self):
+        license_obj = License.objects.create(owner=self.user, phone_number='0933333333', expired_at=timezone.now() + timedelta(days=1))
+        code = uuid.uuid4()
+        with mock.patch('licenses.db_router.reading_from_replica', return_value=True):
+            self.assertEqual(self.verify(license_obj.code, '0933333333').status_code, 200)
+            self.assertEqual(self.verify(code, '0933333333').status_code, 404)
+        # Vẫn dùng cache cho các request tiếp theo...
+        self.assertIsNotNone(get_verify_entry(KIND_ZALO, str(license_obj.code)))
+        self.assertEqual(get_verify_entry(KIND_ZALO, str(code)), NOT_FOUND)
+        # ...nhưng hết hạn sau DATABASE_REPLICA_MAX_LAG giây thay vì VERIFY_CACHE_TIMEOUT
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=time.time() + 11):
+            self.assertIsNone(get_verify_entry(KIND_ZALO, str(license_obj.code)))
+            self.assertIsNone(get_verify_entry(KIND_ZALO, str(code)))
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command('check_query_plans', rows=3000, owners=10, stdout=out)
+        self.assertNotIn('FAIL', out.getvalue())
+        # Dữ liệu seed được rollback
+        self.assertFalse(License.objects.exists())
+
+
+class VerifyBatchTests(QueryBudgetTestCase):
+    def test_results_per_item(self):
+        now = timezone.now()
+        active = License.objects.create(owner=self.user, phone_number='0933333333', expired_at=now + timedelta(days=3))
+        expired = License.objects.create(owner=self.user, phone_number='0944444444', expired_at=now - timedelta(days=3))
+        items = [
+            {'code': str(active.code), 'phone_number': '0933333333'},
+            {'code': str(expired.code), 'phone_number': '0944444444'},
+            {'code': str(active.code), 'phone_number': '0944444444'},
+            {'code': str(uuid.uuid4()), 'phone_number': '0933333333'},
+            {'code': 'not-a-uuid', 'phone_number': '0933333333'},
+            {'phone_number': '0933333333'},
+            'x',
+        ]
+        response = self.api_client().post('/verify/batch', {'items': items}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        self.assertEqual(data[0], {
+            'code': str(active.code), 'phone_number': '0933333333',
+            'status': True, 'valid': True, 'expired_at': int(active.expired_at.timestamp()),
+        })
+        self.assertEqual((data[1]['status'], data[1]['valid']), (True, False))
+        for result in data[2:5]:
+            self.assertEqual(result['reason'], 'not_found')
+        self.assertEqual(data[5]['error'], 'code là bắt buộc')
+        self.assertEqual(data[6]['error'], 'item phải là object')
+
+    @override_settings(VERIFY_BATCH_MAX_ITEMS=2)
+    def test_rejects_invalid_items(self):
+        client = self.api_client()
+        for items in ([], {'code': 'x'}, [{}] * 3):
+            response = client.post('/verify/batch', {'items': items}, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+    def test_tiktok(self):
+        tiktok = LicenseTikTok.objects.create(owner=self.user, shop_id='shop-batch', expired_at=timezone.now() + timedelta(days=1))
+        items = [{'code': str(tiktok.code), 'shop_id': 'shop-batch'}, {'code': str(tiktok.code), 'shop_id': 'other'}]
+        data = self.api_client().post('/tiktok/verify/batch', {'items': items}, content_type='application/json').json()['data']
+        self.assertTrue(data[0]['valid'])
+        self.assertEqual(data[1]['reason'], 'not_found')
+
+
+class BulkCreateTests(QueryBudgetTestCase):
+    def test_skips_existing_and_duplicates(self):
+        expired_at = timezone.now() + timedelta(days=30)
+        created, skipped = bulk_create_licenses(
+            self.user, ['0955555555', self.license.phone_number, '0955555555', '0966666666'], expired_at
+        )
+        self.assertEqual([obj.phone_number for obj in created], ['0955555555', '0966666666'])
+        self.assertEqual(skipped, [self.license.phone_number, '0955555555'])
+        self.assertEqual(License.objects.filter(phone_number__in=['0955555555', '0966666666'], owner=self.user).count(), 2)
+
+    def test_retries_after_concurrent_insert(self):
+        real_bulk_create = License.objects.bulk_create
+        calls = []
+
+        def bulk_create(objs, *args, **kwargs):
+            calls.append([obj.phone_number for obj in objs])
+            if len(calls) == 1:
+                # Request khác tạo cùng số điện thoại giữa lúc kiểm tra và lúc INSERT
+                raise IntegrityError('duplicate key value violates unique constraint')
+            return real_bulk_create(objs, *args, **kwargs)
+
+        with mock.patch.object(License.objects, 'bulk_create', side_effect=bulk_create):
+            created, skipped = bulk_create_licenses(self.user, ['0977777777'], timezone.now())
+        self.assertEqual(calls, [['0977777777'], ['0977777777']])
+        self.assertEqual([obj.phone_number for obj in created], ['0977777777'])
+        self.assertEqual(skipped, [])
+
+    def test_gives_up_after_second_conflict(self):
+        with mock.patch.object(License.objects, 'bulk_create', side_effect=IntegrityError('duplicate')):
+            with self.assertRaises(IntegrityError):
+                bulk_create_licenses(self.user, ['0988888888'], timezone.now())
+        self.assertFalse(License.objects.filter(phone_number='0988888888').exists())
+
+    def test_tiktok_skips_existing_for_owner(self):
+        created, skipped = bulk_create_tiktok_licenses(self.user, [self.tiktok.shop_id, 'shop-new'], timezone.now())
+        self.assertEqual([obj.shop_id for obj in created], ['shop-new'])
+        self.assertEqual(skipped, [self.tiktok.shop_id])
+
+
+class BulkExtendTests(QueryBudgetTestCase):
+    def test_expired_from_now_active_from_expiry(self):
+        now = timezone.now()
+        expired = License.objects.create(owner=self.user, phone_number='0912121212', expired_at=now - timedelta(days=10))
+        active = License.objects.create(owner=self.user, phone_number='0913131313', expired_at=now + timedelta(days=5))
+        other_owner = License.objects.create(owner=self.users[1], phone_number='0914141414', expired_at=now + timedelta(days=5))
+
+        result = bulk_extend(License, self.user, [str(expired.code), str(active.code), str(other_owner.code)], 30)
+        self.assertEqual(set(result), {str(expired.code), str(active.code)})
+        expired.refresh_from_db()
+        active.refresh_from_db()
+        self.assertAlmostEqual(expired.expired_at, now + timedelta(days=30), delta=timedelta(seconds=30))
+        self.assertEqual(active.expired_at, now + timedelta(days=35))
+        self.assertEqual(result[str(active.code)], active.expired_at)
+        # Code của owner khác không bị gia hạn
+        other_owner.refresh_from_db()
+        self.assertEqual(other_owner.expired_at, now + timedelta(days=5))
+
+    def test_update_api_reports_not_found(self):
+        now = timezone.now()
+        active = License.objects.create(owner=self.user, phone_number='0915151515', expired_at=now + timedelta(days=1))
+        missing = str(uuid.uuid4())
+        response = self.api_client().put(
+            '/update', {'code': [str(active.code), missing, 'bad'], 'expires_in': 2}, content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated_count'], 1)
+        self.assertEqual(data['expired_at_by_code'], {str(active.code): int((active.expired_at + timedelta(days=2)).timestamp())})
+        self.assertEqual(data['not_found_codes'], [missing, 'bad'])
+
+
+class KeysetPaginationTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        # Mọi license của user có cùng created_at: chỉ còn id phân biệt thứ tự
+        License.objects.filter(owner=self.user).update(created_at=timezone.now())
+        self.codes = [str(code) for code in License.objects.filter(owner=self.user).order_by('-id').values_list('code', flat=True)]
+
+    def test_list_api_pages_over_ties(self):
+        client = self.api_client()
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 4, **({'cursor': cursor} if cursor else {})}
+            data = client.get('/list', params).json()
+            seen += [row['code'] for row in data['data']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.codes)
+
+    def test_window_forward_and_back_over_ties(self):
+        queryset = License.objects.filter(owner=self.user)
+        pages, after = [], None
+        while True:
+            page = keyset_window(queryset, after=after, page_size=4)
+            pages.append([obj.code for obj in page.object_list])
+            if not page.has_next:
+                break
+            after = page.next_cursor
+        self.assertEqual([str(code) for page in pages for code in page], self.codes)
+
+        # Quay lại từ trang cuối bằng cursor `before`
+        back = [pages[-1]]
+        page = keyset_window(queryset, after=after, page_size=4)
+        while page.has_previous:
+            page = keyset_window(queryset, before=page.previous_cursor, page_size=4)
+            back.insert(0, [obj.code for obj in page.object_list])
+        self.assertEqual(back, pages)
+
+
+class ExportTests(QueryBudgetTestCase):
+    def read_ndjson(self, response):
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_export_api_rows(self):
+        rows = self.read_ndjson(self.api_client().get('/export'))
+        licenses = list(License.objects.filter(owner=self.user).order_by('id'))
+        self.assertEqual(rows, [
+            {
+                'code': str(obj.code),
+                'phone_number': obj.phone_number,
+                'expired_at': int(obj.expired_at.timestamp()),
+                'owner_username': self.user.username,
+            }
+            for obj in licenses
+        ])
+
+        # Cùng bộ lọc với dashboard: expired_at của fixture là now + (i - 5) ngày
+        rows = self.read_ndjson(self.api_client().get('/export', {'status': 'expired'}))
+        self.assertEqual(len(rows), 6)
+
+    def test_export_tiktok_api_rows(self):
+        rows = self.read_ndjson(self.api_client().get('/tiktok/export'))
+        self.assertEqual(len(rows), LICENSES_PER_USER)
+        first = LicenseTikTok.objects.filter(owner=self.user).order_by('id').first()
+        self.assertEqual(rows[0]['id'], first.id)
+        self.assertEqual(rows[0]['shop_id'], first.shop_id)
+        self.assertEqual(rows[0]['updated_at'], int(first.updated_at.timestamp()))
+
+    def test_export_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'licenses.ndjson')
+            call_command('export_licenses', owner=self.user.username, output=path, stderr=io.StringIO())
+            with open(path, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        self.assertEqual(len(lines), LICENSES_PER_USER)
+        self.assertEqual(json.loads(lines[0])['code'], str(self.license.code))
+
+
+class ApiKeyCacheTests(QueryBudgetTestCase):
+    def test_change_in_another_worker_invalidates_entry(self):
+        client = self.api_client()
+        old_key = self.user.api_key.key
+        self.assertEqual(client.get('/stats').status_code, 200)
+        stale_entry = api_key_cache._entries[old_key]
+
+        # Xoay key; worker khác vẫn còn entry cũ trong LRU của nó
+        api_key = self.user.api_key
+        api_key.key = UserApiKey.generate_key()
+        api_key.save()
+        api_key_cache._entries[old_key] = stale_entry
+        self.assertEqual(client.get('/stats').status_code, 403)
+
+    @override_settings(API_KEY_LAST_USED_INTERVAL=0.05)
+    @mock.patch('licenses.auth.PENDING_SWEEP_SECONDS', 0)
+    def test_trailing_last_used_flushed_by_next_request(self):
+        client = self.api_client()
+        client.get('/stats')
+        client.get('/stats')  # Trong interval: chỉ ghi nhận trong bộ nhớ
+        used_at = api_key_cache._pending[self.user.api_key.pk]
+        time.sleep(0.06)
+
+        # Key này không được dùng lại; request của key khác ghi lần dùng cuối xuống DB
+        self.api_client(self.users[1]).get('/stats')
+        self.assertEqual(UserApiKey.objects.get(pk=self.user.api_key.pk).last_used_at, used_at)
+        self.assertEqual(api_key_cache._pending, {})
+
+
+class QueryStatsMiddlewareTests(QueryBudgetTestCase):
+    @override_settings(QUERY_STATS_HEADERS=True)
+    def test_headers(self):
+        client = self.api_client()
+        response = client.get('/list')
+        self.assertEqual(response['X-DB-Query-Count'], '4')
+        self.assertIn('X-DB-Time-Ms', response)
+
+
+class MetricsTests(QueryBudgetTestCase):
+    def setUp(self):
+        super().setUp()
+        metrics_registry.reset()
+
+    @override_settings(METRICS_PUBLIC=True)
+    def test_metrics_by_url_name(self):
+        client = self.api_client()
+        client.get('/list')
+        client.post('/verify', {'code': 'x', 'phone_number': 'y'}, content_type='application/json')
+        client.get('/no-such-url')
+        response = self.assertQueryBudget(0, client.get, '/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        self.assertIn('license_http_requests_total{view="licenses:list_api",method="GET",status="200"} 1', body)
+        self.assertIn('license_http_requests_total{view="licenses:verify",method="POST",status="404"} 1', body)
+        self.assertIn('license_http_requests_total{view="unresolved",method="GET",status="404"} 1', body)
+        self.assertIn('license_http_request_duration_seconds_bucket{view="licenses:list_api",le="+Inf"} 1', body)
+        self.assertIn('license_db_queries_total{view="licenses:list_api"} 4', body)
+        self.assertIn('license_db_duration_seconds_total{view="licenses:list_api"}', body)
+
+    def test_aggregates_worker_files(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory, METRICS_PUBLIC=True):
+            # Snapshot của một worker khác
+            other = {
+                'requests': [['licenses:list_api', 'GET', '200', 5]],
+                'latency': {'licenses:list_api': [5] + [0] * 11 + [0.01]},
+                'db': {'licenses:list_api': [20, 0.005]},
+            }
+            with open(os.path.join(directory, '999999.json'), 'w') as f:
+                json.dump(other, f)
+            self.api_client().get('/list')
+            body = self.client.get('/metrics').content.decode()
+            self.assertIn(f'{os.getpid()}.json', os.listdir(directory))
+        self.assertIn('license_http_requests_total{view="licenses:list_api",method="GET",status="200"} 6', body)
+        self.assertIn('license_http_request_duration_seconds_count{view="licenses:list_api"} 6', body)
+        self.assertIn('license_db_queries_total{view="licenses:list_api"} 24', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_public_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.api_client().get('/metrics').status_code, 403)
+        self.assertEqual(self.web_client().get('/metrics').status_code, 403)
+        self.assertEqual(self.web_client(self.superuser).get('/metrics').status_code, 200)
+
+
+class RateLimitTests(QueryBudgetTestCase):
+    def set_limits(self, limits):
+        key = self.user.api_key
+        key.rate_limits = limits
+        key.save()
+
+    def verify(self, client):
+        payload = {'code': str(self.license.code), 'phone_number': self.license.phone_number}
+        return client.post('/verify', payload, content_type='application/json')
+
+    def test_per_key_limit(self):
+        self.set_limits({'verify': '2/m'})
+        client = self.api_client()
+        response = self.verify(client)
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual((response['RateLimit-Limit'], response['RateLimit-Remaining']), ('2', '1'))
+        self.verify(client)
+        # Kiểm tra rate limit không thêm truy vấn DB
+        response = self.assertQueryBudget(0, self.verify, client)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['RateLimit-Remaining'], '0')
+        self.assertGreaterEqual(int(response['Retry-After']), 1)
+        # Endpoint khác có bucket riêng
+        self.assertEqual(client.get('/list').status_code, 200)
+
+    @override_settings(API_RATE_LIMITS={'default': '1/h'})
+    def test_settings_default_and_key_override(self):
+        client = self.api_client()
+        self.assertEqual(client.get('/list').status_code, 200)
+        self.assertEqual(client.get('/list').status_code, 429)
+        self.set_limits({'list_api': 'off'})
+        self.assertEqual(client.get('/list').status_code, 200)
+        self.assertNotIn('RateLimit-Limit', client.get('/list'))
+
+    def test_async_view(self):
+        self.set_limits({'default': '1/h'})
+        request = AsyncRequestFactory().get('/list', headers={'X-API-Key': self.user.api_key.key})
+        self.assertEqual(async_to_sync(async_views.list_license_api)(request).status_code, 200)
+        response = async_to_sync(async_views.list_license_api)(request)
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(request.rate_limit.allowed)
+
+    def test_invalid_limits(self):
+        key = UserApiKey(user=self.user, key='x', rate_limits={'verify': '10/w'})
+        with self.assertRaises(ValidationError):
+            key.clean_fields()
+
+
+class LicenseStatsTests(QueryBudgetTestCase):
+    """license_stats phải khớp với kết quả tính lại toàn bộ sau mỗi loại thay đổi."""
+
+    def assertStatsInSync(self):
+        now = timezone.now()
+        advance_stats(now)
+        self.assertEqual(reconcile_stats(now), 0)
+
+    def test_create_update_delete(self):
+        client = self.api_client()
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post('/create', {'phone_numbers': ['0700000001', '0700000002'], 'expires_in': 1}, content_type='application/json')
+        self.assertEqual(owner_stats(self.user.id)[0]['zalo']['expiring_soon'], 5)
+        self.assertStatsInSync()
+
+        codes = [str(code) for code in self.user.licenses.values_list('code', flat=True)]
+        with self.captureOnCommitCallbacks(execute=True):
+            client.put('/update', {'code': codes, 'expires_in': 30}, content_type='application/json')
+        self.assertEqual(owner_stats(self.user.id)[0]['zalo']['expired'], 0)
+        self.assertStatsInSync()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            client.delete('/tiktok/delete-all')
+        self.assertEqual(owner_stats(self.user.id)[0]['tiktok']['total'], 0)
+        self.assertStatsInSync()
+
+    def test_save_changes_owner(self):
+        obj = License.objects.get(pk=self.license.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.owner = self.superuser
+            obj.expired_at = timezone.now() + timedelta(days=1)
+            obj.save()
+        self.assertEqual(owner_stats(self.user.id)[0]['zalo']['total'], LICENSES_PER_USER - 1)
+        self.assertStatsInSync()
+
+    def test_changes_in_one_transaction_are_one_write(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                for obj in self.user.licenses.all()[:5]:
+                    obj.expired_at = timezone.now() + timedelta(days=90)
+                    obj.save()
+        self.assertEqual(sum('license_stats' in q['sql'] for q in ctx.captured_queries), 1)
+        self.assertStatsInSync()
+
+    def test_rolled_back_changes_are_dropped(self):
+        obj = License.objects.get(pk=self.license.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    obj.expired_at = timezone.now() + timedelta(days=90)
+                    obj.save()
+                    raise IntegrityError
+            except IntegrityError:
+                pass
+            # Batch của savepoint bị rollback không được dùng lại cho thay đổi sau đó
+            obj = License.objects.get(pk=self.license.pk)
+            obj.expired_at = timezone.now() + timedelta(days=60)
+            obj.save()
+        self.assertStatsInSync()
+
+    def test_advance(self):
+        later = timezone.now() + timedelta(days=4)
+        advance_stats(later)
+        data, as_of = owner_stats(self.user.id)
+        self.assertEqual(as_of, later)
+        # i - 5 <= 4 ngày: hết hạn; 4 < i - 5 <= 7: sắp hết hạn
+        self.assertEqual(data['zalo']['expired'], 10)
+        self.assertEqual(data['zalo']['expiring_soon'], 3)
+        self.assertEqual(reconcile_stats(later), 0)
+
+    def test_reconcile_fixes_drift(self):
+        LicenseStats.objects.filter(owner=self.user).update(total=0, expired=0)
+        self.assertEqual(reconcile_stats(), 2)
+        self.assertEqual(owner_stats(self.user.id)[0]['zalo']['total'], LICENSES_PER_USER)
+
+
+class PurgeTests(QueryBudgetTestCase):
+    def test_chunks_and_side_effects(self):
+        set_verify_entry(KIND_ZALO, str(self.license.code), self.license.phone_number, self.license.expired_at)
+        progress = []
+        with self.captureOnCommitCallbacks(execute=True):
+            deleted = purge_licenses(License, owner_id=self.user.id, chunk_size=10, on_progress=progress.append)
+        self.assertEqual(deleted, LICENSES_PER_USER)
+        self.assertEqual(progress, [10, 20, 25])
+        self.assertFalse(self.user.licenses.exists())
+        self.assertEqual(License.objects.count(), LICENSES_PER_USER * USERS)
+        self.assertIsNone(get_verify_entry(KIND_ZALO, str(self.license.code)))
+        self.assertEqual(owner_stats(self.user.id)[0]['zalo']['total'], 0)
+        self.assertEqual(reconcile_stats(), 0)
+
+    @override_settings(LICENSE_TOKEN_SECRET='test-secret')
+    def test_revokes_tokens(self):
+        purge_licenses(LicenseTikTok, owner_id=self.user.id, chunk_size=10)
+        self.assertEqual(RevokedLicenseToken.objects.filter(owner=self.user, license_type='tiktok').count(), LICENSES_PER_USER)
+
+    def test_falls_back_to_collector_for_unknown_receivers(self):
+        seen = []
+
+        def receiver(sender, instance, **kwargs):
+            seen.append(instance.pk)
+
+        # Nối thẳng bằng post_delete.connect, không qua helper nào của app
+        post_delete.connect(receiver, sender=License)
+        try:
+            self.assertFalse(can_raw_delete(License))
+            ids = list(self.user.licenses.values_list('id', flat=True)[:7])
+            self.assertEqual(purge_licenses(License, ids=ids, chunk_size=3), 7)
+        finally:
+            post_delete.disconnect(receiver, sender=License)
+        self.assertEqual(sorted(seen), sorted(ids))
+        self.assertTrue(can_raw_delete(License))
+
+    @override_settings(IMPORT_CHUNK_SIZE=10)
+    def test_resumed_import_skips_processed_chunks(self):
+        upload = SimpleUploadedFile('a.txt', '\n'.join(f'0500{i:06d}' for i in range(30)).encode())
+        job = enqueue_import(KIND_ZALO, self.user, self.user, upload, 30)
+        _split_upload(job)
+        # Worker trước đã xử lý chunk đầu rồi chết
+        first = job.chunks.get(seq=0)
+        import_licenses(KIND_ZALO, self.user, first.values, timezone.now())
+        first.processed_at = timezone.now()
+        first.save()
+        LicenseJob.objects.filter(pk=job.pk).update(
+            status=LicenseJob.STATUS_RUNNING,
+            processed=10,
+            result={'created': 10, 'skipped': 0, 'invalid': 0},
+            updated_at=timezone.now() - timedelta(hours=1),
+        )
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.result, {'created': 30, 'skipped': 0, 'invalid': 0})
+        self.assertEqual(job.processed, 30)
+
+    @override_settings(IMPORT_CHUNK_SIZE=500)
+    def test_import_error_after_first_chunk_fails_job(self):
+        # Request chỉ đọc phần đầu file; lỗi ở cuối file do worker phát hiện
+        content = '\n'.join(f'0500{i:06d}' for i in range(2000)).encode() + b'\n\xff\xfe\n'
+        job = enqueue_import(KIND_ZALO, self.user, self.user, SimpleUploadedFile('a.txt', content), 30)
+        with self.assertLogs('licenses', 'ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, LicenseJob.STATUS_FAILED)
+        self.assertIn('UTF-8', job.error)
+        self.assertFalse(job.chunks.exists())
+        self.assertFalse(License.objects.filter(phone_number__startswith='0500').exists())
+
+    def test_stale_job_is_reclaimed(self):
+        job = LicenseJob.objects.create(
+            kind=LicenseJob.KIND_PURGE,
+            owner=self.user,
+            license_type='zalo',
+            params={'owner_id': self.user.id},
+            status=LicenseJob.STATUS_RUNNING,
+            processed=5,
+        )
+        self.assertIsNone(claim_job())
+        LicenseJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, LicenseJob.STATUS_DONE)
+        self.assertEqual(job.result, {'deleted_count': LICENSES_PER_USER + 5})
+
+
+class ArchiveTests(QueryBudgetTestCase):
+    def archive(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return archive_expired(KIND_ZALO, older_than_days=3, **kwargs)
+
+    def test_moves_in_batches(self):
+        # Mỗi owner có 3 license hết hạn từ 3 ngày trước lúc seed (i = 0, 1, 2)
+        self.assertEqual(self.archive(batch_size=5), 3 * (USERS + 1))
+        self.assertEqual(ArchivedLicense.objects.count(), 3 * (USERS + 1))
+        self.assertFalse(License.objects.filter(expired_at__lt=timezone.now() - timedelta(days=3)).exists())
+        self.assertEqual(owner_stats(self.user.id)[0]['zalo']['total'], LICENSES_PER_USER - 3)
+        self.assertEqual(reconcile_stats(), 0)
+        self.assertEqual(self.archive(), 0)
+
+    def test_verify_archived_license(self):
+        client = self.api_client()
+        payload = {'code': str(self.license.code), 'phone_number': self.license.phone_number}
+        before = client.post('/verify', payload, content_type='application/json')
+        batch_before = client.post('/verify/batch', {'items': [payload]}, content_type='application/json').json()
+        self.archive()
+        cache.clear()
+        self.assertTrue(ArchivedLicense.objects.filter(code=self.license.code).exists())
+
+        response = self.assertQueryBudget(4, client.post, '/verify', payload, content_type='application/json')
+        self.assertEqual((response.status_code, response.json()), (before.status_code, before.json()))
+        response = client.post('/verify/batch', {'items': [payload]}, content_type='application/json')
+        self.assertEqual(response.json(), batch_before)
+        async_response = async_to_sync(async_views.verify_license)(
+            AsyncRequestFactory().post(
+                '/verify', payload, content_type='application/json', headers={'X-API-Key': self.user.api_key.key}
+            )
+        )
+        self.assertEqual(json.loads(async_response.content), before.json())
+
+    def test_extend_restores(self):
+        self.archive()
+        codes = [str(self.license.code), str(uuid.uuid4())]
+        client = self.api_client()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.put('/update', {'code': codes, 'expires_in': 30}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ArchivedLicense.objects.filter(code=self.license.code).exists())
+        restored = License.objects.get(pk=self.license.pk)
+        self.assertGreater(restored.expired_at, timezone.now() + timedelta(days=29))
+        self.assertEqual(reconcile_stats(), 0)
+
+    def test_restore_skips_reused_phone_number(self):
+        self.archive()
+        License.objects.create(owner=self.users[1], phone_number=self.license.phone_number, expired_at=timezone.now())
+        self.assertEqual(restore_archived(KIND_ZALO, [str(self.license.code)]), set())
+        self.assertTrue(ArchivedLicense.objects.filter(code=self.license.code).exists())
+
+    def test_create_skips_archived_identifiers(self):
+        self.archive()
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_expired(KIND_TIKTOK, older_than_days=3)
+        now = timezone.now()
+        created, skipped = bulk_create_licenses(self.users[1], [self.license.phone_number, '0700000009'], now)
+        self.assertEqual(([obj.phone_number for obj in created], skipped), (['0700000009'], [self.license.phone_number]))
+        created, skipped = bulk_create_tiktok_licenses(self.user, [self.tiktok.shop_id], now)
+        self.assertEqual((created, skipped), ([], [self.tiktok.shop_id]))
+        # Owner khác vẫn tạo được cùng shop_id
+        created, _ = bulk_create_tiktok_licenses(self.users[1], [self.tiktok.shop_id], now)
+        self.assertEqual(len(created), 1)
+
+        with self.assertRaises(ValidationError):
+            License(owner=self.users[1], phone_number=self.license.phone_number, expired_at=now).full_clean()
+        self.assertEqual(restore_archived(KIND_ZALO, [str(self.license.code)]), {str(self.license.code)})
+
+    def test_admin_search_and_restore(self):
+        self.archive()
+        client = self.web_client(self.superuser)
+        response = client.get('/admin/licenses/archivedlicense/', {'q': self.license.phone_number})
+        self.assertContains(response, str(self.license.code))
+        client.post(
+            '/admin/licenses/archivedlicense/',
+            {'action': 'restore_selected', '_selected_action': [self.license.pk]},
+        )
+        self.assertTrue(License.objects.filter(pk=self.license.pk).exists())
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(SimpleTestCase):
+    """Chỉ kiểm tra quyết định của router nên không cần (và không được) truy vấn DB."""
+
+    def setUp(self):
+        cache.clear()
+        db_router._health['replica'] = (True, time.monotonic())
+        self.addCleanup(db_router._health.clear)
+
+    def route(self, method, path, key=None, write=False):
+        """Cho request đi qua ReplicaRoutingMiddleware; trả về alias mà view đọc License."""
+        seen = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            if write:
+                router.db_for_write(License)
+            seen.append(router.db_for_read(License))
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        request = RequestFactory().generic(method, path, headers={'X-API-Key': key} if key else {})
+        request.resolver_match = resolve(path)
+        middleware(request)
+        return seen[0]
+
+    def test_read_only_views_use_replica(self):
+        self.assertEqual(self.route('POST', '/verify', 'a'), 'replica')
+        self.assertEqual(self.route('POST', '/tiktok/verify/batch', 'a'), 'replica')
+        self.assertEqual(self.route('GET', '/list', 'a'), 'replica')
+        self.assertEqual(self.route('GET', '/license/', 'a'), 'replica')
+        self.assertEqual(self.route('POST', '/license/', 'b'), 'default')
+        self.assertEqual(self.route('GET', '/export', 'c'), 'default')
+        self.assertEqual(router.db_for_read(License), 'default')
+
+    def test_pinned_to_primary_after_write(self):
+        self.assertEqual(self.route('POST', '/create', 'a'), 'default')
+        self.assertEqual(self.route('POST', '/verify', 'a'), 'default')
+        self.assertEqual(self.route('GET', '/list', 'a'), 'default')
+        self.assertEqual(self.route('POST', '/verify', 'b'), 'replica')
+        # Ghi bên trong một view đọc: phần còn lại của request và các request sau đọc từ primary
+        self.assertEqual(self.route('GET', '/list', 'c', write=True), 'default')
+        self.assertEqual(self.route('GET', '/list', 'c'), 'default')
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        db_router._health['replica'] = (False, time.monotonic())
+        self.assertEqual(self.route('POST', '/verify', 'a'), 'default')
+
+    def test_reading_from_replica(self):
+        self.assertFalse(db_router.reading_from_replica())
+        seen = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            seen.append(db_router.reading_from_replica())
+            router.db_for_read(License)
+            seen.append(db_router.reading_from_replica())
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        request = RequestFactory().post('/verify')
+        request.resolver_match = resolve('/verify')
+        middleware(request)
+        self.assertEqual(seen, [False, True])
+        self.assertFalse(db_router.reading_from_replica())
+
+    def test_pin_shorter_than_replica_lag_fails_check(self):
+        with override_settings(DATABASE_PIN_SECONDS=1, DATABASE_REPLICA_MAX_LAG=10):
+            self.assertEqual([error.id for error in check_replica_pin(None)], ['licenses.E001'])
+        with override_settings(DATABASE_PIN_SECONDS=10, DATABASE_REPLICA_MAX_LAG=10):
+            self.assertEqual(check_replica_pin(None), [])
+        with override_settings(DATABASE_REPLICAS=[], DATABASE_PIN_SECONDS=1, DATABASE_REPLICA_MAX_LAG=10):
+            self.assertEqual(check_replica_pin(None), [])
+
+
+class VietQrTests(SimpleTestCase):
+    def test_crc16(self):
+        self.assertEqual(crc16('123456789'), 0x29B1)
+
+    def test_build_payload(self):
+        payload = build_payload('970436', '0123456789', 100000, 'Gia hạn lzl 30 0912345678')
+        self.assertEqual(
+            payload[:-4],
+            '000201010212'
+            '38540010A00000072701240006970436011001234567890208QRIBFTTA'
+            '5303704'
+            '5406100000'
+            '5802VN'
+            '62290825Gia han lzl 30 0912345678'
+            '6304',
+        )
+        self.assertEqual(payload[-4:], f'{crc16(payload[:-4]):04X}')
+        # Không có số tiền: QR tĩnh, không có trường 54
+        self.assertTrue(build_payload('970436', '0123456789').startswith('000201010211'))
+        self.assertNotIn('5406', build_payload('970436', '0123456789'))
+
+    def test_ascii_content(self):
+        self.assertEqual(ascii_content('  Đặt   gói  '), 'Dat goi')
+        self.assertEqual(len(ascii_content('x' * 200)), 95)
+
+
+class BenchSuiteTests(TestCase):
+    def seed(self, *args):
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'bench_suite', '--seed-only', '--prefix', 'bt', '--users', '2', '--licenses', '7',
+                '--tiktok-licenses', '5', '--packages', '2', '--expired-ratio', '0', *args, stderr=io.StringIO(),
+            )
+
+    def test_seed_reuse_and_cleanup(self):
+        self.seed()
+        self.seed()
+        self.assertEqual(get_user_model().objects.filter(username__startswith='bt-').count(), 2)
+        self.assertEqual(License.objects.count(), 7)
+        self.assertEqual(LicenseTikTok.objects.count(), 5)
+        self.assertEqual(ExtensionPackage.objects.filter(group__code='bt').count(), 2)
+        self.assertEqual(reconcile_stats(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('bench_suite', '--cleanup', '--prefix', 'bt', stderr=io.StringIO())
+        self.assertFalse(get_user_model().objects.filter(username__startswith='bt-').exists())
+        self.assertEqual(License.objects.count() + LicenseTikTok.objects.count(), 0)
+
+    def test_scenarios(self):
+        self.seed()
+        command = BenchSuiteCommand()
+        users = list(command._bench_users('bt'))
+        for endpoint in command.endpoints:
+            method, path, headers, body_factory = command._scenario(endpoint, 'bt', users)
+            body = body_factory(0) if body_factory else None
+            response = self.client.generic(
+                method,
+                path,
+                json.dumps(body) if body is not None else '',
+                content_type='application/json',
+                headers=headers,
+            )
+            self.assertIn(response.status_code, (200, 201), endpoint)
+
+    def test_format_results(self):
+        result = {'rps': 1200.5, 'p50_ms': 1.2, 'p95_ms': 3.4, 'p99_ms': 5.6, 'errors': 0, 'status_counts': {'200': 10}}
+        lines = format_results({'verify': result, 'dashboard_tiktok': result}, label='endpoint').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].startswith('endpoint '))
+        self.assertEqual(lines[1].index('1200.5'), lines[2].index('1200.5'))
+
+
+def _url_names(patterns):
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= _url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+COVERED_URL_NAMES = {
+    'dashboard', 'profile', 'dashboard_tiktok', 'extend_tiktok', 'delete_tiktok', 'extend', 'delete',
+    'get_packages', 'get_payment_info', 'renewal_bootstrap', 'generate_qr', 'generate_qr_image', 'banks',
+    'verify', 'verify_batch', 'verify_cache_stats', 'license_stats', 'token_key', 'token_revocations', 'create_api', 'import_api', 'list_api', 'export_api', 'update_api',
+    'delete_api', 'delete_all_api', 'api_create_user', 'job_status', 'metrics', 'verify_tiktok', 'verify_tiktok_batch',
+    'create_tiktok_api', 'import_tiktok_api', 'list_tiktok_api', 'export_tiktok_api', 'update_tiktok_api', 'extend_tiktok_api',
+    'delete_tiktok_api', 'delete_all_tiktok_api', 'admin_create_user_api',
+}
+
+
+class UrlCoverageTests(TestCase):
+    def test_every_url_has_query_budget(self):
+        names = _url_names(urls.urlpatterns) | _url_names(urls_api.urlpatterns)
+        self.assertEqual(names - COVERED_URL_NAMES, set(), 'Thêm test query budget cho URL mới')
+
+    def test_admin_site_does_not_shadow_api(self):
+        # admin/ phải đứng sau urls_api trong license_site/urls.py
+        self.assertEqual(resolve('/admin/users/create').url_name, 'admin_create_user_api')
+        self.assertEqual(resolve('/admin/').app_name, 'admin')
@@ -0,0 +1,142 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import RevokedLicenseToken
+
+
+# Token offline: <payload base64url>.<chữ ký base64url>
+# Payload: {"v": 1, "alg": "HS256"|"EdDSA", "typ": "zalo"|"tiktok", "code": ..., "phone_number"|"shop_id": ...,
+#           "expired_at": ..., "iat": ..., "exp": ...}
+# exp = min(expired_at, iat + LICENSE_TOKEN_MAX_AGE) để danh sách thu hồi chỉ cần giữ trong LICENSE_TOKEN_MAX_AGE.
+
+try:
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+except ImportError:  # cryptography là tùy chọn, chỉ cần khi dùng EdDSA
+    serialization = None
+    Ed25519PrivateKey = None
+
+
+class TokenConfigError(Exception):
+    pass
+
+
+def _b64encode(raw):
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _b64decode(value):
+    return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+
+_private_key_cache = {}
+
+
+def _ed25519_private_key():
+    raw = getattr(settings, 'LICENSE_TOKEN_PRIVATE_KEY', '')
+    if not raw:
+        return None
+    if Ed25519PrivateKey is None:
+        raise TokenConfigError('LICENSE_TOKEN_PRIVATE_KEY cần gói cryptography')
+    if raw not in _private_key_cache:
+        if raw.lstrip().startswith('-----BEGIN'):
+            key = serialization.load_pem_private_key(raw.encode(), password=None)
+        else:
+            key = Ed25519PrivateKey.from_private_bytes(_b64decode(raw.strip()))
+        _private_key_cache[raw] = key
+    return _private_key_cache[raw]
+
+
+def token_algorithm():
+    """'EdDSA' nếu có khóa Ed25519, 'HS256' nếu có LICENSE_TOKEN_SECRET, None nếu chưa cấu hình."""
+    if getattr(settings, 'LICENSE_TOKEN_PRIVATE_KEY', ''):
+        return 'EdDSA'
+    if getattr(settings, 'LICENSE_TOKEN_SECRET', ''):
+        return 'HS256'
+    return None
+
+
+def public_key():
+    """Public key Ed25519 (raw, base64url) để client tự kiểm tra chữ ký."""
+    key = _ed25519_private_key()
+    if key is None:
+        return None
+    raw = key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+    return _b64encode(raw)
+
+
+def _sign(alg, message):
+    if alg == 'EdDSA':
+        return _ed25519_private_key().sign(message)
+    return hmac.new(settings.LICENSE_TOKEN_SECRET.encode(), message, hashlib.sha256).digest()
+
+
+def issue_token(kind, code, identity_field, identity, expired_at_ts, now=None):
+    """Tạo token đã ký; trả về (token, exp) hoặc (None, None) nếu chưa cấu hình khóa."""
+    alg = token_algorithm()
+    if alg is None:
+        return None, None
+    iat = int(now if now is not None else time.time())
+    exp = min(int(expired_at_ts), iat + int(getattr(settings, 'LICENSE_TOKEN_MAX_AGE', 7 * 86400)))
+    payload = {
+        'v': 1,
+        'alg': alg,
+        'typ': kind,
+        'code': code,
+        identity_field: identity,
+        'expired_at': int(expired_at_ts),
+        'iat': iat,
+        'exp': exp,
+    }
+    body = _b64encode(json.dumps(payload, separators=(',', ':'), sort_keys=True).encode())
+    signature = _b64encode(_sign(alg, body.encode()))
+    return f'{body}.{signature}', exp
+
+
+def decode_token(token):
+    """Kiểm tra chữ ký và trả về payload, hoặc None nếu token không hợp lệ (không kiểm tra exp)."""
+    try:
+        body, signature = token.split('.', 1)
+        payload = json.loads(_b64decode(body))
+        alg = payload.get('alg')
+        if alg != token_algorithm():
+            return None
+        if alg == 'EdDSA':
+            _ed25519_private_key().public_key().verify(_b64decode(signature), body.encode())
+        elif not hmac.compare_digest(_b64decode(signature), _sign(alg, body.encode())):
+            return None
+    except Exception:
+        return None
+    return payload
+
+
+def revocation_cutoff(now=None):
+    """Token phát hành trước mốc này đã hết hạn, không cần giữ bản ghi thu hồi."""
+    now = now if now is not None else timezone.now()
+    return now - timedelta(seconds=int(getattr(settings, 'LICENSE_TOKEN_MAX_AGE', 7 * 86400)))
+
+
+def revoke_tokens_bulk(kind, licenses):
+    """Thu hồi token của nhiều license; licenses là các cặp (owner_id, code)."""
+    if token_algorithm() is None or not licenses:
+        return
+    now = timezone.now()
+    RevokedLicenseToken.objects.bulk_create(
+        [
+            RevokedLicenseToken(owner_id=owner_id, license_type=kind, code=code, revoked_at=now)
+            for owner_id, code in licenses
+        ]
+    )
+
+
+def prune_revocations(now=None):
+    """Xóa bản ghi thu hồi của token đã hết hạn; chạy định kỳ bằng lệnh prune_token_revocations."""
+    deleted, _ = RevokedLicenseToken.objects.filter(revoked_at__lt=revocation_cutoff(now)).delete()
+    return deleted
@@ -14,6 +14,9 @@ urlpatterns = [
     path('licenses/<int:pk>/delete/', views.delete_license, name='delete'),
     path('packages/', views.get_extension_packages, name='get_packages'),
     path('payment-info/', views.get_payment_info, name='get_payment_info'),
+    path('renewal/', views.renewal_bootstrap, name='renewal_bootstrap'),
     path('qr-code/', views.generate_qr_code, name='generate_qr'),
+    path('qr-code/image/', views.generate_qr_image, name='generate_qr_image'),
+    path('banks.json', views.banks_json, name='banks'),
 ]
 
@@ -1,19 +1,39 @@
+from django.conf import settings
 from django.urls import path
 
 from . import views
 
+# Dưới ASGI có thể chuyển các endpoint verify/list sang bản async (licenses/async_views.py)
+if settings.ASYNC_API_VIEWS:
+    from . import async_views as hot_views
+else:
+    hot_views = views
+
 urlpatterns = [
-    path('verify', views.verify_license, name='verify'),
+    path('verify', hot_views.verify_license, name='verify'),
+    path('verify/batch', views.verify_license_batch, name='verify_batch'),
+    path('verify/cache-stats', views.verify_cache_stats_api, name='verify_cache_stats'),
+    path('stats', views.license_stats_api, name='license_stats'),
+    path('tokens/key', views.token_key_api, name='token_key'),
+    path('tokens/revocations', views.token_revocations_api, name='token_revocations'),
     path('create', views.create_license_api, name='create_api'),
-    path('list', views.list_license_api, name='list_api'),
+    path('import', views.import_license_api, name='import_api'),
+    path('list', hot_views.list_license_api, name='list_api'),
+    path('export', views.export_license_api, name='export_api'),
     path('update', views.update_license_api, name='update_api'),
     path('delete', views.delete_license_api, name='delete_api'),
     path('delete-all', views.delete_all_license_api, name='delete_all_api'),
     path('users/create', views.api_create_user, name='api_create_user'),
-    path('tiktok/verify', views.verify_tiktok_license, name='verify_tiktok'),
+    path('jobs/<uuid:job_id>', views.job_status_api, name='job_status'),
+    path('metrics', views.metrics, name='metrics'),
+    path('tiktok/verify', hot_views.verify_tiktok_license, name='verify_tiktok'),
+    path('tiktok/verify/batch', views.verify_tiktok_license_batch, name='verify_tiktok_batch'),
     path('tiktok/create', views.create_tiktok_license_api, name='create_tiktok_api'),
-    path('tiktok/list', views.list_tiktok_license_api, name='list_tiktok_api'),
+    path('tiktok/import', views.import_tiktok_license_api, name='import_tiktok_api'),
+    path('tiktok/list', hot_views.list_tiktok_license_api, name='list_tiktok_api'),
+    path('tiktok/export', views.export_tiktok_license_api, name='export_tiktok_api'),
     path('tiktok/update', views.update_tiktok_license_api, name='update_tiktok_api'),
+    path('tiktok/extend', views.extend_tiktok_license_api, name='extend_tiktok_api'),
     path('tiktok/delete', views.delete_tiktok_license_api, name='delete_tiktok_api'),
     path('tiktok/delete-all', views.delete_all_tiktok_license_api, name='delete_all_tiktok_api'),
     path('admin/users/create', views.admin_create_user_api, name='admin_create_user_api'),
@@ -0,0 +1,149 @@
+import hashlib
+import io
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import segno
+from django.conf import settings
+
+
+# Mã QR chuyển khoản theo chuẩn VietQR (EMVCo Merchant-Presented QR của NAPAS), tạo và vẽ ngay
+# trên server thay vì dùng ảnh của img.vietqr.io.
+# - Payload: các trường TLV (ID 2 số, độ dài 2 số, giá trị), kết thúc bằng CRC-16/CCITT-FALSE.
+# - Ảnh PNG/SVG được giữ trong LRU của từng process theo (payment, package, loại license, license);
+#   mỗi entry có version = hash của payload, URL ảnh mang ?v=<version> nên được cache lâu dài ở
+#   trình duyệt và tự đổi khi thông tin chuyển khoản/gói/license thay đổi.
+
+NAPAS_GUID = 'A000000727'
+SERVICE_TRANSFER_TO_ACCOUNT = 'QRIBFTTA'
+CURRENCY_VND = '704'
+COUNTRY_VN = 'VN'
+# Giá trị của một trường TLV tối đa 99 ký tự; trường 62 chứa thêm ID + độ dài của trường con 08
+MAX_PURPOSE_LENGTH = 95
+
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+PNG_SCALE = 8
+SVG_SCALE = 8
+BORDER = 4
+
+
+def _tlv(tag, value):
+    value = str(value)
+    if len(value) > 99:
+        raise ValueError(f'Trường {tag} dài quá 99 ký tự')
+    return f'{tag}{len(value):02d}{value}'
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE (poly 0x1021, khởi tạo 0xFFFF) như EMVCo quy định cho trường 63."""
+    crc = 0xFFFF
+    for byte in data.encode('utf-8'):
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else crc << 1
+            crc &= 0xFFFF
+    return crc
+
+
+def ascii_content(text):
+    """Bỏ dấu tiếng Việt và ký tự ngoài ASCII: nhiều app ngân hàng không đọc được nội dung có dấu."""
+    text = unicodedata.normalize('NFD', str(text or '')).replace('đ', 'd').replace('Đ', 'D')
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r'[^\x20-\x7e]', ' ', text)
+    return ' '.join(text.split())[:MAX_PURPOSE_LENGTH]
+
+
+def build_payload(bank_bin, account_number, amount=0, content=''):
+    """Payload VietQR chuyển khoản tới số tài khoản; có số tiền thì là QR động (01=12)."""
+    beneficiary = _tlv('00', bank_bin) + _tlv('01', str(account_number).strip())
+    merchant_account = _tlv('00', NAPAS_GUID) + _tlv('01', beneficiary) + _tlv('02', SERVICE_TRANSFER_TO_ACCOUNT)
+    amount = int(amount or 0)
+    parts = [
+        _tlv('00', '01'),
+        _tlv('01', '12' if amount > 0 else '11'),
+        _tlv('38', merchant_account),
+        _tlv('53', CURRENCY_VND),
+    ]
+    if amount > 0:
+        parts.append(_tlv('54', amount))
+    parts.append(_tlv('58', COUNTRY_VN))
+    content = ascii_content(content)
+    if content:
+        parts.append(_tlv('62', _tlv('08', content)))
+    payload = ''.join(parts) + '6304'
+    return payload + f'{crc16(payload):04X}'
+
+
+def payload_version(payload):
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def render(payload, fmt):
+    qr = segno.make(payload, error='m', micro=False)
+    out = io.BytesIO()
+    if fmt == 'svg':
+        qr.save(out, kind='svg', scale=SVG_SCALE, border=BORDER, xmldecl=False)
+    else:
+        qr.save(out, kind='png', scale=PNG_SCALE, border=BORDER)
+    return out.getvalue()
+
+
+class QrImage:
+    """Payload của một mã QR cùng các ảnh đã vẽ (vẽ lần đầu khi được yêu cầu)."""
+
+    def __init__(self, payload, owner_id):
+        self.payload = payload
+        self.owner_id = owner_id
+        self.version = payload_version(payload)
+        self._images = {}
+
+    def image(self, fmt):
+        data = self._images.get(fmt)
+        if data is None:
+            data = self._images[fmt] = render(self.payload, fmt)
+        return data
+
+
+class _QrImageCache:
+    """LRU (payment_id, package_id, license_type, license_id) -> QrImage dùng chung trong một process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @property
+    def max_size(self):
+        return int(getattr(settings, 'QR_IMAGE_CACHE_SIZE', 256))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, payload, owner_id):
+        """Lưu payload mới; giữ lại entry cũ (và ảnh đã vẽ) nếu payload không đổi."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.payload != payload or entry.owner_id != owner_id:
+                entry = QrImage(payload, owner_id)
+            if self.max_size <= 0:
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+qr_images = _QrImageCache()
@@ -1,7 +1,7 @@
+import hashlib
+import hmac
 import uuid
-import json
-from datetime import timedelta
-from pathlib import Path
+from datetime import datetime, timedelta, timezone as dt_timezone
 from urllib.parse import quote
 
 from django.contrib import messages
@@ -12,19 +12,69 @@ from django.contrib.auth.views import LoginView
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils import timezone
 from django.urls import reverse
-from django.http import QueryDict, JsonResponse, HttpResponse
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseForbidden,
+    HttpResponseNotModified,
+    JsonResponse,
+    QueryDict,
+    StreamingHttpResponse,
+)
 from django.conf import settings
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import transaction
+from django.db.models import Count, Max
 from django import forms
 from urllib.parse import urlencode
 
 from rest_framework import status
-from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, parser_classes, permission_classes
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 
-from .forms import LicenseCreateForm, LicenseExtendForm, ProfileForm, LicenseTikTokCreateForm, LicenseTikTokExtendForm
-from .models import License, LicenseTikTok, ExtensionPackage, PaymentInfo
+from .forms import (
+    LicenseCreateForm,
+    LicenseExtendForm,
+    LicenseImportForm,
+    LicenseTikTokCreateForm,
+    LicenseTikTokExtendForm,
+    ProfileForm,
+)
+from .export import (
+    LICENSE_ROW_FIELDS,
+    TIKTOK_LICENSE_ROW_FIELDS,
+    iter_ndjson,
+    license_row_to_dict,
+    tiktok_license_row_to_dict,
+)
+from .filters import apply_license_filters, apply_license_search, parse_int
+from .models import License, LicenseJob, LicenseTikTok, RevokedLicenseToken
+from .imports import ImportFileError
+from .jobs import enqueue_import, enqueue_job, job_to_dict
+from . import metrics as request_metrics
+from .pagination import InvalidCursor, decode_cursor, estimated_count, keyset_page, keyset_window, parse_page_size
+from .purge import purge_licenses
+from .stats import owner_stats
+from .tokens import issue_token, public_key, revocation_cutoff, token_algorithm
+from .archive import archive_model
 from .auth import APIKeyAuthentication
+from .banks import bank_directory
+from .bulk import bulk_create_licenses, bulk_create_tiktok_licenses, bulk_extend
+from .catalog import active_packages, active_payment, find_package, find_payment, package_to_dict, payment_to_dict
+from .cache import (
+    KIND_TIKTOK,
+    KIND_ZALO,
+    NOT_FOUND,
+    get_verify_entry,
+    invalidate_verify_on_commit,
+    is_not_found,
+    set_verify_entry,
+    verify_cache_stats,
+)
+from .db_router import replica_cache_timeout
+from .vietqr import FORMATS as QR_FORMATS, build_payload, qr_images
 
 
 def _style_form(form):
@@ -46,6 +96,74 @@ class StyledLoginView(LoginView):
     template_name = 'registration/login.html'
 
 
+def _paginate_dashboard(request, licenses_qs):
+    """Phân trang danh sách license trên dashboard.
+
+    DASHBOARD_PAGINATION='keyset' (mặc định): phân trang theo cursor (created_at, id), không
+    COUNT(*) và không OFFSET; tổng số chỉ là ước lượng. 'offset': dùng Paginator như cũ.
+    """
+    per_page = parse_page_size(
+        request.GET.get('per_page'),
+        settings.DASHBOARD_PAGE_SIZE,
+        settings.DASHBOARD_MAX_PAGE_SIZE,
+    )
+
+    if settings.DASHBOARD_PAGINATION == 'offset':
+        paginator = Paginator(licenses_qs, per_page)
+        try:
+            page_obj = paginator.page(request.GET.get('page', 1))
+        except PageNotAnInteger:
+            page_obj = paginator.page(1)
+        except EmptyPage:
+            page_obj = paginator.page(paginator.num_pages)
+        return {'licenses': page_obj.object_list, 'page_obj': page_obj, 'per_page': per_page}
+
+    try:
+        keyset = keyset_window(
+            licenses_qs, request.GET.get('after'), request.GET.get('before'), per_page
+        )
+    except InvalidCursor:
+        keyset = keyset_window(licenses_qs, page_size=per_page)
+
+    total, exact = estimated_count(licenses_qs, settings.DASHBOARD_COUNT_CAP)
+    if exact:
+        total_label = f'{total}'
+    elif total == settings.DASHBOARD_COUNT_CAP:
+        total_label = f'hơn {total}'
+    else:
+        total_label = f'khoảng {total}'
+    return {'licenses': keyset.object_list, 'keyset': keyset, 'total_label': total_label, 'per_page': per_page}
+
+
+def _dashboard_stats(request, user_id, kind):
+    """Số license còn hạn / sắp hết hạn / hết hạn lấy từ license_stats."""
+    owner_id = request.user.id
+    if request.user.is_superuser:
+        owner_id = parse_int(user_id)
+    data, as_of = owner_stats(owner_id)
+    return {**data[kind], 'as_of': as_of}
+
+
+def _import_from_dashboard(request, kind):
+    import_form = LicenseImportForm(request.POST, request.FILES)
+    if import_form.is_valid():
+        try:
+            job = import_form.save(request.user, kind)
+        except forms.ValidationError as e:
+            import_form.add_error(None, e)
+        else:
+            messages.success(request, f'Đã nhận file {job.params["filename"]}, license đang được tạo trong nền.')
+            return
+    for errors in import_form.errors.values():
+        for error in errors:
+            messages.error(request, error)
+
+
+def _recent_jobs(request, kind):
+    # Queryset lazy: chỉ truy vấn khi template hiển thị (superuser)
+    return LicenseJob.objects.filter(owner=request.user, license_type=kind)[:5]
+
+
 @login_required
 def dashboard(request):
     form = LicenseCreateForm(owner=request.user)
@@ -68,6 +186,9 @@ def dashboard(request):
                     return redirect('licenses:dashboard')
                 except forms.ValidationError as e:
                     form.add_error(None, e)
+        elif action == 'import' and request.user.is_superuser:
+            _import_from_dashboard(request, KIND_ZALO)
+            return redirect('licenses:dashboard')
         elif action == 'delete_selected':
             selected_ids = request.POST.getlist('selected_ids')
             
@@ -86,28 +207,21 @@ def dashboard(request):
                 return redirect(redirect_url)
 
             # Superuser can delete any license, regular users can only delete their own
-            if request.user.is_superuser:
-                licenses_qs = License.objects.filter(id__in=selected_ids)
-            else:
-                licenses_qs = License.objects.filter(owner=request.user, id__in=selected_ids)
-            
-            deleted_count = licenses_qs.count()
+            owner_id = None if request.user.is_superuser else request.user.id
+            deleted_count = purge_licenses(License, owner_id=owner_id, ids=selected_ids)
             if deleted_count == 0:
                 messages.warning(request, 'Không tìm thấy license tương ứng để xóa.')
             else:
-                licenses_qs.delete()
                 messages.success(request, f'Đã xóa {deleted_count} license đã chọn.')
             
             return redirect(redirect_url)
 
-    from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
     # Base queryset: superuser sees all, others see own licenses only
     if request.user.is_superuser:
         licenses_qs = License.objects.all()
     else:
         licenses_qs = License.objects.filter(owner=request.user)
-    licenses_qs = licenses_qs.order_by('-created_at')
+    licenses_qs = licenses_qs.select_related('owner').order_by('-created_at')
 
     # Filters
     q = request.GET.get('q', '').strip()
@@ -116,47 +230,13 @@ def dashboard(request):
     days_max = request.GET.get('days_max', '').strip()
     user_id = request.GET.get('user_id', '').strip() if request.user.is_superuser else ''
 
-    if q:
-        from django.db.models import Q
-        licenses_qs = licenses_qs.filter(Q(phone_number__icontains=q) | Q(code__icontains=q))
+    licenses_qs = apply_license_search(licenses_qs, q, 'phone_number')
 
-    now = timezone.now()
-    if status_filter == 'active':
-        licenses_qs = licenses_qs.filter(expired_at__gt=now)
-    elif status_filter == 'expired':
-        licenses_qs = licenses_qs.filter(expired_at__lte=now)
-
-    def parse_int(val):
-        try:
-            return int(val)
-        except (TypeError, ValueError):
-            return None
-
-    dmin = parse_int(days_min)
-    dmax = parse_int(days_max)
-    if dmin is not None:
-        licenses_qs = licenses_qs.filter(expired_at__gte=now + timedelta(days=dmin))
-    if dmax is not None:
-        licenses_qs = licenses_qs.filter(expired_at__lte=now + timedelta(days=dmax))
-
-    if user_id and request.user.is_superuser:
-        try:
-            user_id_int = int(user_id)
-            licenses_qs = licenses_qs.filter(owner_id=user_id_int)
-        except (TypeError, ValueError):
-            pass
-    page = request.GET.get('page', 1)
-    per_page = 10
-    paginator = Paginator(licenses_qs, per_page)
-    try:
-        page_obj = paginator.page(page)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    licenses_qs = apply_license_filters(licenses_qs, status_filter, days_min, days_max, user_id)
+    pagination = _paginate_dashboard(request, licenses_qs)
 
     # Preserve filters in pagination links
-    qs_params = {k: v for k, v in request.GET.items() if k != 'page' and v}
+    qs_params = {k: v for k, v in request.GET.items() if k not in ('page', 'after', 'before') and v}
     base_querystring = urlencode(qs_params)
 
     users = []
@@ -167,28 +247,20 @@ def dashboard(request):
     # Non-superuser bây giờ có thể tạo nhiều license
     can_create_license = True
     
-    # Load banks data for payment info
-    banks_data = []
-    try:
-        banks_file = Path(settings.BASE_DIR) / 'banks.json'
-        with open(banks_file, 'r', encoding='utf-8') as f:
-            banks_data = json.load(f)
-    except FileNotFoundError:
-        pass
-    
     return render(
         request,
         'licenses/dashboard.html',
         {
             'form': _style_form(form),
-            'licenses': page_obj.object_list,
-            'page_obj': page_obj,
+            **pagination,
             'is_superuser': request.user.is_superuser,
             'users': users,
             'can_create_license': can_create_license,
             'filters': {'q': q, 'status': status_filter, 'days_min': days_min, 'days_max': days_max, 'user_id': user_id},
             'base_querystring': base_querystring,
-            'banks_data': json.dumps(banks_data),
+            'banks_version': bank_directory.version(),
+            'license_stats': _dashboard_stats(request, user_id, KIND_ZALO),
+            'recent_jobs': _recent_jobs(request, KIND_ZALO),
         },
     )
 
@@ -239,69 +311,249 @@ def delete_license(request, pk):
     )
 
 
+def _wants_token(request):
+    return request.data.get('token') in (True, 1, '1', 'true')
+
+
+def _parse_verify_input(code, identity, identity_field):
+    """Trả về (normalized_code, None) hoặc (None, (data, status)) khi input không hợp lệ."""
+    if not code:
+        return None, ({'status': False, 'error': 'code là bắt buộc'}, status.HTTP_400_BAD_REQUEST)
+
+    if not identity:
+        return None, ({'status': False, 'error': f'{identity_field} là bắt buộc'}, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        return str(uuid.UUID(str(code))), None
+    except (ValueError, AttributeError, TypeError):
+        return None, ({'status': False, 'valid': False, 'reason': 'not_found'}, status.HTTP_404_NOT_FOUND)
+
+
+def _verify_entry_from_obj(license_obj, identity_field):
+    """(identity, expired_at_ts) của license, hoặc None nếu expired_at không hợp lệ."""
+    try:
+        return getattr(license_obj, identity_field), license_obj.expired_at.timestamp()
+    except (OverflowError, OSError, ValueError, AttributeError):
+        return None
+
+
+def _identity_matches(stored, identity):
+    # Như lookup cũ phone_number=... trong DB: client có thể gửi số (84901234567) thay vì chuỗi
+    return stored == str(identity).strip()
+
+
+def _verify_result(kind, identity_field, normalized_code, identity, entry, with_token=False):
+    """Tính (data, status) từ entry trong cache/DB; dùng chung cho view sync và async."""
+    if entry is None:
+        return {'status': False, 'valid': False, 'reason': 'invalid_expired_at'}, status.HTTP_500_INTERNAL_SERVER_ERROR
+
+    if is_not_found(entry) or not _identity_matches(entry[0], identity):
+        return {'status': False, 'valid': False, 'reason': 'not_found'}, status.HTTP_404_NOT_FOUND
+
+    expired_at_ts = entry[1]
+    if timezone.now().timestamp() >= expired_at_ts:
+        return {'status': True, 'valid': False, 'expired_at': int(expired_at_ts)}, status.HTTP_410_GONE
+
+    data = {
+        'status': True,
+        'valid': True,
+        'expired_at': int(expired_at_ts),
+    }
+    if with_token:
+        token, token_expires_at = issue_token(kind, normalized_code, identity_field, entry[0], expired_at_ts)
+        if token:
+            data['token'] = token
+            data['token_expires_at'] = token_expires_at
+    return data, status.HTTP_200_OK
+
+
+def _verify_response(model, kind, identity_field, normalized_code, identity, with_token=False):
+    # Ưu tiên kết quả trong cache; cache được xóa qua signal khi license thay đổi
+    entry = get_verify_entry(kind, normalized_code)
+    if entry is None:
+        try:
+            license_obj = model.objects.only(identity_field, 'expired_at').get(code=normalized_code)
+        except model.DoesNotExist:
+            # License đã lưu trữ vẫn trả về như license hết hạn
+            license_obj = archive_model(kind).objects.only(identity_field, 'expired_at').filter(code=normalized_code).first()
+        # Kết quả đọc từ replica có thể cũ: chỉ cache trong khoảng độ trễ replica cho phép
+        max_timeout = replica_cache_timeout()
+        if license_obj is None:
+            set_verify_entry(kind, normalized_code, None, None, max_timeout)
+            entry = NOT_FOUND
+        else:
+            entry = _verify_entry_from_obj(license_obj, identity_field)
+            if entry is not None:
+                set_verify_entry(kind, normalized_code, entry[0], license_obj.expired_at, max_timeout)
+
+    data, status_code = _verify_result(kind, identity_field, normalized_code, identity, entry, with_token)
+    return Response(data, status=status_code)
+
+
 @api_view(['POST'])
 @authentication_classes([APIKeyAuthentication])
 @permission_classes([AllowAny])
 def verify_license(request):
-    code = request.data.get('code')
-    phone_number = request.data.get('phone_number')
+    normalized_code, error = _parse_verify_input(request.data.get('code'), request.data.get('phone_number'), 'phone_number')
+    if error:
+        return Response(error[0], status=error[1])
 
-    if not code:
+    return _verify_response(
+        License, KIND_ZALO, 'phone_number', normalized_code, request.data.get('phone_number'), with_token=_wants_token(request)
+    )
+
+
+def _verify_batch_response(request, model, kind, identity_field):
+    items = request.data.get('items')
+    max_items = getattr(settings, 'VERIFY_BATCH_MAX_ITEMS', 5000)
+
+    if not isinstance(items, list) or not items:
         return Response(
-            {'status': False, 'error': 'code là bắt buộc'},
+            {'status': False, 'error': 'items phải là mảng không rỗng'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if not phone_number:
+    if len(items) > max_items:
         return Response(
-            {'status': False, 'error': 'phone_number là bắt buộc'},
+            {'status': False, 'error': f'items vượt quá {max_items} phần tử'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    try:
-        normalized_code = str(uuid.UUID(str(code)))
-    except (ValueError, AttributeError, TypeError):
-        return Response(
-            {'status': False, 'valid': False, 'reason': 'not_found'},
-            status=status.HTTP_404_NOT_FOUND,
+    # Chuẩn hóa input trước, sau đó tra tất cả code bằng một câu truy vấn
+    parsed = []
+    for item in items:
+        if not isinstance(item, dict):
+            parsed.append((None, None, None, 'item phải là object'))
+            continue
+        code = item.get('code')
+        identity = item.get(identity_field)
+        if not code:
+            parsed.append((code, identity, None, 'code là bắt buộc'))
+            continue
+        if not identity:
+            parsed.append((code, identity, None, f'{identity_field} là bắt buộc'))
+            continue
+        try:
+            normalized_code = str(uuid.UUID(str(code)))
+        except (ValueError, AttributeError, TypeError):
+            normalized_code = None
+        parsed.append((code, identity, normalized_code, None))
+
+    codes = {normalized_code for _, _, normalized_code, _ in parsed if normalized_code}
+    found = {
+        str(code): (identity, expired_at)
+        for code, identity, expired_at in model.objects.filter(code__in=codes)
+        .order_by()
+        .values_list('code', identity_field, 'expired_at')
+    }
+    missing = codes - found.keys()
+    if missing:
+        # License đã lưu trữ vẫn trả về như license hết hạn
+        found.update(
+            (str(code), (identity, expired_at))
+            for code, identity, expired_at in archive_model(kind).objects.filter(code__in=missing)
+            .order_by()
+            .values_list('code', identity_field, 'expired_at')
         )
 
-    try:
-        license_obj = License.objects.get(code=normalized_code, phone_number=phone_number)
-    except License.DoesNotExist:
-        return Response(
-            {'status': False, 'valid': False, 'reason': 'not_found'},
-            status=status.HTTP_404_NOT_FOUND,
-        )
+    now = timezone.now()
+    results = []
+    for code, identity, normalized_code, error in parsed:
+        result = {'code': code, identity_field: identity}
+        if error:
+            result.update({'status': False, 'error': error})
+        elif normalized_code not in found or not _identity_matches(found[normalized_code][0], identity):
+            result.update({'status': False, 'valid': False, 'reason': 'not_found'})
+        else:
+            expired_at = found[normalized_code][1]
+            try:
+                expired_at_ts = int(expired_at.timestamp())
+            except (OverflowError, OSError, ValueError, AttributeError):
+                result.update({'status': False, 'valid': False, 'reason': 'invalid_expired_at'})
+            else:
+                result.update({'status': True, 'valid': now < expired_at, 'expired_at': expired_at_ts})
+        results.append(result)
+
+    return Response({'status': True, 'data': results}, status=status.HTTP_200_OK)
 
-    try:
-        expired_at_ts = int(license_obj.expired_at.timestamp())
-    except (OverflowError, OSError, ValueError, AttributeError):
-        return Response(
-            {'status': False, 'valid': False, 'reason': 'invalid_expired_at'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
 
-    if license_obj.is_expired:
+@api_view(['POST'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def verify_license_batch(request):
+    return _verify_batch_response(request, License, KIND_ZALO, 'phone_number')
+
+
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def verify_cache_stats_api(request):
+    if not request.user.is_superuser:
+        return Response({'status': False, 'error': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
+    return Response({'status': True, 'data': verify_cache_stats()}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def license_stats_api(request):
+    # Đọc từ bảng license_stats (một truy vấn), không quét bảng license
+    owner_id = request.user.id
+    if request.user.is_superuser:
+        owner_id = parse_int(request.query_params.get('user_id'))
+    data, as_of = owner_stats(owner_id)
+    return Response(
+        {'status': True, 'data': data, 'as_of': int(as_of.timestamp()) if as_of else None},
+        status=status.HTTP_200_OK,
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def token_key_api(request):
+    alg = token_algorithm()
+    if alg is None:
         return Response(
-            {
-                'status': True,
-                'valid': False,
-                'expired_at': expired_at_ts,
-            },
-            status=status.HTTP_410_GONE,
+            {'status': False, 'error': 'Chưa cấu hình token offline'},
+            status=status.HTTP_404_NOT_FOUND,
         )
-
     return Response(
         {
             'status': True,
-            'valid': True,
-            'expired_at': expired_at_ts,
+            'alg': alg,
+            'public_key': public_key(),
+            'max_age': settings.LICENSE_TOKEN_MAX_AGE,
         },
         status=status.HTTP_200_OK,
     )
 
 
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def token_revocations_api(request):
+    now = timezone.now()
+    cutoff = revocation_cutoff(now)
+    try:
+        since = datetime.fromtimestamp(int(request.query_params['since']), tz=dt_timezone.utc)
+        cutoff = max(cutoff, since)
+    except (KeyError, TypeError, ValueError, OverflowError, OSError):
+        pass
+
+    revoked = RevokedLicenseToken.objects.filter(revoked_at__gt=cutoff)
+    if not request.user.is_superuser:
+        revoked = revoked.filter(owner=request.user)
+    data = [
+        {'type': license_type, 'code': str(code), 'revoked_at': int(revoked_at.timestamp())}
+        for license_type, code, revoked_at in revoked.values_list('license_type', 'code', 'revoked_at')
+    ]
+    return Response(
+        {'status': True, 'generated_at': int(now.timestamp()), 'data': data},
+        status=status.HTTP_200_OK,
+    )
+
+
 def _license_to_dict(license_obj):
     return {
         'code': str(license_obj.code),
@@ -334,34 +586,138 @@ def create_license_api(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if len(phone_numbers) > 1000:
+    if len(phone_numbers) > settings.LICENSE_CREATE_MAX_ITEMS:
+        return Response(
+            {'status': False, 'error': f'phone_numbers vượt quá {settings.LICENSE_CREATE_MAX_ITEMS} số'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if any(not isinstance(phone, str) or not phone.strip() for phone in phone_numbers):
         return Response(
-            {'status': False, 'error': 'phone_numbers vượt quá 1000 số'},
+            {'status': False, 'error': 'Có số điện thoại không hợp lệ'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
     expires_at = timezone.now() + timedelta(days=expires_in)
-    created = []
+    created, _ = bulk_create_licenses(request.user, [phone.strip() for phone in phone_numbers], expires_at)
+
+    data = [_license_to_dict(item) for item in created]
+    return Response({'status': True, 'data': data}, status=status.HTTP_201_CREATED)
+
+
+def _import_api(request, kind):
+    uploaded_file = request.FILES.get('file')
+    if uploaded_file is None:
+        return Response({'status': False, 'error': 'file là bắt buộc'}, status=status.HTTP_400_BAD_REQUEST)
 
-    for phone in phone_numbers:
-        if not isinstance(phone, str) or not phone.strip():
+    try:
+        expires_in = int(request.data.get('expires_in'))
+        if expires_in <= 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        return Response(
+            {'status': False, 'error': 'expires_in phải là số nguyên dương'},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    owner = request.user
+    if request.data.get('owner_id'):
+        # Chỉ superuser được import cho người dùng khác
+        if not request.user.is_superuser:
+            return Response({'status': False, 'error': 'Forbidden'}, status=status.HTTP_403_FORBIDDEN)
+        owner = get_user_model().objects.filter(pk=parse_int(request.data.get('owner_id'))).first()
+        if owner is None:
             return Response(
-                {'status': False, 'error': 'Có số điện thoại không hợp lệ'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        phone = phone.strip()
-        if License.objects.filter(phone_number=phone).exists():
-            continue
-        created.append(
-            License.objects.create(
-                owner=request.user,
-                phone_number=phone,
-                expired_at=expires_at,
+                {'status': False, 'error': 'người dùng không tồn tại'},
+                status=status.HTTP_404_NOT_FOUND,
             )
+
+    try:
+        job = enqueue_import(kind, request.user, owner, uploaded_file, expires_in)
+    except ImportFileError as exc:
+        return Response({'status': False, 'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(
+        {'status': True, 'message': 'queued', 'job_id': str(job.id), 'job': job_to_dict(job)},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(['POST'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+@parser_classes([MultiPartParser])
+def import_license_api(request):
+    return _import_api(request, KIND_ZALO)
+
+
+@api_view(['POST'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+@parser_classes([MultiPartParser])
+def import_tiktok_license_api(request):
+    return _import_api(request, KIND_TIKTOK)
+
+
+# Validator cho ETag của /list: số dòng và updated_at lớn nhất, lấy bằng một câu aggregate
+LIST_VALIDATOR = {'count': Count('id'), 'last_updated': Max('updated_at')}
+
+
+def _list_etag(user, q, cursor, page_size, validator):
+    last_updated = validator['last_updated']
+    raw = '|'.join([
+        str(user.pk),
+        str(int(user.is_superuser)),
+        q,
+        cursor or '',
+        str(page_size),
+        str(validator['count']),
+        last_updated.isoformat() if last_updated else '',
+    ])
+    return '"%s"' % hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _etag_matches(request, etag):
+    tags = [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]
+    return '*' in tags or etag in tags or f'W/{etag}' in tags
+
+
+def _with_etag(response, etag):
+    response['ETag'] = etag
+    # Client phải hỏi lại server mỗi lần, server trả 304 nếu dữ liệu không đổi
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _list_page_response(request, queryset, fields, row_to_dict, identity_field):
+    page_size = parse_page_size(
+        request.query_params.get('limit'),
+        settings.LIST_API_PAGE_SIZE,
+        settings.LIST_API_MAX_PAGE_SIZE,
+    )
+    cursor = request.query_params.get('cursor')
+    try:
+        if cursor:
+            decode_cursor(cursor)
+    except InvalidCursor:
+        return Response(
+            {'status': False, 'error': 'cursor không hợp lệ'},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
-    data = [_license_to_dict(item) for item in created]
-    return Response({'status': True, 'data': data}, status=status.HTTP_201_CREATED)
+    q = request.query_params.get('q', '').strip()
+    queryset = apply_license_search(queryset, q, identity_field)
+
+    etag = _list_etag(request.user, q, cursor, page_size, queryset.order_by().aggregate(**LIST_VALIDATOR))
+    if _etag_matches(request, etag):
+        return _with_etag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+
+    # Chỉ lấy các cột cần thiết, join sẵn username của owner (1 truy vấn mỗi trang)
+    rows, next_cursor = keyset_page(queryset.values(*fields), cursor, page_size)
+    data = [row_to_dict(row) for row in rows]
+    return _with_etag(
+        Response({'status': True, 'data': data, 'next_cursor': next_cursor}, status=status.HTTP_200_OK),
+        etag,
+    )
 
 
 @api_view(['GET'])
@@ -372,14 +728,10 @@ def list_license_api(request):
         licenses = License.objects.all()
     else:
         licenses = License.objects.filter(owner=request.user)
-    data = [_license_to_dict(license_obj) for license_obj in licenses]
-    return Response({'status': True, 'data': data}, status=status.HTTP_200_OK)
+    return _list_page_response(request, licenses, LICENSE_ROW_FIELDS, license_row_to_dict, 'phone_number')
 
 
-@api_view(['PUT'])
-@authentication_classes([APIKeyAuthentication])
-@permission_classes([AllowAny])
-def update_license_api(request):
+def _bulk_extend_response(request, model, kind):
     codes = request.data.get('code')
     expires_in = request.data.get('expires_in')
 
@@ -413,41 +765,41 @@ def update_license_api(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    updated = 0
-    not_found = []
-    now = timezone.now()
-    expired_at_list = []
-
+    normalized = []
     for code in codes:
         try:
-            license_obj = License.objects.get(code=code, owner=request.user)
-            # Gia hạn thêm số ngày: nếu chưa hết hạn thì cộng vào ngày hết hạn hiện tại, nếu đã hết hạn thì từ bây giờ
-            if license_obj.expired_at > now:
-                # Chưa hết hạn: cộng thêm vào ngày hết hạn hiện tại
-                license_obj.expired_at = license_obj.expired_at + timedelta(days=expires_in)
-            else:
-                # Đã hết hạn: tính từ bây giờ
-                license_obj.expired_at = now + timedelta(days=expires_in)
-            license_obj.save(update_fields=['expired_at', 'updated_at'])
-            expired_at_list.append(int(license_obj.expired_at.timestamp()))
-            updated += 1
-        except License.DoesNotExist:
+            normalized.append((code, str(uuid.UUID(str(code)))))
+        except (ValueError, AttributeError, TypeError):
+            normalized.append((code, None))
+
+    # Gia hạn thêm số ngày: nếu chưa hết hạn thì cộng vào ngày hết hạn hiện tại, nếu đã hết hạn thì từ bây giờ.
+    # Toàn bộ được thực hiện bằng một câu UPDATE nên không mất lượt gia hạn khi có request đồng thời.
+    with transaction.atomic(savepoint=False):
+        extended = bulk_extend(model, request.user, {c for _, c in normalized if c}, expires_in)
+        invalidate_verify_on_commit(kind, *extended.keys())
+
+    expired_at_by_code = {}
+    not_found = []
+    for code, normalized_code in normalized:
+        expired_at = extended.get(normalized_code)
+        if expired_at is None:
             not_found.append(code)
+        else:
+            expired_at_by_code[str(code)] = int(expired_at.timestamp())
 
-    if updated == 0:
+    if not extended:
         return Response(
             {'status': False, 'error': 'không tìm thấy code nào để cập nhật'},
             status=status.HTTP_404_NOT_FOUND,
         )
 
-    # Lấy expired_at của license đầu tiên được cập nhật (hoặc có thể lấy max/min tùy logic)
-    expired_at = expired_at_list[0] if expired_at_list else int((now + timedelta(days=expires_in)).timestamp())
-
     response_data = {
         'status': True,
         'message': 'updated',
-        'updated_count': updated,
-        'expired_at': expired_at,
+        'updated_count': len(extended),
+        # Giữ tương thích: expired_at của license đầu tiên được cập nhật
+        'expired_at': next(iter(expired_at_by_code.values())),
+        'expired_at_by_code': expired_at_by_code,
     }
 
     if not_found:
@@ -456,6 +808,42 @@ def update_license_api(request):
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+def _export_response(request, model, fields, row_to_dict, filename):
+    if request.user.is_superuser:
+        licenses = model.objects.all()
+        user_id = request.query_params.get('user_id', '').strip()
+    else:
+        licenses = model.objects.filter(owner=request.user)
+        user_id = ''
+    licenses = apply_license_filters(
+        licenses,
+        request.query_params.get('status', '').strip(),
+        request.query_params.get('days_min', '').strip(),
+        request.query_params.get('days_max', '').strip(),
+        user_id,
+    )
+    response = StreamingHttpResponse(
+        iter_ndjson(licenses, fields, row_to_dict),
+        content_type='application/x-ndjson; charset=utf-8',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def export_license_api(request):
+    return _export_response(request, License, LICENSE_ROW_FIELDS, license_row_to_dict, 'licenses.ndjson')
+
+
+@api_view(['PUT'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def update_license_api(request):
+    return _bulk_extend_response(request, License, KIND_ZALO)
+
+
 @api_view(['DELETE'])
 @authentication_classes([APIKeyAuthentication])
 @permission_classes([AllowAny])
@@ -479,11 +867,41 @@ def delete_license_api(request):
     return Response({'status': True, 'message': 'deleted'}, status=status.HTTP_200_OK)
 
 
+def _wants_background(request):
+    value = request.query_params.get('background', request.data.get('background'))
+    return value in (True, 1, '1', 'true')
+
+
+def _enqueue_purge(request, kind):
+    # Tổng lấy từ license_stats (O(1)) để client theo dõi tiến độ
+    total = owner_stats(request.user.id)[0][kind]['total']
+    job = enqueue_job(LicenseJob.KIND_PURGE, request.user, kind, {'owner_id': request.user.id}, total=total)
+    return Response(
+        {'status': True, 'message': 'queued', 'job_id': str(job.id), 'job': job_to_dict(job)},
+        status=status.HTTP_202_ACCEPTED,
+    )
+
+
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def job_status_api(request, job_id):
+    jobs = LicenseJob.objects.all()
+    if not request.user.is_superuser:
+        jobs = jobs.filter(owner=request.user)
+    job = jobs.filter(pk=job_id).first()
+    if job is None:
+        return Response({'status': False, 'error': 'job không tồn tại'}, status=status.HTTP_404_NOT_FOUND)
+    return Response({'status': True, 'data': job_to_dict(job)}, status=status.HTTP_200_OK)
+
+
 @api_view(['DELETE'])
 @authentication_classes([APIKeyAuthentication])
 @permission_classes([AllowAny])
 def delete_all_license_api(request):
-    deleted_count, _ = License.objects.filter(owner=request.user).delete()
+    if _wants_background(request):
+        return _enqueue_purge(request, KIND_ZALO)
+    deleted_count = purge_licenses(License, owner_id=request.user.id)
     return Response(
         {'status': True, 'message': 'deleted_all', 'deleted_count': deleted_count},
         status=status.HTTP_200_OK,
@@ -556,63 +974,20 @@ def api_create_user(request):
 @authentication_classes([APIKeyAuthentication])
 @permission_classes([AllowAny])
 def verify_tiktok_license(request):
-    code = request.data.get('code')
-    shop_id = request.data.get('shop_id')
-
-    if not code:
-        return Response(
-            {'status': False, 'error': 'code là bắt buộc'},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
-
-    if not shop_id:
-        return Response(
-            {'status': False, 'error': 'shop_id là bắt buộc'},
-            status=status.HTTP_400_BAD_REQUEST,
-        )
+    normalized_code, error = _parse_verify_input(request.data.get('code'), request.data.get('shop_id'), 'shop_id')
+    if error:
+        return Response(error[0], status=error[1])
 
-    try:
-        normalized_code = str(uuid.UUID(str(code)))
-    except (ValueError, AttributeError, TypeError):
-        return Response(
-            {'status': False, 'valid': False, 'reason': 'not_found'},
-            status=status.HTTP_404_NOT_FOUND,
-        )
-
-    try:
-        license_obj = LicenseTikTok.objects.get(code=normalized_code, shop_id=shop_id)
-    except LicenseTikTok.DoesNotExist:
-        return Response(
-            {'status': False, 'valid': False, 'reason': 'not_found'},
-            status=status.HTTP_404_NOT_FOUND,
-        )
-
-    try:
-        expired_at_ts = int(license_obj.expired_at.timestamp())
-    except (OverflowError, OSError, ValueError, AttributeError):
-        return Response(
-            {'status': False, 'valid': False, 'reason': 'invalid_expired_at'},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-        )
+    return _verify_response(
+        LicenseTikTok, KIND_TIKTOK, 'shop_id', normalized_code, request.data.get('shop_id'), with_token=_wants_token(request)
+    )
 
-    if license_obj.is_expired:
-        return Response(
-            {
-                'status': True,
-                'valid': False,
-                'expired_at': expired_at_ts,
-            },
-            status=status.HTTP_410_GONE,
-        )
 
-    return Response(
-        {
-            'status': True,
-            'valid': True,
-            'expired_at': expired_at_ts,
-        },
-        status=status.HTTP_200_OK,
-    )
+@api_view(['POST'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def verify_tiktok_license_batch(request):
+    return _verify_batch_response(request, LicenseTikTok, KIND_TIKTOK, 'shop_id')
 
 
 def _tiktok_license_to_dict(license_obj):
@@ -650,32 +1025,21 @@ def create_tiktok_license_api(request):
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    if len(shop_ids) > 1000:
+    if len(shop_ids) > settings.LICENSE_CREATE_MAX_ITEMS:
         return Response(
-            {'status': False, 'error': 'shop_ids vượt quá 1000 license'},
+            {'status': False, 'error': f'shop_ids vượt quá {settings.LICENSE_CREATE_MAX_ITEMS} license'},
             status=status.HTTP_400_BAD_REQUEST,
         )
 
-    expired_at = timezone.now() + timedelta(days=expires_in)
-    created = []
-
-    for shop_id in shop_ids:
-        if not isinstance(shop_id, str) or not shop_id.strip():
-            return Response(
-                {'status': False, 'error': 'Có mã cửa hàng không hợp lệ'},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        shop_id = shop_id.strip()
-        if LicenseTikTok.objects.filter(shop_id=shop_id, owner=request.user).exists():
-            continue
-        created.append(
-            LicenseTikTok.objects.create(
-                owner=request.user,
-                shop_id=shop_id,
-                expired_at=expired_at,
-            )
+    if any(not isinstance(shop_id, str) or not shop_id.strip() for shop_id in shop_ids):
+        return Response(
+            {'status': False, 'error': 'Có mã cửa hàng không hợp lệ'},
+            status=status.HTTP_400_BAD_REQUEST,
         )
 
+    expired_at = timezone.now() + timedelta(days=expires_in)
+    created, _ = bulk_create_tiktok_licenses(request.user, [shop_id.strip() for shop_id in shop_ids], expired_at)
+
     data = [_tiktok_license_to_dict(item) for item in created]
     return Response({'status': True, 'data': data}, status=status.HTTP_201_CREATED)
 
@@ -688,8 +1052,16 @@ def list_tiktok_license_api(request):
         licenses = LicenseTikTok.objects.all()
     else:
         licenses = LicenseTikTok.objects.filter(owner=request.user)
-    data = [_tiktok_license_to_dict(license_obj) for license_obj in licenses]
-    return Response({'status': True, 'data': data}, status=status.HTTP_200_OK)
+    return _list_page_response(request, licenses, TIKTOK_LICENSE_ROW_FIELDS, tiktok_license_row_to_dict, 'shop_id')
+
+
+@api_view(['GET'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def export_tiktok_license_api(request):
+    return _export_response(
+        request, LicenseTikTok, TIKTOK_LICENSE_ROW_FIELDS, tiktok_license_row_to_dict, 'licenses_tiktok.ndjson'
+    )
 
 
 @api_view(['PUT'])
@@ -714,7 +1086,7 @@ def update_tiktok_license_api(request):
     shop_id = shop_id.strip()
 
     try:
-        license_obj = LicenseTikTok.objects.get(id=id, owner=request.user)
+        license_obj = LicenseTikTok.objects.select_related('owner').get(id=id, owner=request.user)
     except LicenseTikTok.DoesNotExist:
         return Response(
             {'status': False, 'error': 'license không tồn tại'},
@@ -741,6 +1113,13 @@ def update_tiktok_license_api(request):
     )
 
 
+@api_view(['PUT'])
+@authentication_classes([APIKeyAuthentication])
+@permission_classes([AllowAny])
+def extend_tiktok_license_api(request):
+    return _bulk_extend_response(request, LicenseTikTok, KIND_TIKTOK)
+
+
 @api_view(['DELETE'])
 @authentication_classes([APIKeyAuthentication])
 @permission_classes([AllowAny])
@@ -768,7 +1147,9 @@ def delete_tiktok_license_api(request):
 @authentication_classes([APIKeyAuthentication])
 @permission_classes([AllowAny])
 def delete_all_tiktok_license_api(request):
-    deleted_count, _ = LicenseTikTok.objects.filter(owner=request.user).delete()
+    if _wants_background(request):
+        return _enqueue_purge(request, KIND_TIKTOK)
+    deleted_count = purge_licenses(LicenseTikTok, owner_id=request.user.id)
     return Response(
         {'status': True, 'message': 'deleted_all', 'deleted_count': deleted_count},
         status=status.HTTP_200_OK,
@@ -800,6 +1181,9 @@ def dashboard_tiktok(request):
                     return redirect('licenses:dashboard_tiktok')
                 except forms.ValidationError as e:
                     form.add_error(None, e)
+        elif action == 'import' and request.user.is_superuser:
+            _import_from_dashboard(request, KIND_TIKTOK)
+            return redirect('licenses:dashboard_tiktok')
         elif action == 'delete_selected':
             selected_ids = request.POST.getlist('selected_ids')
             
@@ -818,28 +1202,21 @@ def dashboard_tiktok(request):
                 return redirect(redirect_url)
 
             # Superuser can delete any license, regular users can only delete their own
-            if request.user.is_superuser:
-                licenses_qs = LicenseTikTok.objects.filter(id__in=selected_ids)
-            else:
-                licenses_qs = LicenseTikTok.objects.filter(owner=request.user, id__in=selected_ids)
-            
-            deleted_count = licenses_qs.count()
+            owner_id = None if request.user.is_superuser else request.user.id
+            deleted_count = purge_licenses(LicenseTikTok, owner_id=owner_id, ids=selected_ids)
             if deleted_count == 0:
                 messages.warning(request, 'Không tìm thấy license tương ứng để xóa.')
             else:
-                licenses_qs.delete()
                 messages.success(request, f'Đã xóa {deleted_count} license đã chọn.')
             
             return redirect(redirect_url)
 
-    from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-
     # Base queryset: superuser sees all, others see own licenses only
     if request.user.is_superuser:
         licenses_qs = LicenseTikTok.objects.all()
     else:
         licenses_qs = LicenseTikTok.objects.filter(owner=request.user)
-    licenses_qs = licenses_qs.order_by('-created_at')
+    licenses_qs = licenses_qs.select_related('owner').order_by('-created_at')
 
     # Filters
     q = request.GET.get('q', '').strip()
@@ -848,47 +1225,13 @@ def dashboard_tiktok(request):
     days_max = request.GET.get('days_max', '').strip()
     user_id = request.GET.get('user_id', '').strip() if request.user.is_superuser else ''
 
-    if q:
-        from django.db.models import Q
-        licenses_qs = licenses_qs.filter(Q(shop_id__icontains=q) | Q(code__icontains=q) | Q(owner__username__icontains=q))
+    licenses_qs = apply_license_search(licenses_qs, q, 'shop_id', include_owner=True)
 
-    now = timezone.now()
-    if status_filter == 'active':
-        licenses_qs = licenses_qs.filter(expired_at__gt=now)
-    elif status_filter == 'expired':
-        licenses_qs = licenses_qs.filter(expired_at__lte=now)
-
-    def parse_int(val):
-        try:
-            return int(val)
-        except (TypeError, ValueError):
-            return None
-
-    dmin = parse_int(days_min)
-    dmax = parse_int(days_max)
-    if dmin is not None:
-        licenses_qs = licenses_qs.filter(expired_at__gte=now + timedelta(days=dmin))
-    if dmax is not None:
-        licenses_qs = licenses_qs.filter(expired_at__lte=now + timedelta(days=dmax))
-
-    if user_id and request.user.is_superuser:
-        try:
-            user_id_int = int(user_id)
-            licenses_qs = licenses_qs.filter(owner_id=user_id_int)
-        except (TypeError, ValueError):
-            pass
-    page = request.GET.get('page', 1)
-    per_page = 10
-    paginator = Paginator(licenses_qs, per_page)
-    try:
-        page_obj = paginator.page(page)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+    licenses_qs = apply_license_filters(licenses_qs, status_filter, days_min, days_max, user_id)
+    pagination = _paginate_dashboard(request, licenses_qs)
 
     # Preserve filters in pagination links
-    qs_params = {k: v for k, v in request.GET.items() if k != 'page' and v}
+    qs_params = {k: v for k, v in request.GET.items() if k not in ('page', 'after', 'before') and v}
     base_querystring = urlencode(qs_params)
 
     users = []
@@ -899,28 +1242,20 @@ def dashboard_tiktok(request):
     # Kiểm tra non-superuser có thể tạo license không (chưa có license nào)
     can_create_license = request.user.is_superuser or not LicenseTikTok.objects.filter(owner=request.user).exists()
     
-    # Load banks data for payment info
-    banks_data = []
-    try:
-        banks_file = Path(settings.BASE_DIR) / 'banks.json'
-        with open(banks_file, 'r', encoding='utf-8') as f:
-            banks_data = json.load(f)
-    except FileNotFoundError:
-        pass
-    
     return render(
         request,
         'licenses/dashboard_tiktok.html',
         {
             'form': _style_form(form),
-            'licenses': page_obj.object_list,
-            'page_obj': page_obj,
+            **pagination,
             'is_superuser': request.user.is_superuser,
             'users': users,
             'can_create_license': can_create_license,
             'filters': {'q': q, 'status': status_filter, 'days_min': days_min, 'days_max': days_max, 'user_id': user_id},
             'base_querystring': base_querystring,
-            'banks_data': json.dumps(banks_data),
+            'banks_version': bank_directory.version(),
+            'license_stats': _dashboard_stats(request, user_id, KIND_TIKTOK),
+            'recent_jobs': _recent_jobs(request, KIND_TIKTOK),
         },
     )
 
@@ -1015,67 +1350,103 @@ def profile(request):
     )
 
 
+def banks_json(request):
+    """Danh sách ngân hàng (banks.json) với ETag; URL có ?v=<version> được cache lâu dài"""
+    payload, version = bank_directory.payload()
+    etag = f'"{version}"'
+    if request.GET.get('v') == version:
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'public, max-age=300'
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload, content_type='application/json; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def _metrics_allowed(request):
+    """Bearer METRICS_TOKEN, superuser đã đăng nhập, hoặc METRICS_PUBLIC=True (không cần xác thực)."""
+    token = settings.METRICS_TOKEN
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return True
+    if request.user.is_authenticated and request.user.is_superuser:
+        return True
+    return settings.METRICS_PUBLIC and not token
+
+
+def metrics(request):
+    """Số liệu request/latency/DB theo tên URL ở định dạng text của Prometheus"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    if not _metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(request_metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 @login_required
 def get_extension_packages(request):
     """API endpoint để lấy danh sách gói gia hạn"""
-    group_code = request.GET.get('group_code')
-    packages = ExtensionPackage.objects.filter(is_active=True)
-    
-    if group_code:
-        packages = packages.filter(group__code=group_code)
-        
-    packages = packages.order_by('days')
-    data = [{'id': p.id, 'name': p.name, 'days': p.days, 'amount': float(p.amount)} for p in packages]
-    return JsonResponse({'packages': data})
+    packages = active_packages(request.GET.get('group_code'))
+    return JsonResponse({'packages': [package_to_dict(p) for p in packages]})
 
 
 @login_required
 def get_payment_info(request):
     """API endpoint để lấy thông tin chuyển khoản"""
-    payment = PaymentInfo.objects.filter(is_active=True).first()
+    payment = active_payment()
     if not payment:
         return JsonResponse({'error': 'Không có thông tin chuyển khoản'}, status=404)
-    
-    data = {
-        'id': payment.id,
-        'account_name': payment.account_name,
-        'account_number': payment.account_number,
-        'bank_code': payment.bank_code,
-        'bank_name': payment.bank_name,
-        'note': payment.note or '',
-    }
-    return JsonResponse(data)
+    return JsonResponse(payment_to_dict(payment))
 
 
 @login_required
-def generate_qr_code(request):
-    """Tạo URL QR code từ thông tin chuyển khoản sử dụng VietQR"""
-    payment_id = request.GET.get('payment_id')
-    package_id = request.GET.get('package_id')
-    license_id = request.GET.get('license_id')
-    license_type = request.GET.get('license_type', 'zalo')  # Default to 'zalo' for backward compatibility
-    
-    if not payment_id or not package_id or not license_id:
-        return JsonResponse({'error': 'Thiếu thông tin'}, status=400)
-    
+def renewal_bootstrap(request):
+    """Gói gia hạn của nhóm (?group_code=) và thông tin chuyển khoản cho hộp thoại gia hạn, đọc từ cache"""
+    packages = active_packages(request.GET.get('group_code'))
+    payment = active_payment()
+    return JsonResponse({
+        'packages': [package_to_dict(p) for p in packages],
+        'payment_info': payment_to_dict(payment) if payment else None,
+    })
+
+
+def _qr_params(request):
+    """(payment_id, package_id, license_type, license_id) từ query string, None nếu thiếu/sai."""
+    license_type = 'tiktok' if request.GET.get('license_type') == 'tiktok' else 'zalo'  # Mặc định 'zalo' như trước
+    ids = [parse_int(request.GET.get(name)) for name in ('payment_id', 'package_id', 'license_id')]
+    if None in ids:
+        return None
+    payment_id, package_id, license_id = ids
+    return payment_id, package_id, license_type, license_id
+
+
+def _qr_lookup(request, params):
+    """Trả về (payment, package, license_obj, None) hoặc (None, None, None, JsonResponse lỗi)."""
+    payment_id, package_id, license_type, license_id = params
+    payment = find_payment(payment_id)
+    package = find_package(package_id)
+    if payment is None or package is None:
+        return None, None, None, JsonResponse({'error': 'Không tìm thấy thông tin'}, status=404)
     try:
-        payment = PaymentInfo.objects.get(id=payment_id, is_active=True)
-        package = ExtensionPackage.objects.get(id=package_id, is_active=True)
-        
         # Get license object based on type
         if license_type == 'tiktok':
             license_obj = LicenseTikTok.objects.get(id=license_id)
         else:
             license_obj = License.objects.get(id=license_id)
-        
-        if not request.user.is_superuser and license_obj.owner != request.user:
-            return JsonResponse({'error': 'Không có quyền'}, status=403)
-    except (PaymentInfo.DoesNotExist, ExtensionPackage.DoesNotExist, License.DoesNotExist, LicenseTikTok.DoesNotExist):
-        return JsonResponse({'error': 'Không tìm thấy thông tin'}, status=404)
-    
-    # Lấy số tiền từ package
-    amount = int(package.amount) if package.amount else 0
-    
+
+        if not request.user.is_superuser and license_obj.owner_id != request.user.id:
+            return None, None, None, JsonResponse({'error': 'Không có quyền'}, status=403)
+    except (License.DoesNotExist, LicenseTikTok.DoesNotExist):
+        return None, None, None, JsonResponse({'error': 'Không tìm thấy thông tin'}, status=404)
+    return payment, package, license_obj, None
+
+
+def _transfer_content(payment, package, license_obj, license_type):
+    """Trả về (note, nội dung chuyển khoản)."""
     # Tạo nội dung ghi chú (nếu có) với thông tin license
     note = payment.note or ''
     if note and '{' in note:
@@ -1098,7 +1469,7 @@ def generate_qr_code(request):
         except (KeyError, ValueError):
             # Nếu format lỗi, giữ nguyên note gốc
             pass
-    
+
     # Tạo nội dung chuyển khoản
     transfer_content_parts = []
     if note:
@@ -1112,17 +1483,54 @@ def generate_qr_code(request):
         transfer_content_parts.append(str(license_obj.shop_id))  # Shop ID cho TikTok
     else:
         transfer_content_parts.append(license_obj.phone_number)  # Số điện thoại cho Zalo
-    transfer_content = ' '.join(transfer_content_parts)  # Nối bằng khoảng trắng
-    
-    # Tạo URL QR code theo định dạng VietQR
-    # Format: https://img.vietqr.io/image/${bankcode}-${accountno}-compact.jpg?amount=${money}&addInfo=${memo}&accountName=${accountname}
-    qr_url = (
-        f"https://img.vietqr.io/image/{payment.bank_code}-{payment.account_number}-compact.jpg"
-        f"?amount={quote(str(amount))}"
-        f"&addInfo={quote(transfer_content)}"
-        f"&accountName={quote(payment.account_name)}"
-    )
-    
+    return note, ' '.join(transfer_content_parts)  # Nối bằng khoảng trắng
+
+
+def _qr_image_entry(params, payment, package, license_obj, transfer_content):
+    """Payload VietQR (lưu vào qr_images), None nếu bank_code không có trong banks.json."""
+    bank_bin = bank_directory.bin_for(payment.bank_code)
+    if bank_bin is None:
+        return None
+    amount = int(package.amount) if package.amount else 0
+    payload = build_payload(bank_bin, payment.account_number, amount, transfer_content)
+    return qr_images.put(params, payload, license_obj.owner_id)
+
+
+@login_required
+def generate_qr_code(request):
+    """Tạo mã QR chuyển khoản VietQR (ảnh do server vẽ, xem generate_qr_image)"""
+    params = _qr_params(request)
+    if params is None:
+        return JsonResponse({'error': 'Thiếu thông tin'}, status=400)
+    payment, package, license_obj, error = _qr_lookup(request, params)
+    if error:
+        return error
+    payment_id, package_id, license_type, license_id = params
+
+    # Lấy số tiền từ package
+    amount = int(package.amount) if package.amount else 0
+    note, transfer_content = _transfer_content(payment, package, license_obj, license_type)
+
+    entry = _qr_image_entry(params, payment, package, license_obj, transfer_content)
+    if entry is not None:
+        query = urlencode({
+            'payment_id': payment_id,
+            'package_id': package_id,
+            'license_type': license_type,
+            'license_id': license_id,
+            'v': entry.version,
+        })
+        qr_url = f"{reverse('licenses:generate_qr_image')}?{query}"
+    else:
+        # Ngân hàng không có trong banks.json: không tạo được payload, dùng ảnh của VietQR như trước
+        # Format: https://img.vietqr.io/image/${bankcode}-${accountno}-compact.jpg?amount=${money}&addInfo=${memo}&accountName=${accountname}
+        qr_url = (
+            f"https://img.vietqr.io/image/{payment.bank_code}-{payment.account_number}-compact.jpg"
+            f"?amount={quote(str(amount))}"
+            f"&addInfo={quote(transfer_content)}"
+            f"&accountName={quote(payment.account_name)}"
+        )
+
     license_data = {
         'code': str(license_obj.code),
     }
@@ -1130,9 +1538,10 @@ def generate_qr_code(request):
         license_data['shop_id'] = license_obj.shop_id
     else:
         license_data['phone_number'] = license_obj.phone_number
-    
+
     return JsonResponse({
         'qr_code': qr_url,
+        'qr_payload': entry.payload if entry is not None else None,
         'payment_info': {
             'account_name': payment.account_name,
             'account_number': payment.account_number,
@@ -1150,6 +1559,45 @@ def generate_qr_code(request):
     })
 
 
+@login_required
+def generate_qr_image(request):
+    """Ảnh mã QR (PNG mặc định, ?format=svg) từ LRU; URL có ?v=<version> được cache lâu dài"""
+    params = _qr_params(request)
+    if params is None:
+        return JsonResponse({'error': 'Thiếu thông tin'}, status=400)
+    fmt = request.GET.get('format', 'png')
+    if fmt not in QR_FORMATS:
+        return JsonResponse({'error': 'format phải là png hoặc svg'}, status=400)
+
+    version = request.GET.get('v')
+    entry = qr_images.get(params)
+    if entry is None or entry.version != version:
+        # Chưa có trong cache của process này hoặc link cũ: tính lại payload từ DB
+        payment, package, license_obj, error = _qr_lookup(request, params)
+        if error:
+            return error
+        _, transfer_content = _transfer_content(payment, package, license_obj, params[2])
+        entry = _qr_image_entry(params, payment, package, license_obj, transfer_content)
+        if entry is None:
+            return JsonResponse({'error': 'Ngân hàng không hỗ trợ VietQR'}, status=404)
+    elif not request.user.is_superuser and entry.owner_id != request.user.id:
+        return JsonResponse({'error': 'Không có quyền'}, status=403)
+
+    etag = f'"{entry.version}-{fmt}"'
+    if version == entry.version:
+        cache_control = 'private, max-age=31536000, immutable'
+    else:
+        cache_control = 'private, no-cache'
+
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(entry.image(fmt), content_type=QR_FORMATS[fmt])
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
 @api_view(['POST'])
 @authentication_classes([APIKeyAuthentication])
 @permission_classes([AllowAny])